@@ -0,0 +1,167 @@
+"""
+Benchmark della costruzione dell'indice: confronta tempo e picco di memoria (RSS) del builder
+originale (una PostingsList per ogni coppia termine-documento, unita con merge) con il builder
+basato su array di docID (una sola tokenizzazione per documento), su un processo o su tutti i core.
+
+Uso (dalla cartella del progetto):
+    python -m benchmarks.bench_index_build --docs 20000
+    python -m benchmarks.bench_index_build --metadata data/movie.metadata.tsv --plots data/plot_summaries.txt
+"""
+import argparse
+import json
+import multiprocessing
+import queue
+import resource
+import sys
+import time
+
+from benchmarks.synthetic_corpus import generate_docs
+from src.inverted_index import InvertedIndex, normalize
+from src.tokenizer import TOKENIZER
+from src.movie_description import MovieDescription, create_corpus
+from src.postings_list import PostingsList
+
+
+def legacy_create_idx_from_corpus(corpus: list[MovieDescription]) -> dict:
+    """
+    Builder originale dell'InvertedIndex: crea una PostingsList per ogni (termine, documento)
+    solo per unirla a quella del termine.
+    """
+    terms = {}
+    for doc_id, content in enumerate(corpus):
+        for token in set(TOKENIZER.tokenize(content.description)):
+            plist = PostingsList.create_posting_list_from_single_docID(doc_id)
+            if token in terms:
+                terms[token].merge(plist)
+            else:
+                terms[token] = plist
+    return terms
+
+
+def legacy_create_biword_from_corpus(corpus: list[MovieDescription]) -> dict:
+    """
+    Builder originale del biword index: una PostingsList per ogni occorrenza di biword,
+    comprese quelle ripetute nello stesso documento.
+    """
+    terms = {}
+    for doc_id, content in enumerate(corpus):
+        tokens = normalize(content.description).split()
+        for i in range(len(tokens) - 1):
+            biword = tokens[i] + tokens[i + 1]
+            plist = PostingsList.create_posting_list_from_single_docID(doc_id)
+            if biword in terms:
+                terms[biword].merge(plist)
+            else:
+                terms[biword] = plist
+    return terms
+
+
+def build_legacy(corpus):
+    idx, biword = InvertedIndex(), InvertedIndex()
+    idx.btree.update(legacy_create_idx_from_corpus(corpus))
+    biword.btree.update(legacy_create_biword_from_corpus(corpus))
+    return idx, biword
+
+
+def build_single_pass(corpus):
+    return InvertedIndex.create_indexes_from_corpus(corpus)
+
+
+def build_pool(corpus):
+    return InvertedIndex.create_indexes_from_corpus(corpus, processes=None)
+
+
+BUILDERS = {
+    "legacy": build_legacy,
+    "single-pass": build_single_pass,
+    "pool": build_pool,
+}
+
+
+def synthetic_corpus(n_docs: int, vocabulary: int, doc_length: int, seed: int,
+                     exponent: float = 1.0) -> list[MovieDescription]:
+    """
+    Genera il corpus sintetico di benchmarks.synthetic_corpus (lo stesso di bench_system a parità di seed).
+    """
+    return [MovieDescription(title, description)
+            for title, description in generate_docs(n_docs, vocabulary, doc_length, exponent, seed)]
+
+
+def max_rss_kb() -> int:
+    """
+    Picco di memoria residente del processo in KB (su macOS ru_maxrss è in byte).
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def run_isolated(context, target, args: tuple, timeout: float = None) -> dict:
+    """
+    Esegue target(*args, coda) in un processo figlio e ritorna il dizionario che mette nella coda.
+    Se il processo termina senza risultato (es. crash) o supera timeout secondi ritorna
+    {"error": ...} con il codice di uscita, invece di restare in attesa per sempre.
+    """
+    results = context.Queue()
+    process = context.Process(target=target, args=(*args, results))
+    process.start()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    result = None
+    while result is None:
+        try:
+            result = results.get(timeout=1)
+        except queue.Empty:
+            if process.exitcode is not None or (deadline is not None and time.monotonic() > deadline):
+                break
+    if result is None:
+        # il risultato potrebbe essere arrivato mentre il processo terminava
+        try:
+            result = results.get(timeout=1)
+        except queue.Empty:
+            if process.exitcode is None:
+                process.terminate()
+                result = {"error": f"timeout after {timeout}s"}
+            else:
+                result = {"error": f"exit code {process.exitcode}"}
+    process.join()
+    return result
+
+
+def run_builder(name: str, corpus: list[MovieDescription], results) -> None:
+    """
+    Esegue un builder in un processo separato, così il picco di RSS non è influenzato dagli altri.
+    """
+    baseline = max_rss_kb()
+    start = time.perf_counter()
+    BUILDERS[name](corpus)
+    elapsed = time.perf_counter() - start
+    results.put({"builder": name, "docs": len(corpus), "seconds": round(elapsed, 3),
+                 "peak_rss_delta_kb": max_rss_kb() - baseline})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Index build benchmark")
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--doc-length", type=int, default=300)
+    parser.add_argument("--exponent", type=float, default=1.0, help="Zipf exponent of word frequencies")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--metadata", help="movie metadata TSV (instead of the synthetic corpus)")
+    parser.add_argument("--plots", help="plot summaries file (instead of the synthetic corpus)")
+    parser.add_argument("--builders", nargs="+", default=list(BUILDERS), choices=list(BUILDERS))
+    parser.add_argument("--timeout", type=float, help="seconds after which a builder is stopped")
+    args = parser.parse_args()
+
+    if args.metadata and args.plots:
+        corpus = create_corpus(args.metadata, args.plots)
+    else:
+        corpus = synthetic_corpus(args.docs, args.vocabulary, args.doc_length, args.seed, args.exponent)
+
+    # fork: i processi figli ereditano il corpus già in memoria
+    context = multiprocessing.get_context("fork")
+    for name in args.builders:
+        result = run_isolated(context, run_builder, (name, corpus), args.timeout)
+        print(json.dumps({"builder": name, **result}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Benchmark riproducibili del sistema IR, uno scenario per operazione:
+    build    costruzione del sistema (create_system)
+    query    query booleane, phrase query, prefissi e termini tolleranti agli errori (prima pagina compresa)
+    add      aggiunta di documenti a batch, con i merge in background che ne derivano
+    delete   eliminazione di molti documenti e merge completo (_merge_idx) che li rimuove dagli indici
+    persist  salvataggio su disco, caricamento e prima query dopo il caricamento
+Il corpus è generato da benchmarks.synthetic_corpus nel formato TSV letto da create_corpus
+(oppure è un corpus reale, con --metadata e --plots); con lo stesso seed corpus e query sono sempre gli stessi.
+Ogni scenario gira in un processo separato e produce una riga JSON con throughput, latenze p50/p99
+e picco di memoria (RSS, preparazione dello scenario compresa). Con --output i risultati vengono
+salvati in un file JSON, che con --baseline può essere confrontato con un'esecuzione successiva.
+
+Uso (dalla cartella del progetto):
+    python -m benchmarks.bench_system --docs 20000 --output bench.json
+    python -m benchmarks.bench_system --docs 20000 --scenarios query add --baseline bench.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+from benchmarks.bench_index_build import max_rss_kb, run_isolated
+from benchmarks.synthetic_corpus import corpus_paths, write_corpus
+from src.inverted_index import normalize
+from src.ir_system import IrSystem
+from src.movie_description import MovieDescription, create_corpus
+from src.tokenizer import STOP_WORDS
+
+# numero di documenti usati per scegliere i termini e le frasi delle query
+QUERY_SAMPLE_DOCS = 5_000
+# termini più frequenti tra cui scegliere quelli delle query
+QUERY_TERMS = 2_000
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Percentile q (0-100) di values con il metodo nearest-rank.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def latency_stats(latencies: list[float]) -> dict:
+    """
+    Numero di operazioni, throughput (operazioni al secondo) e latenze in millisecondi.
+    """
+    total = sum(latencies)
+    return {"ops": len(latencies), "ops_per_second": round(len(latencies) / total, 1) if total else None,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3)}
+
+
+def make_queries(corpus: list[MovieDescription], n_queries: int, seed: int) -> list[tuple[str, str]]:
+    """
+    Genera n_queries query distinte come coppie (tipo, query), con termini scelti tra i più frequenti
+    del corpus e frasi prese da descrizioni reali (così le phrase query hanno risultati).
+    """
+    rng = random.Random(seed)
+    sample = [normalize(doc.description).split() for doc in corpus[:QUERY_SAMPLE_DOCS]]
+    counts = Counter(word for words in sample for word in words if word not in STOP_WORDS)
+    terms = [term for term, _ in counts.most_common(QUERY_TERMS)]
+    sample = [words for words in sample if len(words) >= 3]
+
+    def term() -> str:
+        return rng.choice(terms)
+
+    def phrase() -> str:
+        words = rng.choice(sample)
+        start = rng.randrange(len(words) - 2)
+        return '"' + ' '.join(words[start:start + rng.randint(2, 3)]) + '"'
+
+    generators = {
+        "term": term,
+        "and": lambda: f"{term()} AND {term()}",
+        "or": lambda: f"{term()} OR {term()}",
+        "and-not": lambda: f"{term()} AND NOT {term()}",
+        "nested": lambda: f"({term()} OR {term()}) AND {term()}",
+        "phrase": phrase,
+        "prefix": lambda: term()[:3] + "*",
+        "fuzzy": lambda: term() + "~",
+    }
+    # frequenze dei tipi di query nel carico di lavoro
+    weights = {"term": 15, "and": 25, "or": 15, "and-not": 10, "nested": 10, "phrase": 15, "prefix": 5,
+               "fuzzy": 5}
+    kinds = list(weights)
+    queries = {}
+    attempts = 0
+    while len(queries) < n_queries and attempts < n_queries * 20:
+        kind = rng.choices(kinds, [weights[kind] for kind in kinds])[0]
+        queries.setdefault(generators[kind](), kind)
+        attempts += 1
+    return [(kind, query) for query, kind in queries.items()]
+
+
+def run_query(ir: IrSystem, query: str):
+    """
+    Esegue una query come il REPL di main.py: phrase query se tra virgolette, altrimenti booleana.
+    """
+    if query.startswith('"'):
+        return ir.phrase_query(query[1:-1])
+    return ir.query(query)
+
+
+def bench_build(corpus: list[MovieDescription], args) -> dict:
+    start = time.perf_counter()
+    ir = IrSystem.create_system(corpus, processes=args.processes, forward_index=args.forward_index)
+    elapsed = time.perf_counter() - start
+    return {"docs": len(ir), "seconds": round(elapsed, 3), "docs_per_second": round(len(corpus) / elapsed, 1)}
+
+
+def bench_query(corpus: list[MovieDescription], args) -> dict:
+    ir = IrSystem.create_system(corpus, processes=args.processes, forward_index=args.forward_index)
+    queries = make_queries(corpus, args.queries, args.seed)
+    latencies = []
+    by_kind = {}
+    results = 0
+    for kind, query in queries:
+        start = time.perf_counter()
+        result = run_query(ir, query)
+        # anche la prima pagina di risultati, come nel REPL
+        result.page(0, 20)
+        elapsed = time.perf_counter() - start
+        latencies.append(elapsed)
+        by_kind.setdefault(kind, []).append(elapsed)
+        results += len(result)
+    stats = latency_stats(latencies)
+    stats["mean_results"] = round(results / len(queries), 1) if queries else 0
+    stats["by_kind"] = {kind: latency_stats(values) for kind, values in sorted(by_kind.items())}
+    return stats
+
+
+def bench_add(corpus: list[MovieDescription], args) -> dict:
+    # metà del corpus nell'indice iniziale, il resto aggiunto a batch
+    initial = len(corpus) // 2
+    ir = IrSystem.create_system(corpus[:initial], processes=args.processes,
+                                forward_index=args.forward_index)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(initial, len(corpus), args.batch_size):
+        batch_start = time.perf_counter()
+        ir.add_docs(corpus[i:i + args.batch_size])
+        latencies.append(time.perf_counter() - batch_start)
+    ir.wait_for_merge()
+    elapsed = time.perf_counter() - start
+    stats = latency_stats(latencies)
+    stats.update({"docs_added": len(corpus) - initial, "batch_size": args.batch_size,
+                  "seconds_with_merges": round(elapsed, 3),
+                  "docs_per_second": round((len(corpus) - initial) / elapsed, 1) if elapsed else None,
+                  "merges": ir.merge_count, "segments": len(ir.merge_stats()["segments"])})
+    return stats
+
+
+def bench_delete(corpus: list[MovieDescription], args) -> dict:
+    ir = IrSystem.create_system(corpus, processes=args.processes, forward_index=args.forward_index)
+    rng = random.Random(args.seed)
+    deleted = rng.sample(range(len(corpus)), int(len(corpus) * args.delete_fraction))
+    start = time.perf_counter()
+    ir.delete_docs(deleted)
+    delete_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    ir._merge_idx()
+    merge_seconds = time.perf_counter() - start
+    return {"docs_deleted": len(deleted), "delete_seconds": round(delete_seconds, 4),
+            "merge_seconds": round(merge_seconds, 3), "docs_left": len(ir)}
+
+
+def bench_persist(corpus: list[MovieDescription], args) -> dict:
+    ir = IrSystem.create_system(corpus, processes=args.processes, forward_index=args.forward_index)
+    queries = make_queries(corpus, 1, args.seed)
+    folder = tempfile.mkdtemp(prefix="ir_bench_")
+    try:
+        start = time.perf_counter()
+        ir.write_ir_system_to_disk(folder)
+        write_seconds = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(folder, name)) for name in os.listdir(folder))
+        start = time.perf_counter()
+        loaded = IrSystem.load_ir_system_from_disk(folder)
+        load_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        # prima query dopo il caricamento: posting list lette dai file mappati in memoria
+        for _, query in queries:
+            run_query(loaded, query).page(0, 20)
+        first_query_seconds = time.perf_counter() - start
+    finally:
+        shutil.rmtree(folder)
+    return {"write_seconds": round(write_seconds, 3), "load_seconds": round(load_seconds, 4),
+            "first_query_ms": round(first_query_seconds * 1000, 3), "bytes_on_disk": size}
+
+
+SCENARIOS = {
+    "build": bench_build,
+    "query": bench_query,
+    "add": bench_add,
+    "delete": bench_delete,
+    "persist": bench_persist,
+}
+
+
+def run_scenario(name: str, corpus: list[MovieDescription], args, results) -> None:
+    """
+    Esegue uno scenario in un processo separato, così il picco di RSS non è influenzato dagli altri.
+    """
+    baseline = max_rss_kb()
+    stats = SCENARIOS[name](corpus, args)
+    results.put({"scenario": name, **stats, "peak_rss_delta_kb": max_rss_kb() - baseline})
+
+
+def compare(results: list[dict], baseline: list[dict]) -> list[str]:
+    """
+    Confronta le metriche numeriche di primo livello con quelle di un'esecuzione precedente
+    (variazione percentuale, per scenario).
+    """
+    previous = {result["scenario"]: result for result in baseline}
+    lines = []
+    for result in results:
+        old = previous.get(result["scenario"])
+        if old is None:
+            continue
+        for metric, value in result.items():
+            old_value = old.get(metric)
+            if isinstance(value, (int, float)) and isinstance(old_value, (int, float)) and old_value:
+                change = (value - old_value) / old_value * 100
+                lines.append(f"{result['scenario']:8} {metric:20} {old_value:>12} -> {value:>12} ({change:+.1f}%)")
+    return lines
+
+
+def load_corpus(args) -> list[MovieDescription]:
+    """
+    Legge il corpus reale (--metadata, --plots) oppure genera quello sintetico e lo legge con create_corpus.
+    """
+    if args.metadata and args.plots:
+        return create_corpus(args.metadata, args.plots)
+    folder = tempfile.mkdtemp(prefix="ir_corpus_")
+    try:
+        metadata_path, plots_path = corpus_paths(folder)
+        write_corpus(metadata_path, plots_path, args.docs, args.vocabulary, args.doc_length, args.exponent,
+                     args.seed)
+        return create_corpus(metadata_path, plots_path)
+    finally:
+        shutil.rmtree(folder)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="IR system benchmark")
+    parser.add_argument("--docs", type=int, default=20_000)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--doc-length", type=int, default=200)
+    parser.add_argument("--exponent", type=float, default=1.0, help="Zipf exponent of word frequencies")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--metadata", help="movie metadata TSV (instead of the synthetic corpus)")
+    parser.add_argument("--plots", help="plot summaries file (instead of the synthetic corpus)")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    parser.add_argument("--delete-fraction", type=float, default=0.1)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--timeout", type=float, help="seconds after which a scenario is stopped")
+    parser.add_argument("--forward-index", action="store_true", help="build the systems with a forward index")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file of a previous run to compare with")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args)
+    # fork: i processi figli ereditano il corpus già in memoria
+    context = multiprocessing.get_context("fork")
+    results = []
+    for name in args.scenarios:
+        # uno scenario fallito viene riportato con il suo errore e non blocca i successivi
+        result = {"scenario": name, **run_isolated(context, run_scenario, (name, corpus, args), args.timeout)}
+        print(json.dumps(result))
+        results.append(result)
+
+    if args.output:
+        params = {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}
+        with open(args.output, "w") as f:
+            json.dump({"params": params, "results": results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for line in compare(results, baseline["results"]):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
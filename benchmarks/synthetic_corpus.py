@@ -0,0 +1,82 @@
+"""
+Generatore di corpus sintetici riproducibili per i benchmark, negli stessi due file TSV letti
+da create_corpus / iter_corpus:
+    metadati: ID del film, (colonna non usata), titolo
+    trame:    ID del film, descrizione
+Le parole sono pseudo-parole casuali e le loro frequenze seguono una legge di Zipf
+(la parola di rango r ha probabilità proporzionale a 1 / r^exponent), come nei testi reali.
+Con lo stesso seed vengono generati sempre gli stessi file.
+
+Uso (dalla cartella del progetto):
+    python -m benchmarks.synthetic_corpus --docs 50000 --out-dir data/synthetic
+"""
+import argparse
+import os
+import random
+from itertools import accumulate
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def make_vocabulary(size: int, rng: random.Random) -> list[str]:
+    """
+    Genera size pseudo-parole distinte (da 3 a 10 lettere), in ordine di rango.
+    """
+    words = {}
+    while len(words) < size:
+        words[''.join(rng.choices(LETTERS, k=rng.randint(3, 10)))] = None
+    return list(words)
+
+
+def generate_docs(n_docs: int, vocabulary: int = 50_000, doc_length: int = 200, exponent: float = 1.0,
+                  seed: int = 42):
+    """
+    Genera (generatore) n_docs coppie (titolo, descrizione). La lunghezza delle descrizioni
+    è uniforme tra doc_length / 2 e 3 / 2 doc_length parole, i titoli hanno da 1 a 4 parole.
+    """
+    rng = random.Random(seed)
+    words = make_vocabulary(vocabulary, rng)
+    # pesi cumulativi: rng.choices non li ricalcola a ogni chiamata
+    cum_weights = list(accumulate(1 / (rank + 1) ** exponent for rank in range(vocabulary)))
+    low, high = max(1, doc_length // 2), max(1, doc_length * 3 // 2)
+    for _ in range(n_docs):
+        title = ' '.join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(1, 4))).title()
+        description = ' '.join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(low, high)))
+        yield title, description
+
+
+def write_corpus(metadata_path: str, plots_path: str, n_docs: int, vocabulary: int = 50_000,
+                 doc_length: int = 200, exponent: float = 1.0, seed: int = 42) -> None:
+    """
+    Scrive il corpus sintetico nei file metadata_path e plots_path (formato di create_corpus).
+    """
+    with open(metadata_path, 'w') as metadata, open(plots_path, 'w') as plots:
+        docs = generate_docs(n_docs, vocabulary, doc_length, exponent, seed)
+        for movie_id, (title, description) in enumerate(docs):
+            metadata.write(f"{movie_id}\t/m/{movie_id}\t{title}\n")
+            plots.write(f"{movie_id}\t{description}\n")
+
+
+def corpus_paths(out_dir: str) -> tuple[str, str]:
+    return os.path.join(out_dir, "movie.metadata.tsv"), os.path.join(out_dir, "plot_summaries.txt")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Synthetic corpus generator")
+    parser.add_argument("--docs", type=int, default=50_000)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--doc-length", type=int, default=200)
+    parser.add_argument("--exponent", type=float, default=1.0, help="Zipf exponent of word frequencies")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out-dir", default="data/synthetic")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    metadata_path, plots_path = corpus_paths(args.out_dir)
+    write_corpus(metadata_path, plots_path, args.docs, args.vocabulary, args.doc_length, args.exponent,
+                 args.seed)
+    print(f"{args.docs} documents written to {metadata_path} and {plots_path}")
+
+
+if __name__ == "__main__":
+    main()
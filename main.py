@@ -1,5 +1,14 @@
+import os
+import time
+
+from src.doc_store import StringColumn
 from src.ir_system import IrSystem
+from src.metrics import METRICS
 from src.movie_description import *
+from src.query_result import QueryResult
+
+# numero di risultati mostrati per pagina
+PAGE_SIZE = 20
 
 
 def add_document(ir: IrSystem, title: str, description: str):
@@ -10,13 +19,28 @@ def add_document(ir: IrSystem, title: str, description: str):
     print("Document successfully added")
 
 
+def replace_document(ir: IrSystem, doc_id: str, title: str, description: str) -> None:
+    """
+    Sostituisce un documento con una nuova versione (che avrà un nuovo docID).
+    """
+    try:
+        doc_ids = ir.replace_docs([int(doc_id)], [MovieDescription(title, description)])
+    except ValueError:
+        print(f"Error: Invalid document ID '{doc_id}'")
+        return
+    except IndexError as e:
+        print(f"Error: {e}")
+        return
+    print(f"Document {doc_id} replaced by document {doc_ids[0]}")
+
+
 def add_documents(ir: IrSystem, metadata_file: str, description_file: str):
     """
-    Aggiunge più documenti leggendo da file di metadati e descrizioni.
+    Aggiunge più documenti leggendo da file di metadati e descrizioni
+    (un batch di documenti alla volta, senza caricare tutto il file in memoria).
     """
     try:
-        corpus = create_corpus(metadata_file, description_file)
-        ir.add_docs(corpus)
+        ir.ingest(iter_corpus(metadata_file, description_file))
         print("Documents successfully added")
     except FileNotFoundError:
         print(f"Error: Files {metadata_file}, {description_file} not found." +
@@ -57,7 +81,11 @@ def delete_documents(docs_to_delete: str, ir: IrSystem) -> None:
     # ordina la lista e chiama la funzione di IRSystem che segna, nell'invalid vector,
     # i documenti specificati come eliminati.
     ids_list = sorted(ids_to_delete)
-    ir.delete_docs(ids_list)
+    try:
+        ir.delete_docs(ids_list)
+    except IndexError as e:
+        print(f"Error: {e}")
+        return
 
     # stampa un riassunto delle eliminazioni (singoli numeri o intervalli consecutivi)
     if len(ids_list) == 1:
@@ -84,13 +112,20 @@ def help_menu():
     """
     print("Available commands:")
     print(" - help")
-    print(" - build <titles_file> <descriptions_file>")
+    print(" - build <titles_file> <descriptions_file> [positional] [ranked] [stream] [forward]")
     print(" - load index")
-    print(" - <query>")
+    print(" - <query> (terms can contain * wildcards or end with ~ to allow typos, e.g. detect* sherlok~)")
     print(' - "<phrase query>"')
+    print(" - more (i.e. next page of results of the last query)")
+    print(" - batch <queries_file> (i.e. run one query per line, with timings)")
+    print(" - explain <query> (i.e. show the query plan)")
+    print(" - trace <query> (i.e. run a query and show the cost of each stage)")
+    print(" - stats [on|off|reset] (i.e. show, enable, disable or clear the metrics)")
+    print(" - top <k> <query> (i.e. the k most relevant documents, BM25)")
     print(' - add <title> | <description>')
     print(" - add <titles_file> <descriptions_file>")
     print(" - del <docIDs> (e.g. 'del 1 5' or 'del 7-9')")
+    print(" - replace <docID> <title> | <description>")
     print(" - len index (i.e. index size)")
     print(" - exit")
 
@@ -111,27 +146,44 @@ def load_index():
     return ir
 
 
-def build_index(metadata_file, description_file):
+def build_index(metadata_file, description_file, positional=False, ranked=False, stream=False, forward=False):
     """
     Crea un nuovo indice a partire dai file di metadati e descrizioni.
+    Con positional=True crea l'indice posizionale al posto del biword index,
+    con ranked=True salva anche term frequency e lunghezze dei documenti per il ranking BM25.
+    Con stream=True legge e indicizza i documenti a batch e salva le descrizioni su disco
+    (in memoria restano solo i titoli), per file più grandi della RAM.
+    Con forward=True crea anche il forward index, che rende più veloce rimuovere i documenti eliminati.
     """
-    print("Creating index and biword index...")
+    print(f"Creating index and {'positional' if positional else 'biword'} index...")
+    store = None
     try:
-        corpus = create_corpus(metadata_file, description_file)
-        ir = IrSystem.create_system(corpus)
+        if stream:
+            os.makedirs("index_files", exist_ok=True)
+            # le descrizioni vengono scritte in una colonna temporanea: quella salvata (a cui punta
+            # il manifest su disco) viene sostituita solo se la costruzione va a buon fine
+            store = StringColumn.create(os.path.join("index_files", "descriptions.building"))
+            ir = IrSystem.create_system_from_stream(iter_corpus(metadata_file, description_file),
+                                                    processes=None, positional=positional, ranked=ranked,
+                                                    description_store=store, forward_index=forward)
+            store.move(os.path.join("index_files", "descriptions"))
+        else:
+            corpus = create_corpus(metadata_file, description_file)
+            ir = IrSystem.create_system(corpus, positional=positional, ranked=ranked, forward_index=forward)
         print("Index successfully created.")
     except FileNotFoundError:
+        if store is not None:
+            store.remove()
         print(f"Files {metadata_file}, {description_file} not found")
         return None
     return ir
 
 
-def search(query: str, ir: IrSystem):
+def search(query: str, ir: IrSystem) -> QueryResult:
     """
     Esegue una ricerca: phrase query se tra virgolette, altrimenti normale.
     """
     print(f"Performing search for: '{query}'")
-    results = []
     # se phrase query
     if query.startswith('"') and query.endswith('"'):
         # rimuove virgolette e cerca come frase
@@ -143,6 +195,59 @@ def search(query: str, ir: IrSystem):
     return results
 
 
+def run_batch(queries_file: str, ir: IrSystem) -> None:
+    """
+    Esegue le query del file (una per riga) con IrSystem.batch_query
+    e stampa, per ciascuna, il numero di risultati e il tempo di esecuzione.
+    """
+    try:
+        with open(queries_file, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        print(f"Error: File {queries_file} not found.")
+        return
+    start = time.perf_counter()
+    results = ir.batch_query(queries)
+    elapsed = time.perf_counter() - start
+    for query, (result, duration) in zip(queries, results):
+        print(f"{query}: {len(result)} result(s) in {duration * 1000:.2f} ms")
+    print(f"{len(queries)} queries executed in {elapsed * 1000:.2f} ms.")
+
+
+def show_stats(option: str, ir: IrSystem) -> None:
+    """
+    Mostra le metriche (tempi delle fasi, contatori, cache e merge), oppure le attiva,
+    le disattiva o le azzera.
+    """
+    if option == "on":
+        METRICS.enabled = True
+        print("Metrics enabled.")
+    elif option == "off":
+        METRICS.enabled = False
+        print("Metrics disabled.")
+    elif option == "reset":
+        METRICS.reset()
+        print("Metrics cleared.")
+    elif option:
+        print("Usage: stats [on|off|reset]")
+    else:
+        lines = ir.stats() if ir is not None else METRICS.format()
+        print("\n".join(lines) if lines else "No metrics recorded.")
+
+
+def print_page(results: QueryResult, offset: int) -> int:
+    """
+    Stampa una pagina di risultati a partire da offset e ritorna l'offset della pagina successiva.
+    """
+    for result in results.page(offset, PAGE_SIZE):
+        print(result)
+    shown = min(offset + PAGE_SIZE, len(results))
+    print(f"Showing {offset + 1}-{shown} of {len(results)} result(s).")
+    if shown < len(results):
+        print("Type 'more' for the next page.")
+    return shown
+
+
 def print_title():
     ascii_art = r"""
   _    _           _       _       _____           _
@@ -162,8 +267,13 @@ def print_title():
 def main():
     print_title()
     print("Parser started. Type a command (type 'help' for the list of commands):")
+    # metriche attive nel REPL (si disattivano con 'stats off')
+    METRICS.enabled = True
 
     ir = None
+    # risultati dell'ultima query e offset della prossima pagina da mostrare
+    results = None
+    offset = 0
     while True:
         user_input = input("> ").strip()
         if not user_input:
@@ -174,21 +284,31 @@ def main():
         # se il comando inizia con "build" (costruzione indice da file)
         if cmd.startswith("build"):
             parts = cmd.split()
-            # controlla che ci siano esattamente 3 parti: 'build', <titles_file>, <descriptions_file>
+            # controlla che ci siano 3 parti: 'build', <titles_file>, <descriptions_file>
+            # più le eventuali opzioni 'positional', 'ranked', 'stream' e 'forward' (in qualsiasi ordine)
+            options = set()
+            while len(parts) > 3 and parts[-1] in ("positional", "ranked", "stream", "forward"):
+                options.add(parts.pop())
             if len(parts) != 3:
-                print("Usage: build <titles_file> <descriptions_file>")
+                print("Usage: build <titles_file> <descriptions_file> [positional] [ranked] [stream] [forward]")
             else:
                 metadata, descriptions = parts[1:]
-                ir = build_index(metadata, descriptions)
+                built = build_index(metadata, descriptions, "positional" in options, "ranked" in options,
+                                    "stream" in options, "forward" in options)
+                # se la costruzione fallisce resta l'indice già caricato
+                if built is not None:
+                    ir = built
         # se il comando è esattamente "len index", mostra il numero di termini unici indicizzati
         elif cmd == "len index":
             if ir is None:
                 continue
-            print(
-                f"Index size (number of unique terms): {len(ir._index) + (len(ir._aux_idx) if ir._aux_idx else 0)}")
+            print(f"Index size (number of unique terms): {ir.vocabulary_size()}")
         # comando per caricare un indice già costruito da disco
         elif cmd in ["load index"]:
             ir = load_index()
+        # mostra, attiva, disattiva o azzera le metriche
+        elif cmd == "stats" or cmd.startswith("stats "):
+            show_stats(cmd[6:].strip(), ir)
         # mostra il menu di aiuto con i comandi disponibili
         elif cmd == "help":
             help_menu()
@@ -210,6 +330,51 @@ def main():
                     delete_documents(query, ir)
                 else:
                     print("You must specify a string after 'del'.")
+            # comando per sostituire un documento con una nuova versione
+            elif cmd.startswith("replace "):
+                parts = user_input.split(maxsplit=2)
+                if len(parts) < 3 or '|' not in parts[2]:
+                    print("Usage: replace <docID> <title> | <description>")
+                    continue
+                title, description = map(str.strip, parts[2].split('|', 1))
+                replace_document(ir, parts[1], title, description)
+            # comando per mostrare il piano di esecuzione di una query con stime e costi
+            elif cmd.startswith("explain "):
+                query = user_input[8:].strip()
+                if query:
+                    print(ir.explain(query))
+                else:
+                    print("You must specify a query after 'explain'.")
+            # comando per eseguire una query mostrando il costo di ogni fase
+            elif cmd.startswith("trace "):
+                query = user_input[6:].strip()
+                if query:
+                    result, stages = ir.trace_query(query)
+                    print(f"{len(result)} result(s)")
+                    print("\n".join(stages))
+                else:
+                    print("You must specify a query after 'trace'.")
+            # comando per la ricerca a testo libero: i k documenti con punteggio BM25 più alto
+            elif cmd.startswith("top "):
+                parts = user_input.split(maxsplit=2)
+                if len(parts) < 3 or not parts[1].isdigit():
+                    print("Usage: top <k> <query>")
+                    continue
+                top_results = ir.ranked_query(parts[2], int(parts[1]))
+                if top_results:
+                    for result in top_results:
+                        print(result)
+                else:
+                    print("No results found.")
+            # comando per eseguire in blocco le query di un file
+            elif cmd.startswith("batch "):
+                run_batch(user_input[6:].strip(), ir)
+            # comando per mostrare la pagina successiva dei risultati dell'ultima query
+            elif cmd == "more":
+                if results is None or offset >= len(results):
+                    print("No more results.")
+                else:
+                    offset = print_page(results, offset)
             # comando per aggiungere un singolo documento (titolo + descrizione)
             elif cmd.startswith("add"):
                 parts = user_input.strip().split(maxsplit=1)
@@ -226,10 +391,10 @@ def main():
             # se il comando non corrisponde a quelli precedenti, lo interpreta come query di ricerca
             else:
                 results = search(cmd, ir)
+                offset = 0
                 if results:
-                    for result in results:
-                        print(result)
-                    print(f"{len(results)} result(s) found.")
+                    # mostra solo la prima pagina: i titoli degli altri risultati non vengono letti
+                    offset = print_page(results, offset)
                 else:
                     print("No results found.")
         else:
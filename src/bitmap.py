@@ -0,0 +1,241 @@
+from array import array
+from bisect import bisect_left, insort
+from itertools import chain, compress, filterfalse
+
+# typecode degli array di docID: interi senza segno a 32 bit (4 byte per posting invece
+# dei ~28 byte di un int Python boxed)
+DOC_ID_TYPECODE = 'I'
+
+# per ogni possibile byte, gli 8 flag corrispondenti (un byte 0/1 per bit, dal bit meno significativo).
+# Serve a espandere il bitset in una maschera di byte usabile da itertools.compress
+_EXPAND = [bytes((b >> i) & 1 for i in range(8)) for b in range(256)]
+# tabella per invertire tutti i bit di un byte con bytearray.translate
+_INVERT = bytes(255 - b for b in range(256))
+
+
+def bits_to_flags(bits: bytes) -> bytes:
+    """
+    Espande un bitset (little endian) in una maschera con un byte 0/1 per ogni bit.
+    """
+    return b"".join(map(_EXPAND.__getitem__, bits))
+
+
+class Bitmap:
+    """
+    Bitset denso indicizzato per docID: un bit per documento, memorizzati in un bytearray.
+    Le operazioni insiemistiche (complemento, AND, OR, AND-NOT) e l'estrazione dei docID
+    vengono eseguite in C (translate, int a precisione arbitraria, itertools.compress)
+    senza mai creare la lista di tutti i docID possibili.
+    """
+
+    def __init__(self, size: int = 0) -> None:
+        # numero di docID rappresentati: [0, size)
+        self._size = size
+        self._bits = bytearray((size + 7) >> 3)
+
+    @classmethod
+    def from_postings(cls, postings, size: int) -> 'Bitmap':
+        """
+        Crea una Bitmap di dimensione size con a 1 i bit dei docID contenuti in postings.
+        I docID >= size vengono ignorati.
+        """
+        bitmap = cls(size)
+        bits = bitmap._bits
+        for doc_id in postings:
+            if doc_id >= size:
+                break
+            bits[doc_id >> 3] |= 1 << (doc_id & 7)
+        return bitmap
+
+    def add(self, doc_id: int) -> None:
+        """
+        Imposta a 1 il bit del docID.
+        """
+        self._bits[doc_id >> 3] |= 1 << (doc_id & 7)
+
+    def discard(self, doc_id: int) -> None:
+        """
+        Imposta a 0 il bit del docID.
+        """
+        self._bits[doc_id >> 3] &= ~(1 << (doc_id & 7)) & 0xFF
+
+    def extend(self, n: int) -> None:
+        """
+        Aggiunge n docID (con bit a 0) in coda alla Bitmap.
+        """
+        self._size += n
+        self._bits.extend(bytes(((self._size + 7) >> 3) - len(self._bits)))
+
+    def copy(self) -> 'Bitmap':
+        """
+        Ritorna una copia indipendente della Bitmap.
+        """
+        result = type(self).__new__(type(self))
+        result.__setstate__(self.__getstate__())
+        return result
+
+    def count(self) -> int:
+        """
+        Ritorna il numero di bit a 1.
+        """
+        return int.from_bytes(self._bits, "little").bit_count()
+
+    def complement(self) -> 'Bitmap':
+        """
+        Ritorna una nuova Bitmap con tutti i bit invertiti (NOT).
+        """
+        result = Bitmap(self._size)
+        result._bits = self._bits.translate(_INVERT)
+        # azzera i bit di padding oltre size nell'ultimo byte
+        if self._size & 7:
+            result._bits[-1] &= (1 << (self._size & 7)) - 1
+        return result
+
+    def _combine(self, other: 'Bitmap', value: int) -> 'Bitmap':
+        size = max(self._size, other._size)
+        result = Bitmap(size)
+        result._bits = bytearray(value.to_bytes((size + 7) >> 3, "little"))
+        return result
+
+    def intersection(self, other: 'Bitmap') -> 'Bitmap':
+        """
+        AND bit a bit tra due Bitmap.
+        """
+        return self._combine(other, int.from_bytes(self._bits, "little") & int.from_bytes(other._bits, "little"))
+
+    def union(self, other: 'Bitmap') -> 'Bitmap':
+        """
+        OR bit a bit tra due Bitmap.
+        """
+        return self._combine(other, int.from_bytes(self._bits, "little") | int.from_bytes(other._bits, "little"))
+
+    def difference(self, other: 'Bitmap') -> 'Bitmap':
+        """
+        AND-NOT bit a bit: i bit a 1 in self e a 0 in other.
+        """
+        return self._combine(other, int.from_bytes(self._bits, "little") & ~int.from_bytes(other._bits, "little"))
+
+    def flags(self) -> bytes:
+        """
+        Espande il bitset in una maschera di size byte (1 se il bit è a 1, 0 altrimenti).
+        """
+        return bits_to_flags(self._bits)[:self._size]
+
+    def to_array(self) -> array:
+        """
+        Ritorna l'array ordinato dei docID con il bit a 1.
+        """
+        return array(DOC_ID_TYPECODE, compress(range(self._size), self.flags()))
+
+    def exclude(self, postings: array) -> array:
+        """
+        Ritorna i docID di postings (array ordinato) il cui bit è a 0 in un unico passaggio,
+        testando il bit di ogni docID: il costo dipende da len(postings), non dalla dimensione della Bitmap.
+        I docID >= size non sono rappresentati e vengono quindi mantenuti.
+        """
+        # i docID oltre la dimensione della bitmap vengono tenuti così come sono
+        split = bisect_left(postings, self._size)
+        result = array(DOC_ID_TYPECODE, filterfalse(self.__getitem__, postings[:split]))
+        result += postings[split:]
+        return result
+
+    def __getitem__(self, doc_id: int) -> bool:
+        return bool(self._bits[doc_id >> 3] >> (doc_id & 7) & 1)
+
+    def __contains__(self, doc_id: int) -> bool:
+        return 0 <= doc_id < self._size and self[doc_id]
+
+    def __iter__(self):
+        return iter(self.to_array())
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getstate__(self):
+        return (self._size, bytes(self._bits))
+
+    def __setstate__(self, state) -> None:
+        size, bits = state
+        self._size = size
+        self._bits = bytearray(bits)
+
+    def __repr__(self) -> str:
+        return f"Bitmap(size={self._size}, count={self.count()})"
+
+
+class InvalidVector(Bitmap):
+    """
+    Invalid vector dei documenti eliminati: un bit per docID (1 = eliminato),
+    più il numero di documenti eliminati e l'array ordinato dei loro docID,
+    così che il filtraggio dei risultati non debba scorrere l'intero corpus.
+    """
+
+    def __init__(self, size: int = 0) -> None:
+        super().__init__(size)
+        # docID eliminati, in ordine crescente
+        self.deleted_ids = array(DOC_ID_TYPECODE)
+
+    def delete(self, doc_id: int) -> None:
+        """
+        Marca il documento come eliminato (se non lo era già).
+        """
+        if not 0 <= doc_id < self._size:
+            raise IndexError(f"docID {doc_id} out of range")
+        if not self[doc_id]:
+            self.add(doc_id)
+            insort(self.deleted_ids, doc_id)
+
+    def delete_many(self, doc_ids) -> None:
+        """
+        Marca come eliminati tutti i documenti di doc_ids: i docID nuovi vengono ordinati
+        e uniti una sola volta a deleted_ids (invece di un insort per documento).
+        Se un docID non è valido solleva IndexError senza modificare il vettore.
+        """
+        doc_ids = set(doc_ids)
+        for doc_id in doc_ids:
+            if not 0 <= doc_id < self._size:
+                raise IndexError(f"docID {doc_id} out of range")
+        new_ids = [doc_id for doc_id in doc_ids if not self[doc_id]]
+        if not new_ids:
+            return
+        for doc_id in new_ids:
+            self.add(doc_id)
+        # due sequenze ordinate: timsort le unisce in tempo lineare
+        self.deleted_ids = array(DOC_ID_TYPECODE, sorted(chain(self.deleted_ids, new_ids)))
+
+    def exclude(self, postings: array) -> array:
+        """
+        Come Bitmap.exclude, ma se i documenti eliminati sono meno dei docID di postings
+        cerca ciascun eliminato in postings (ricerca binaria) e copia le parti rimaste a blocchi.
+        """
+        deleted = self.deleted_ids
+        if len(deleted) >= len(postings):
+            return super().exclude(postings)
+        result = array(DOC_ID_TYPECODE)
+        start = 0
+        for doc_id in deleted:
+            pos = bisect_left(postings, doc_id, start)
+            if pos < len(postings) and postings[pos] == doc_id:
+                result += postings[start:pos]
+                start = pos + 1
+        result += postings[start:]
+        return result
+
+    @property
+    def deleted_count(self) -> int:
+        """
+        Numero di documenti eliminati.
+        """
+        return len(self.deleted_ids)
+
+    def __getstate__(self):
+        return (self._size, bytes(self._bits), self.deleted_ids)
+
+    def __setstate__(self, state) -> None:
+        size, bits, deleted_ids = state
+        super().__setstate__((size, bits))
+        # array proprio: copy() non deve condividere i docID eliminati con lo snapshot di partenza
+        self.deleted_ids = array(DOC_ID_TYPECODE, deleted_ids)
+
+    def __repr__(self) -> str:
+        return f"InvalidVector(size={self._size}, deleted={self.deleted_count})"
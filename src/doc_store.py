@@ -0,0 +1,279 @@
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_right
+
+from src.mmap_index import align
+from src.movie_description import MovieDescription
+
+# offset a 64 bit: il file dei testi può superare i 4 GB
+OFFSET_TYPECODE = 'Q'
+# titolo dei documenti eliminati e rimossi dal corpus con un merge
+REDACTED = "REDACTED"
+
+# Formato binario di un DocStore (interi little endian):
+#   header: magic, versione, numero di documenti, numero di documenti eliminati, posizione delle sezioni
+#   title_offsets:       n + 1 uint64, i titoli sono titles_blob[title_offsets[i]:title_offsets[i + 1]]
+#   titles_blob:         titoli in UTF-8 concatenati, in ordine di docID
+#   description_offsets: n + 1 uint64, come title_offsets per le descrizioni
+#   descriptions_blob:   descrizioni in UTF-8 concatenate, in ordine di docID
+# Ogni sezione inizia a un offset multiplo di 8 (vedi src.mmap_index).
+DOCS_MAGIC = b"IRDS"
+DOCS_VERSION = 1
+DOCS_HEADER = struct.Struct("<4sHxxQQQQQQ")
+
+
+class StringColumn:
+    """
+    Colonna di stringhe su disco, append-only e indicizzata per docID: i testi UTF-8 sono
+    concatenati in un file (path + ".bin") e l'offset di inizio di ciascuno è salvato
+    in un secondo file (path + ".off"), così la lettura di un testo costa una sola pread.
+    In memoria restano solo gli offset (8 byte per documento).
+    I testi aggiunti sono subito leggibili; flush() rende persistenti gli offset.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Apre la colonna salvata in path (la crea vuota se non esiste).
+        """
+        self.path = path
+        self._offsets = array(OFFSET_TYPECODE, (0,))
+        if os.path.exists(path + ".off"):
+            with open(path + ".off", "rb") as f:
+                self._offsets = array(OFFSET_TYPECODE, f.read())
+        # scrittura non bufferizzata: i testi aggiunti sono subito visibili a os.pread
+        self._file = open(path + ".bin", "ab+", buffering=0)
+        # scarta gli eventuali testi scritti dopo l'ultimo flush (salvataggio interrotto)
+        self._file.truncate(self._offsets[-1])
+
+    @classmethod
+    def create(cls, path: str) -> 'StringColumn':
+        """
+        Crea una colonna vuota in path, eliminando quella eventualmente già presente.
+        """
+        for ext in (".bin", ".off"):
+            if os.path.exists(path + ext):
+                os.remove(path + ext)
+        return cls(path)
+
+    def append(self, texts) -> None:
+        """
+        Aggiunge i testi in fondo alla colonna (il primo avrà indice len(self)).
+        """
+        data = bytearray()
+        offsets = array(OFFSET_TYPECODE)
+        end = self._offsets[-1]
+        for text in texts:
+            data += text.encode("utf-8")
+            offsets.append(end + len(data))
+        self._file.write(data)
+        # gli offset vengono pubblicati dopo i testi: un lettore concorrente non legge mai oltre il file
+        self._offsets += offsets
+
+    def flush(self) -> None:
+        """
+        Salva su disco testi e offset (gli offset su un file temporaneo poi rinominato).
+        """
+        os.fsync(self._file.fileno())
+        with open(self.path + ".off.tmp", "wb") as f:
+            self._offsets.tofile(f)
+        os.replace(self.path + ".off.tmp", self.path + ".off")
+
+    def move(self, path: str) -> None:
+        """
+        Salva la colonna e la sposta in path, sostituendo quella eventualmente già presente
+        (es. una colonna costruita in un percorso temporaneo che prende il posto di quella salvata).
+        """
+        self.flush()
+        for ext in (".bin", ".off"):
+            os.replace(self.path + ext, path + ext)
+        self.path = path
+
+    def remove(self) -> None:
+        """
+        Chiude la colonna ed elimina i suoi file.
+        """
+        self.close()
+        for ext in (".bin", ".off"):
+            if os.path.exists(self.path + ext):
+                os.remove(self.path + ext)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __getitem__(self, i: int) -> str:
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return os.pread(self._file.fileno(), end - start, start).decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __repr__(self) -> str:
+        return f"StringColumn(path={self.path!r}, size={len(self)})"
+
+
+def _column(texts) -> tuple[array, bytes]:
+    # offset e blob di una colonna di testi (già codificati in UTF-8)
+    offsets = array(OFFSET_TYPECODE, (0,))
+    blob = bytearray()
+    for data in texts:
+        blob += data
+        offsets.append(len(blob))
+    return offsets, bytes(blob)
+
+
+class DocStore:
+    """
+    Documenti di un segmento in formato colonnare: titoli e descrizioni UTF-8 concatenati in due blob,
+    con gli offset di inizio di ciascun documento, al posto di una lista di oggetti MovieDescription.
+    La lettura per posizione (docID - primo docID del segmento) costa O(1) e decodifica solo il campo
+    richiesto. Un DocStore salvato su disco viene mappato in memoria: l'apertura non legge i testi.
+    I DocStore sono immutabili: il merge dei segmenti ne crea uno nuovo con i documenti eliminati
+    sostituiti da REDACTED.
+    """
+
+    def __init__(self, title_offsets, titles, description_offsets, descriptions, redacted: int = 0) -> None:
+        # array o memoryview sul file mappato
+        self._title_offsets = title_offsets
+        self._titles = titles
+        self._description_offsets = description_offsets
+        self._descriptions = descriptions
+        # numero di documenti REDACTED
+        self.redacted = redacted
+        self._mmap = None
+
+    @classmethod
+    def from_docs(cls, docs: list[MovieDescription], descriptions: bool = True) -> 'DocStore':
+        """
+        Crea il DocStore dei documenti docs. Con descriptions=False salva solo i titoli
+        (le descrizioni sono in una StringColumn su disco).
+        """
+        title_offsets, titles = _column(doc.title.encode("utf-8") for doc in docs)
+        description_offsets, description_blob = _column(
+            (doc.description or "").encode("utf-8") if descriptions else b"" for doc in docs)
+        return cls(title_offsets, titles, description_offsets, description_blob,
+                   sum(doc.title == REDACTED for doc in docs))
+
+    @classmethod
+    def merge(cls, stores: list['DocStore'], deleted) -> 'DocStore':
+        """
+        Concatena i DocStore di segmenti contigui sostituendo con REDACTED (e descrizione vuota)
+        i documenti alle posizioni deleted (posizioni nella concatenazione, in ordine crescente).
+        I testi degli altri documenti vengono copiati senza decodificarli.
+        """
+        deleted = set(deleted)
+        redacted = REDACTED.encode("utf-8")
+        titles = []
+        descriptions = []
+        pos = 0
+        for store in stores:
+            for i in range(len(store)):
+                if pos in deleted:
+                    titles.append(redacted)
+                    descriptions.append(b"")
+                else:
+                    titles.append(store._field(store._title_offsets, store._titles, i))
+                    descriptions.append(store._field(store._description_offsets, store._descriptions, i))
+                pos += 1
+        title_offsets, title_blob = _column(titles)
+        description_offsets, description_blob = _column(descriptions)
+        return cls(title_offsets, title_blob, description_offsets, description_blob, titles.count(redacted))
+
+    @staticmethod
+    def _field(offsets, blob, i: int) -> bytes:
+        return bytes(blob[offsets[i]:offsets[i + 1]])
+
+    def title(self, i: int) -> str:
+        return self._field(self._title_offsets, self._titles, i).decode("utf-8")
+
+    def description(self, i: int) -> str:
+        return self._field(self._description_offsets, self._descriptions, i).decode("utf-8")
+
+    @property
+    def live_count(self) -> int:
+        """
+        Numero di documenti non REDACTED.
+        """
+        return len(self) - self.redacted
+
+    def write(self, filepath: str) -> None:
+        """
+        Salva il DocStore nel formato binario (su un file temporaneo poi rinominato).
+        """
+        tmp_path = filepath + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(bytes(DOCS_HEADER.size))
+            positions = []
+            for section in (self._title_offsets, self._titles, self._description_offsets, self._descriptions):
+                align(f)
+                positions.append(f.tell())
+                f.write(section)
+            f.seek(0)
+            f.write(DOCS_HEADER.pack(DOCS_MAGIC, DOCS_VERSION, len(self), self.redacted, *positions))
+        os.replace(tmp_path, filepath)
+
+    @classmethod
+    def load(cls, filepath: str) -> 'DocStore':
+        """
+        Apre un DocStore salvato con write mappandolo in memoria.
+        """
+        with open(filepath, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_docs, redacted, *positions = DOCS_HEADER.unpack_from(mm, 0)
+        if magic != DOCS_MAGIC or version != DOCS_VERSION:
+            raise ValueError(f"{filepath} is not a document store (version {DOCS_VERSION})")
+        title_offsets_pos, titles_pos, description_offsets_pos, descriptions_pos = positions
+        view = memoryview(mm)
+        size = 8 * (n_docs + 1)
+        title_offsets = view[title_offsets_pos:title_offsets_pos + size].cast(OFFSET_TYPECODE)
+        description_offsets = view[description_offsets_pos:description_offsets_pos + size].cast(OFFSET_TYPECODE)
+        store = cls(title_offsets, view[titles_pos:titles_pos + title_offsets[-1]], description_offsets,
+                    view[descriptions_pos:descriptions_pos + description_offsets[-1]], redacted)
+        store._mmap = mm
+        return store
+
+    def __getitem__(self, i: int) -> MovieDescription:
+        return MovieDescription(self.title(i), self.description(i))
+
+    def __len__(self) -> int:
+        return len(self._title_offsets) - 1
+
+    def __repr__(self) -> str:
+        return f"DocStore(docs={len(self)}, redacted={self.redacted})"
+
+
+class CorpusView:
+    """
+    Corpus in sola lettura sopra i DocStore dei segmenti di uno snapshot: docID -> documento,
+    cercando il segmento con una ricerca binaria sul primo docID.
+    """
+    __slots__ = ("_segments", "_firsts")
+
+    def __init__(self, segments) -> None:
+        self._segments = segments
+        self._firsts = [segment.first_doc for segment in segments]
+
+    def _locate(self, doc_id: int):
+        segment = self._segments[bisect_right(self._firsts, doc_id) - 1]
+        return segment.docs, doc_id - segment.first_doc
+
+    def title(self, doc_id: int) -> str:
+        docs, i = self._locate(doc_id)
+        return docs.title(i)
+
+    def description(self, doc_id: int) -> str:
+        docs, i = self._locate(doc_id)
+        return docs.description(i)
+
+    def __getitem__(self, doc_id: int) -> MovieDescription:
+        docs, i = self._locate(doc_id)
+        return docs[i]
+
+    def __len__(self) -> int:
+        return sum(len(segment.docs) for segment in self._segments)
+
+    def __iter__(self):
+        for segment in self._segments:
+            for i in range(len(segment.docs)):
+                yield segment.docs[i]
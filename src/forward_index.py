@@ -0,0 +1,174 @@
+import os
+import pickle
+from array import array
+from bisect import bisect_right
+
+# tipo degli array degli id dei termini e degli offset per documento
+ID_TYPECODE = 'I'
+OFFSET_TYPECODE = 'Q'
+
+
+class ForwardColumn:
+    """
+    Forward index di un blocco di documenti per un solo indice (InvertedIndex o indice per le frasi):
+    per ogni documento (posizione nel blocco) gli id dei termini in cui compare, nel formato CSR
+    di DocStore: gli id di tutti i documenti sono concatenati in ids e quelli del documento i
+    sono in ids[offsets[i]:offsets[i + 1]]. Gli id sono le posizioni dei termini in terms.
+    """
+    __slots__ = ("terms", "offsets", "ids")
+
+    def __init__(self, terms: list[str], offsets: array, ids: array) -> None:
+        self.terms = terms
+        self.offsets = offsets
+        self.ids = ids
+
+    @classmethod
+    def from_index(cls, idx, first_doc: int, doc_count: int) -> 'ForwardColumn':
+        """
+        Inverte l'indice idx, che contiene i documenti con docID in [first_doc, first_doc + doc_count).
+        """
+        terms = []
+        doc_terms = [array(ID_TYPECODE) for _ in range(doc_count)]
+        for term_id, (term, postings) in enumerate(idx.btree.items()):
+            terms.append(term)
+            for doc_id in postings:
+                doc_terms[doc_id - first_doc].append(term_id)
+        offsets = array(OFFSET_TYPECODE, [0])
+        ids = array(ID_TYPECODE)
+        for doc_ids in doc_terms:
+            ids += doc_ids
+            offsets.append(len(ids))
+        return cls(terms, offsets, ids)
+
+    @classmethod
+    def compact(cls, columns: list[tuple[int, 'ForwardColumn']], purged: frozenset) -> 'ForwardColumn':
+        """
+        Unisce le colonne contigue columns ((posizione del primo documento, colonna)) in una sola colonna
+        con un solo vocabolario. I documenti in posizione purged restano senza termini
+        e i termini che compaiono solo in quei documenti non vengono copiati.
+        """
+        term_ids = {}
+        offsets = array(OFFSET_TYPECODE, [0])
+        ids = array(ID_TYPECODE)
+        for first, column in columns:
+            # id dei documenti non rimossi, con gli offset rispetto a kept
+            kept = array(ID_TYPECODE)
+            kept_offsets = array(OFFSET_TYPECODE)
+            for pos in range(len(column)):
+                if first + pos not in purged:
+                    kept += column.ids[column.offsets[pos]:column.offsets[pos + 1]]
+                kept_offsets.append(len(kept))
+            # nuovi id dei soli termini usati dai documenti non rimossi
+            remap = {term_id: term_ids.setdefault(column.terms[term_id], len(term_ids)) for term_id in set(kept)}
+            start = len(ids)
+            ids += array(ID_TYPECODE, map(remap.__getitem__, kept))
+            offsets += array(OFFSET_TYPECODE, [start + offset for offset in kept_offsets])
+        return cls(list(term_ids), offsets, ids)
+
+    def keys(self, pos: int) -> list[str]:
+        """
+        Ritorna i termini del documento in posizione pos.
+        """
+        terms = self.terms
+        return [terms[term_id] for term_id in self.ids[self.offsets[pos]:self.offsets[pos + 1]]]
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+
+class ForwardIndex:
+    """
+    Forward index (opzionale) di un segmento: per ogni documento i termini dell'InvertedIndex
+    e le chiavi dell'indice per le frasi (biword o parole dell'indice posizionale) in cui compare,
+    come liste compatte di id. Serve a rimuovere i documenti eliminati riscrivendo solo
+    le PostingsList dei termini che compaiono in quei documenti, invece di tutto l'indice.
+    È immutabile come il segmento: è formato da blocchi (uno per segmento unito da un merge),
+    con purged le posizioni dei documenti già rimossi dagli indici.
+    Il segmento creato da un merge ha il forward index compattato (compact) in un solo blocco.
+    """
+    __slots__ = ("blocks", "purged", "_firsts")
+
+    def __init__(self, blocks: list[tuple[int, ForwardColumn, ForwardColumn]], purged: frozenset = frozenset()) -> None:
+        # (posizione del primo documento del blocco, termini, chiavi per le frasi oppure None)
+        self.blocks = blocks
+        self.purged = purged
+        self._firsts = [first for first, _, _ in blocks]
+
+    @classmethod
+    def from_indexes(cls, index, phrase_idx, first_doc: int, doc_count: int) -> 'ForwardIndex':
+        """
+        Crea il forward index di un segmento invertendo il suo InvertedIndex e l'indice per le frasi.
+        """
+        phrases = ForwardColumn.from_index(phrase_idx, first_doc, doc_count) if phrase_idx is not None else None
+        return cls([(0, ForwardColumn.from_index(index, first_doc, doc_count), phrases)])
+
+    @classmethod
+    def concat(cls, forwards: list['ForwardIndex'], doc_counts: list[int]) -> 'ForwardIndex':
+        """
+        Forward index dei segmenti contigui uniti da un merge (doc_counts: documenti di ogni segmento).
+        """
+        blocks = []
+        purged = set()
+        start = 0
+        for forward, doc_count in zip(forwards, doc_counts):
+            blocks += [(start + first, terms, phrases) for first, terms, phrases in forward.blocks]
+            purged.update(start + pos for pos in forward.purged)
+            start += doc_count
+        return cls(blocks, frozenset(purged))
+
+    def affected(self, positions) -> tuple[set[str], set[str]]:
+        """
+        Ritorna i termini e le chiavi per le frasi dei documenti in posizione positions
+        non ancora rimossi dagli indici: sono le sole PostingsList da riscrivere.
+        """
+        terms = set()
+        phrases = set()
+        for pos in positions:
+            if pos in self.purged:
+                continue
+            first, doc_terms, doc_phrases = self.blocks[bisect_right(self._firsts, pos) - 1]
+            terms.update(doc_terms.keys(pos - first))
+            if doc_phrases is not None:
+                phrases.update(doc_phrases.keys(pos - first))
+        return terms, phrases
+
+    def purge(self, positions) -> 'ForwardIndex':
+        """
+        Ritorna il forward index con i documenti in posizione positions segnati come rimossi.
+        """
+        return ForwardIndex(self.blocks, self.purged | frozenset(positions))
+
+    def compact(self) -> 'ForwardIndex':
+        """
+        Ritorna il forward index con un solo blocco e un solo vocabolario, senza i termini
+        dei documenti in purged: la memoria resta proporzionale ai documenti non ancora rimossi.
+        """
+        phrases = None
+        if all(doc_phrases is not None for _, _, doc_phrases in self.blocks):
+            phrases = ForwardColumn.compact([(first, doc_phrases) for first, _, doc_phrases in self.blocks],
+                                            self.purged)
+        terms = ForwardColumn.compact([(first, doc_terms) for first, doc_terms, _ in self.blocks], self.purged)
+        return ForwardIndex([(0, terms, phrases)])
+
+    def write(self, filepath: str) -> None:
+        """
+        Salva il forward index in filepath (scrive in un file temporaneo e lo rinomina).
+        """
+        tmp_path = filepath + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, filepath)
+
+    @staticmethod
+    def load(filepath: str) -> 'ForwardIndex':
+        with open(filepath, "rb") as f:
+            return pickle.load(f)
+
+    def __getstate__(self):
+        return self.blocks, self.purged
+
+    def __setstate__(self, state) -> None:
+        self.__init__(*state)
+
+    def __repr__(self) -> str:
+        return f"ForwardIndex(blocks={len(self.blocks)}, purged={len(self.purged)})"
@@ -0,0 +1,156 @@
+from array import array
+from collections import Counter
+
+from src.bitmap import DOC_ID_TYPECODE
+from src.postings_list import PostingsList, encode_vbyte, decode_vbyte, delta_encode, delta_decode
+
+# term frequency a 16 bit (le frequenze più alte vengono troncate)
+TF_TYPECODE = 'H'
+MAX_TF = 0xFFFF
+
+
+class FrequencyPostingsList(PostingsList):
+    """
+    PostingsList che, per ogni docID, salva anche la term frequency (numero di occorrenze
+    del termine nel documento), in un array parallelo ai docID. Usata per il ranking BM25.
+    Essendo una PostingsList, le operazioni booleane funzionano senza modifiche
+    (e ritornano PostingsList semplici).
+    """
+    __slots__ = ("_frequencies",)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._frequencies: array = array(TF_TYPECODE)
+
+    @classmethod
+    def from_arrays(cls, doc_ids: array, frequencies: array) -> 'FrequencyPostingsList':
+        """
+        Crea la lista da un array ordinato di docID e dall'array parallelo delle frequenze (nessuna copia).
+        """
+        plist = cls()
+        plist._postings_list = doc_ids
+        plist._frequencies = frequencies
+        return plist
+
+    def append(self, doc_id: int, tf: int) -> None:
+        """
+        Aggiunge un documento con docID maggiore di quelli già presenti (usata durante la costruzione).
+        """
+        self._postings_list.append(doc_id)
+        self._frequencies.append(min(tf, MAX_TF))
+
+    def frequencies(self) -> array:
+        """
+        Ritorna le term frequency, parallele ai docID (senza copiarle: non vanno modificate).
+        """
+        return self._frequencies
+
+    def union(self, other) -> PostingsList:
+        """
+        Unione con un'altra FrequencyPostingsList mantenendo le frequenze (per i documenti comuni
+        le somma); con altri tipi di posting list ritorna una PostingsList semplice.
+        """
+        if not isinstance(other, FrequencyPostingsList):
+            return super().union(other)
+        left, right = self._postings_list, other._postings_list
+        # caso tipico (segmenti in ordine di docID): basta concatenare
+        if not left or not right or left[-1] < right[0]:
+            return FrequencyPostingsList.from_arrays(left + right, self._frequencies + other._frequencies)
+        if right[-1] < left[0]:
+            return FrequencyPostingsList.from_arrays(right + left, other._frequencies + self._frequencies)
+        counts = Counter(dict(zip(left, self._frequencies)))
+        counts.update(dict(zip(right, other._frequencies)))
+        doc_ids = sorted(counts)
+        return FrequencyPostingsList.from_arrays(
+            array(DOC_ID_TYPECODE, doc_ids), array(TF_TYPECODE, (min(counts[d], MAX_TF) for d in doc_ids)))
+
+    def merge(self, other) -> 'FrequencyPostingsList':
+        """
+        Aggiunge a questa lista i docID (e le frequenze) di other.
+        """
+        merged = self.union(other)
+        self._postings_list = merged._postings_list
+        self._frequencies = merged._frequencies if isinstance(merged, FrequencyPostingsList) \
+            else array(TF_TYPECODE, [1] * len(merged))
+        return self
+
+    def select(self, keep) -> 'FrequencyPostingsList':
+        """
+        Ritorna una nuova lista con i soli documenti per cui keep(doc_id) è vero.
+        """
+        kept = [i for i, doc_id in enumerate(self._postings_list) if keep(doc_id)]
+        return FrequencyPostingsList.from_arrays(
+            array(DOC_ID_TYPECODE, map(self._postings_list.__getitem__, kept)),
+            array(TF_TYPECODE, map(self._frequencies.__getitem__, kept)))
+
+    def encode(self) -> bytes:
+        """
+        Codifica la lista con variable-byte encoding: numero di documenti, gap tra i docID e frequenze.
+        """
+        encoded = bytearray()
+        encode_vbyte((len(self._postings_list),), encoded)
+        encode_vbyte(delta_encode(self._postings_list), encoded)
+        encode_vbyte(self._frequencies, encoded)
+        return bytes(encoded)
+
+    @classmethod
+    def decode(cls, data: bytes) -> 'FrequencyPostingsList':
+        """
+        Decodifica una lista prodotta da encode().
+        """
+        (n,), pos = decode_vbyte(data, 0, 1)
+        gaps, pos = decode_vbyte(data, pos, n)
+        frequencies, _ = decode_vbyte(data, pos, n)
+        return cls.from_arrays(array(DOC_ID_TYPECODE, delta_decode(gaps)), array(TF_TYPECODE, frequencies))
+
+    def __getstate__(self) -> bytes:
+        return self.encode()
+
+    def __setstate__(self, state) -> None:
+        decoded = FrequencyPostingsList.decode(state)
+        self._postings_list, self._frequencies = decoded._postings_list, decoded._frequencies
+
+
+def add_frequencies(terms: dict, tokens: list[str], doc_id: int) -> None:
+    """
+    Aggiunge doc_id, con il numero di occorrenze, alla FrequencyPostingsList
+    di ciascun termine di tokens (creandola se il termine è nuovo).
+    """
+    for term, tf in Counter(tokens).items():
+        plist = terms.get(term)
+        if plist is None:
+            terms[term] = plist = FrequencyPostingsList()
+        plist.append(doc_id, tf)
+
+
+def pack_frequencies(terms: dict) -> tuple[list[str], array, array, array]:
+    """
+    Converte una mappa termine -> FrequencyPostingsList in (termini, offset, docID concatenati,
+    frequenze concatenate): i docID del termine i sono doc_ids[offsets[i]:offsets[i + 1]].
+    """
+    offsets = array(DOC_ID_TYPECODE, (0,))
+    doc_ids = array(DOC_ID_TYPECODE)
+    frequencies = array(TF_TYPECODE)
+    for plist in terms.values():
+        doc_ids += plist._postings_list
+        frequencies += plist._frequencies
+        offsets.append(len(doc_ids))
+    return list(terms), offsets, doc_ids, frequencies
+
+
+def merge_frequency_shards(shards: list[tuple[list[str], array, array, array]]) -> dict:
+    """
+    Unisce le mappe compatte (pack_frequencies) di più shard, in ordine di shard,
+    in una mappa termine -> FrequencyPostingsList concatenando i pezzi di ogni shard.
+    """
+    merged = {}
+    for terms, offsets, doc_ids, frequencies in shards:
+        for i, term in enumerate(terms):
+            lo, hi = offsets[i], offsets[i + 1]
+            plist = merged.get(term)
+            if plist is None:
+                merged[term] = FrequencyPostingsList.from_arrays(doc_ids[lo:hi], frequencies[lo:hi])
+            else:
+                plist._postings_list += doc_ids[lo:hi]
+                plist._frequencies += frequencies[lo:hi]
+    return merged
@@ -0,0 +1,121 @@
+from array import array
+
+from src.vocabulary import Vocabulary
+
+# carattere che marca un termine da cercare con tolleranza agli errori (es. "detectve~", "detectve~1")
+FUZZY = "~"
+# distanza di edit massima supportata
+MAX_EDIT_DISTANCE = 2
+# le cancellazioni vengono calcolate solo sui primi PREFIX_LENGTH caratteri dei termini:
+# limita le varianti per termine (al più 1 + 7 + 21 con distanza 2) senza perdere risultati,
+# perché la distanza tra i prefissi di uguale lunghezza non supera quella tra le parole intere
+PREFIX_LENGTH = 7
+ID_TYPECODE = 'I'
+
+
+def is_fuzzy(term: str) -> bool:
+    return FUZZY in term
+
+
+def parse_fuzzy(term: str) -> tuple[str, int]:
+    """
+    Divide un termine "parola~N" in parola e distanza massima. Senza N la distanza dipende
+    dalla lunghezza della parola: 0 fino a 2 caratteri, 1 fino a 5, altrimenti 2.
+    """
+    word, _, distance = term.partition(FUZZY)
+    if distance:
+        return word, min(int(distance), MAX_EDIT_DISTANCE)
+    return word, 0 if len(word) <= 2 else 1 if len(word) <= 5 else 2
+
+
+def deletes(word: str, distance: int) -> set[str]:
+    """
+    Ritorna le varianti di word ottenute cancellando al più distance caratteri (word compresa),
+    con distance al più MAX_EDIT_DISTANCE: ogni coppia di posizioni viene generata una sola volta.
+    """
+    variants = {word}
+    if distance < 1:
+        return variants
+    n = len(word)
+    for i in range(n):
+        shorter = word[:i] + word[i + 1:]
+        variants.add(shorter)
+        if distance >= 2:
+            # la seconda cancellazione solo dalla posizione i in poi (le precedenti sono già generate)
+            for j in range(i, n - 1):
+                variants.add(shorter[:j] + shorter[j + 1:])
+    return variants
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Distanza di edit tra a e b (inserimenti, cancellazioni, sostituzioni e scambi di caratteri
+    adiacenti), calcolata riga per riga; si ferma appena supera max_distance
+    (in quel caso ritorna max_distance + 1).
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+class FuzzyIndex(Vocabulary):
+    """
+    Vocabolario per la ricerca tollerante agli errori di battitura (distanza di edit al più 2),
+    con l'algoritmo symmetric delete: per ogni termine vengono precalcolate le varianti ottenute
+    cancellando fino a MAX_EDIT_DISTANCE caratteri (variante -> id dei termini). Due parole
+    a distanza d hanno una variante comune con al più d cancellazioni ciascuna, quindi i candidati
+    per una parola sono i termini delle sue varianti, verificati poi con edit_distance:
+    il costo di una ricerca dipende dalla lunghezza della parola, non dalla dimensione del vocabolario.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        # variante -> id dell'unico termine che la genera, oppure array ordinato degli id dei termini
+        # (quasi tutte le varianti hanno un solo termine: niente array per ciascuna)
+        self._deletes = {}
+
+    def _index_term(self, term_id: int, term: str) -> None:
+        # gli id crescono, quindi le liste delle varianti restano ordinate
+        variants = self._deletes
+        for variant in deletes(term[:PREFIX_LENGTH], MAX_EDIT_DISTANCE):
+            ids = variants.get(variant)
+            if ids is None:
+                variants[variant] = term_id
+            elif type(ids) is int:
+                variants[variant] = array(ID_TYPECODE, (ids, term_id))
+            else:
+                ids.append(term_id)
+
+    def expand(self, term: str) -> set[str]:
+        """
+        Ritorna i termini dell'indice a distanza di edit al più N da un termine "parola~N"
+        (vedi parse_fuzzy), compresa la parola stessa se è nel vocabolario.
+        """
+        word, distance = parse_fuzzy(term)
+        candidates = set()
+        for variant in deletes(word[:PREFIX_LENGTH], distance):
+            ids = self._deletes.get(variant)
+            if ids is None:
+                continue
+            if type(ids) is int:
+                candidates.add(ids)
+            else:
+                candidates.update(ids)
+        terms = self._terms
+        return self._targets_of(term_id for term_id in candidates
+                                if edit_distance(word, terms[term_id], distance) <= distance)
+
+    def __repr__(self) -> str:
+        return f"FuzzyIndex(terms={len(self)}, deletes={len(self._deletes)})"
@@ -0,0 +1,45 @@
+from src.inverted_index import InvertedIndex
+from src.bitmap import InvalidVector
+from src.segment import Segment
+from src.doc_store import CorpusView
+
+
+class IndexSnapshot:
+    """
+    Stato immutabile del sistema IR letto dalle query: i segmenti (in ordine crescente di docID)
+    e l'invalid vector.
+    Le modifiche (aggiunte, eliminazioni, merge) non toccano mai uno snapshot esistente
+    ma ne creano uno nuovo che viene sostituito atomicamente a quello corrente.
+    """
+
+    def __init__(self, segments: tuple[Segment, ...], invalid_vec: InvalidVector) -> None:
+        self.segments = tuple(segments)
+        self.invalid_vec = invalid_vec
+
+    def replace(self, **changes) -> 'IndexSnapshot':
+        """
+        Ritorna un nuovo snapshot uguale a questo tranne che per i campi specificati.
+        """
+        fields = dict(vars(self))
+        fields.update(changes)
+        return IndexSnapshot(**fields)
+
+    def replace_segments(self, old: list[Segment], new: Segment) -> 'IndexSnapshot':
+        """
+        Ritorna un nuovo snapshot in cui i segmenti contigui old sono sostituiti dal segmento new.
+        """
+        start = self.segments.index(old[0])
+        segments = self.segments[:start] + (new,) + self.segments[start + len(old):]
+        return self.replace(segments=segments)
+
+    def corpus(self) -> CorpusView:
+        """
+        Ritorna il corpus dello snapshot (docID -> documento, dai DocStore dei segmenti).
+        """
+        return CorpusView(self.segments)
+
+    def term_segments(self) -> list[InvertedIndex]:
+        """
+        Ritorna gli InvertedIndex dei termini da interrogare, in ordine crescente di docID.
+        """
+        return [segment.index for segment in self.segments]
@@ -1,18 +1,24 @@
-import re
+import os
 import pickle
+from array import array
+# pool di processi per costruire l'indice in parallelo
+from concurrent.futures import ProcessPoolExecutor
 # barra di avanzamento per visualizzare lo stato durante la creazione dell'indice
 from tqdm import tqdm
 from BTrees._OOBTree import OOBTree
-from stop_words import get_stop_words
-# per memorizzare i risultati dello stemming ed evitare calcoli ripetuti
-from functools import lru_cache
-# stemmer per ridurre le parole alla loro radice
-from nltk.stem import SnowballStemmer
+from functools import partial
 
 from src.postings_list import PostingsList
+from src.roaring_postings import RoaringPostingsList
+from src.positional_postings import (PositionalPostingsList, add_positions, pack_positions,
+                                      merge_position_shards)
+from src.frequency_postings import FrequencyPostingsList, add_frequencies, pack_frequencies, merge_frequency_shards
+from src.mmap_index import MmapTermDictionary, write_mmap_index, is_mmap_index
+from src.bitmap import Bitmap, DOC_ID_TYPECODE
 from src.movie_description import MovieDescription
-
-STOP_WORDS = set(get_stop_words('english'))
+from src.tokenizer import TOKENIZER
+# numero minimo di documenti per processo: sotto questa soglia il pool costa più di quanto fa risparmiare
+MIN_DOCS_PER_PROCESS = 2000
 
 
 class InvertedIndex:
@@ -24,94 +30,109 @@ class InvertedIndex:
     def __init__(self) -> None:
         # Inizializza l'indice come un BTree per rendere più efficienti le operazioni di aggiornamento e ricerca
         self.btree = OOBTree()
+        # lunghezze (numero di termini) dei documenti indicizzati, a partire dal primo, per il ranking BM25;
+        # None se l'indice non è stato costruito per il ranking
+        self.doc_lengths = None
 
     @classmethod
-    def create_idx_from_corpus(cls, corpus: list[MovieDescription], max_size=0) -> 'InvertedIndex':
+    def create_indexes_from_corpus(cls, corpus: list[MovieDescription], max_size=0, processes: int = 1,
+                                   roaring_min_df: int = None, positional: bool = False,
+                                   ranked: bool = False) -> tuple['InvertedIndex', 'InvertedIndex']:
         """
-        Crea un InvertedIndex a partire da un corpus di descrizioni di film.
+        Crea insieme InvertedIndex e biword index con una sola tokenizzazione per documento.
+        Con positional=True al posto del biword index crea un indice posizionale
+        (parola -> PositionalPostingsList) per le phrase query esatte.
+        Con ranked=True l'InvertedIndex salva anche term frequency (FrequencyPostingsList)
+        e lunghezze dei documenti, usate dal ranking BM25.
+        Con processes > 1 il corpus viene diviso in shard di documenti consecutivi, ogni processo
+        costruisce le mappe termine -> docID del proprio shard e i risultati vengono uniti
+        in ordine di shard (merge_shards). processes=None usa tutti i core.
         """
-        # dizionario temporaneo per tenere l'indice che stiamo creando
-        terms = {}
-        # per ogni documento
-        for doc_id, content in enumerate(tqdm(corpus), start=max_size):
-            # tokenizza la descrizione (normalizzazione + stop word + stemming)
-            tokens_list = tokenize(content.description)
-            # crea un set per rimuovere i duplicati
-            tokens = set(tokens_list)
-            # per ogni termine
-            for token in tokens:
-                # crea una PostingsList con solo questo documento
-                plist = PostingsList.create_posting_list_from_single_docID(
-                    doc_id)
-                # se contenuto
-                if token in terms:
-                    # aggiunge doc_id alla PostingsList esistente
-                    terms[token].merge(plist)
-                else:
-                    # altrimenti crea una nuova PostingsList
-                    terms[token] = plist
-        # carica tutto nel BTree
+        if processes is None:
+            processes = os.cpu_count() or 1
+        # non usa più processi di quanti ne servano per la dimensione del corpus
+        processes = max(1, min(processes, len(corpus) // MIN_DOCS_PER_PROCESS))
+        descriptions = [content.description for content in corpus]
+        # più shard che processi, per bilanciare il carico
+        n_shards = processes * 4 if processes > 1 else 1
+        shard_size = max(1, -(-len(descriptions) // n_shards))
+        shards = [(descriptions[start:start + shard_size], max_size + start)
+                  for start in range(0, len(descriptions), shard_size)]
+
+        if processes > 1:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                results = list(tqdm(pool.map(partial(index_shard_packed, positional=positional, ranked=ranked),
+                                             shards), total=len(shards)))
+            packed_terms = [packed for packed, _, _, _ in results]
+            terms = merge_frequency_shards(packed_terms) if ranked else merge_shards(packed_terms)
+            packed_phrases = [packed for _, packed, _, _ in results]
+            phrases = merge_position_shards(packed_phrases) if positional else merge_shards(packed_phrases)
+            doc_lengths = array(DOC_ID_TYPECODE)
+            for _, _, lengths, stems in results:
+                doc_lengths += lengths
+                # gli stem calcolati dai processi entrano nel dizionario del tokenizer di questo processo
+                TOKENIZER.warm(stems)
+        else:
+            terms, phrases, doc_lengths = index_shard(shards[0], progress=True, positional=positional,
+                                                      ranked=ranked) if shards else ({}, {}, array(DOC_ID_TYPECODE))
+            if not ranked:
+                terms = freeze_postings(terms)
+            if not positional:
+                phrases = freeze_postings(phrases)
+
         idx = cls()
-        idx.btree.update(terms)
-        return idx
+        idx.btree.update(to_roaring(terms, roaring_min_df))
+        if ranked:
+            idx.doc_lengths = doc_lengths
+        phrase_idx = cls()
+        # le PositionalPostingsList restano tali (le RoaringPostingsList non hanno posizioni)
+        phrase_idx.btree.update(phrases if positional else to_roaring(phrases, roaring_min_df))
+        return idx, phrase_idx
 
     @classmethod
-    def create_biword_from_corpus(cls, corpus: list[MovieDescription], max_size=0) -> 'InvertedIndex':
+    def merge_all(cls, indexes: list['InvertedIndex']) -> 'InvertedIndex':
         """
-        Crea un biword index: ogni termine dell'indice è una coppia di parole consecutive (per le phrase queries).
+        Crea un nuovo InvertedIndex che unisce gli indici dati (in ordine crescente di docID)
+        senza modificarli: le PostingsList dei termini presenti in più indici vengono unite
+        in nuove PostingsList, le altre vengono condivise.
         """
-        # dizionario temporaneo per tenere l'indice che stiamo creando
-        terms = {}
-        # per ogni documento
-        for doc_id, content in enumerate(tqdm(corpus), start=max_size):
-            # normalizza e divide la descrizione in token
-            tokens = normalize(content.description).split()
-            # per ogni parola
-            for i in range(len(tokens) - 1):
-                # crea il biword concatenando due token consecutivi
-                biword = tokens[i]+tokens[i + 1]
-                # crea una PostingsList con solo questo documento
-                plist = PostingsList.create_posting_list_from_single_docID(
-                    doc_id)
-                # se contenuto
-                if biword in terms:
-                    # aggiunge doc_id alla PostingsList esistente
-                    terms[biword].merge(plist)
-                else:
-                    # altrimenti crea una nuova PostingsList
-                    terms[biword] = plist
-        # carica tutto nel BTree
         idx = cls()
-        idx.btree.update(terms)
+        for other in indexes:
+            for term, postings in other.btree.items():
+                base = idx.btree.get(term)
+                idx.btree[term] = postings if base is None else base.union(postings)
+        # le lunghezze dei documenti si concatenano (solo se tutti gli indici le hanno)
+        if indexes and all(other.doc_lengths is not None for other in indexes):
+            idx.doc_lengths = array(DOC_ID_TYPECODE)
+            for other in indexes:
+                # (array in memoria o memoryview sul file mappato: in entrambi i casi copia i byte)
+                idx.doc_lengths.frombytes(memoryview(other.doc_lengths).cast('B'))
         return idx
 
-    def merge(self, other: 'InvertedIndex') -> 'InvertedIndex':
-        """
-        Unisce questo InvertedIndex con un altro.
-        """
-        for term, postings in other.btree.items():
-            if term in self.btree:
-                self.btree[term].merge(postings)
-            else:
-                self.btree[term] = postings
-        return self
-
-    def remove_deleted_docs(self, invalid_vec: list[bool]) -> 'InvertedIndex':
+    def remove_deleted_docs(self, invalid_vec: Bitmap, terms=None) -> 'InvertedIndex':
         """
-        Rimuove dall'indice i documenti marcati come eliminati (invalid_vec[i] == True).
+        Rimuove dall'indice i documenti marcati come eliminati (bit a 1 in invalid_vec).
+        Con terms (es. i termini dei documenti eliminati, dal ForwardIndex del segmento)
+        riscrive solo le PostingList di quei termini invece di tutto l'indice.
         """
+        if terms is not None:
+            for term in terms:
+                postings = self.btree.get(term)
+                if postings is None:
+                    continue
+                filtered_postings = self._remove_deleted(postings, invalid_vec)
+                if filtered_postings:
+                    self.btree[term] = filtered_postings
+                else:
+                    del self.btree[term]
+            return self
         # dizionario temporaneo per tenere l'indice che stiamo creando
         filtered_index = {}
         # per ogni entry dell'inverted index, aka per ogni PostingList di ogni termine
         for term, postings in self.btree.items():
-            # crea una nuova PostingsList che conterrà solo i documenti validi, ovvero
-            # include solo i doc_id che non sono marcati come eliminati
-            filtered_postings = PostingsList.create_posting_list(
-                [doc_id for doc_id in postings._postings_list
-                    if doc_id < len(invalid_vec) and not invalid_vec[doc_id]]
-            )
+            filtered_postings = self._remove_deleted(postings, invalid_vec)
             # solo se sono rimasti docID nella PostingList del temine
-            if filtered_postings._postings_list:
+            if filtered_postings:
                 # aggiunge all'indice filtrato temini e relative PostingList
                 filtered_index[term] = filtered_postings
         # aggiorna l'albero con l'indice filtrato
@@ -119,22 +140,41 @@ class InvertedIndex:
         self.btree.update(filtered_index)
         return self
 
+    @staticmethod
+    def _remove_deleted(postings, invalid_vec: Bitmap):
+        """
+        Crea una nuova PostingsList che contiene solo i documenti validi, ovvero
+        include solo i doc_id che non sono marcati come eliminati
+        (mantenendo lo stesso tipo di PostingsList, semplice, roaring, posizionale o con frequenze).
+        I docID oltre la fine dell'invalid vector non sono eliminati e vengono mantenuti.
+        """
+        if isinstance(postings, (PositionalPostingsList, FrequencyPostingsList)):
+            return postings.select(lambda doc_id: doc_id not in invalid_vec)
+        return type(postings).create_posting_list(
+            [doc_id for doc_id in postings if doc_id not in invalid_vec]
+        )
+
     def write_idx_to_disk(self, filepath: str) -> None:
         """
-        Salva l'InvertedIndex su disco usando pickle.
+        Salva l'InvertedIndex su disco nel formato binario di src.mmap_index
+        (dizionario dei termini ordinato, tabella degli offset e posting list compresse).
         """
-        dictionary = dict(self.btree.items())
-        with open(filepath, 'wb') as f:
-            pickle.dump(dictionary, f)
+        write_mmap_index(filepath, self.btree.items(), self.doc_lengths)
 
     @classmethod
     def load_idx_from_disk(cls, filepath: str) -> 'InvertedIndex':
         """
-        Carica un InvertedIndex da disco.
+        Carica un InvertedIndex da disco. I file nel formato binario vengono mappati in memoria
+        senza leggerli (le posting list sono decodificate solo quando servono) e l'indice
+        ottenuto è in sola lettura; i file salvati con pickle vengono caricati interamente.
         """
+        idx = cls()
+        if is_mmap_index(filepath):
+            idx.btree = MmapTermDictionary(filepath)
+            idx.doc_lengths = idx.btree.doc_lengths
+            return idx
         with open(filepath, 'rb') as f:
             dictionary = pickle.load(f)
-        idx = cls()
         idx.btree.update(dictionary)
         return idx
 
@@ -148,26 +188,125 @@ class InvertedIndex:
         return str(self.btree)
 
 
-def normalize(text: str) -> str:
+def to_roaring(terms: dict, roaring_min_df: int = None) -> dict:
     """
-    Rimuove la punteggiatura e converte il testo in minuscolo.
+    Converte in RoaringPostingsList le PostingsList con almeno roaring_min_df docID.
+    Se roaring_min_df è None lascia tutte le PostingsList semplici.
+    Le FrequencyPostingsList (indici per il ranking) non vengono convertite.
+    """
+    if roaring_min_df is None:
+        return terms
+    for term, postings in terms.items():
+        if len(postings) >= roaring_min_df and not isinstance(postings, FrequencyPostingsList):
+            terms[term] = RoaringPostingsList.from_postings(postings)
+    return terms
+
+
+def index_shard(shard: tuple[list[str], int], progress: bool = False, positional: bool = False,
+                ranked: bool = False) -> tuple[dict, dict, array]:
+    """
+    Indicizza uno shard (descrizioni, primo docID) con una sola tokenizzazione per documento:
+    ritorna le mappe termine -> array di docID e biword -> array di docID
+    (con positional=True parola -> PositionalPostingsList al posto delle biword,
+    con ranked=True termine -> FrequencyPostingsList al posto degli array di docID)
+    e l'array delle lunghezze dei documenti (numero di termini dopo stop words e stemming).
+    Gli array sono ordinati perché i documenti vengono visitati in ordine di docID.
+    Con progress=True mostra la barra di avanzamento.
+    """
+    descriptions, first_doc = shard
+    if progress:
+        descriptions = tqdm(descriptions)
+    terms = {}
+    # biword (o parole con le loro posizioni, con positional=True)
+    biwords = {}
+    doc_lengths = array(DOC_ID_TYPECODE)
+    # normalizza una sola volta: le parole servono sia per i termini sia per le biword
+    documents = TOKENIZER.tokenize_many(descriptions, stem=False)
+    for doc_id, words in enumerate(documents, start=first_doc):
+        stems = TOKENIZER.stem_words(words)
+        doc_lengths.append(len(stems))
+        if ranked:
+            add_frequencies(terms, stems, doc_id)
+        else:
+            # set per rimuovere i duplicati all'interno del documento
+            add_postings(terms, set(stems), doc_id)
+        if positional:
+            add_positions(biwords, words, doc_id)
+        else:
+            add_postings(biwords, set(map(str.__add__, words, words[1:])), doc_id)
+    return terms, biwords, doc_lengths
+
+
+def index_shard_packed(shard: tuple[list[str], int], positional: bool = False,
+                       ranked: bool = False) -> tuple[tuple, tuple, array, dict]:
+    """
+    Come index_shard, ma ritorna le mappe in formato compatto (pack_postings, pack_positions,
+    pack_frequencies) per ridurre il costo di serializzazione tra processi,
+    insieme agli stem calcolati per lo shard (parola -> stem).
+    """
+    known_stems = len(TOKENIZER)
+    terms, biwords, doc_lengths = index_shard(shard, positional=positional, ranked=ranked)
+    return (pack_frequencies(terms) if ranked else pack_postings(terms),
+            pack_positions(biwords) if positional else pack_postings(biwords),
+            doc_lengths, TOKENIZER.stems_since(known_stems))
+
+
+def pack_postings(terms: dict) -> tuple[list[str], array, array]:
+    """
+    Converte una mappa termine -> array di docID in (termini, offset, docID concatenati):
+    i docID del termine i sono postings[offsets[i]:offsets[i + 1]].
     """
-    return re.sub(r'[^\w\s^-]', '', text).lower()
+    offsets = array(DOC_ID_TYPECODE, (0,))
+    postings = array(DOC_ID_TYPECODE)
+    for term_postings in terms.values():
+        postings += term_postings
+        offsets.append(len(postings))
+    return list(terms), offsets, postings
 
 
-@lru_cache(maxsize=100_000)
-def cached_stem(word):
+def merge_shards(shards: list[tuple[list[str], array, array]]) -> dict:
     """
-    Calcola lo stem di una parola e memorizza il risultato in cache per migliorare le prestazioni.
+    Unisce le mappe compatte (pack_postings) di più shard in una mappa termine -> PostingsList.
+    Gli shard coprono intervalli di docID consecutivi e vengono visitati in ordine, quindi il
+    k-way merge delle posting list di ogni termine si riduce a concatenare i pezzi dei vari shard.
     """
-    stemmer = SnowballStemmer("english")
-    return stemmer.stem(word)
+    merged = {}
+    for terms, offsets, postings in shards:
+        for i, term in enumerate(terms):
+            shard_postings = postings[offsets[i]:offsets[i + 1]]
+            base = merged.get(term)
+            if base is None:
+                merged[term] = shard_postings
+            else:
+                base += shard_postings
+    return freeze_postings(merged)
+
+
+def add_postings(terms: dict, keys, doc_id: int) -> None:
+    """
+    Aggiunge doc_id all'array di docID di ciascun termine in keys (senza duplicati),
+    creando l'array se il termine è nuovo. Nessuna PostingsList viene creata durante la costruzione.
+    """
+    for key in keys:
+        postings = terms.get(key)
+        if postings is None:
+            terms[key] = array(DOC_ID_TYPECODE, (doc_id,))
+        else:
+            postings.append(doc_id)
 
 
-def tokenize(text: str) -> list[str]:
+def freeze_postings(terms: dict) -> dict:
+    """
+    Trasforma, sul posto, la mappa termine -> array ordinato di docID in termine -> PostingsList
+    (senza copiare né gli array né il dizionario).
     """
-    Normalizza il testo, rimuove le stop words e applica lo stemming a ogni parola.
+    for term, postings in terms.items():
+        terms[term] = PostingsList.from_sorted_array(postings)
+    return terms
+
+
+def normalize(text: str) -> str:
+    """
+    Rimuove la punteggiatura e converte il testo in minuscolo.
     """
-    normalized = normalize(text).split()
-    stop_removed = [word for word in normalized if word not in STOP_WORDS]
-    return [cached_stem(token) for token in stop_removed]
+    return TOKENIZER.normalize(text)
@@ -2,268 +2,634 @@ import os
 from functools import reduce
 import re
 import pickle
-
-from src.movie_description import MovieDescription
-from src.inverted_index import InvertedIndex, tokenize, normalize
-from src.postings_list import PostingsList
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.movie_description import MovieDescription, batched
+from src.doc_store import StringColumn, DocStore, CorpusView
+from src.inverted_index import InvertedIndex, normalize
+from src.postings_list import PostingsList, PostingsUnionView, union_all
+from src.positional_postings import phrase_match
+from src.bitmap import InvalidVector
+from src.index_snapshot import IndexSnapshot
+from src.query_cache import QueryCache
+from src.query_planner import QueryPlanner, EMPTY_TERM
+from src.query_result import QueryResult
+from src.ranking import BM25Scorer
+from src.segment import Segment
+from src.tokenizer import TOKENIZER
+from src.wildcard_index import WildcardIndex, WILDCARD, is_wildcard
+from src.fuzzy_index import FuzzyIndex, FUZZY, is_fuzzy
+from src.metrics import METRICS
+
+# manifest del salvataggio: elenco dei segmenti e invalid vector
+MANIFEST_FILE = "manifest.pkl"
+# file dei salvataggi nel formato precedente ai segmenti (indice principale + snapshot dell'ausiliario)
+LEGACY_MAIN_FILES = ("index.pkl", "biword.pkl", "corpus.pkl")
+LEGACY_AUX_FILES = ("aux_index.pkl", "aux_biword.pkl")
+LEGACY_SNAPSHOT_FILE = "snapshot.pkl"
+# dizionario parola -> stem del tokenizer, ricaricato all'apertura
+STEMS_FILE = "stems.pkl"
 
 
 class IrSystem:
     """
     Sistema di Information Retrieval che gestisce:
     - InvertedIndex per ricerca booleana
-    - biword index per le ricerche di frasi
+    - biword index oppure indice posizionale (positional=True) per le ricerche di frasi
+    - term frequency e lunghezze dei documenti (ranked=True) per il ranking BM25
     - documenti cancellati e aggiunti dinamicamente
+
+    I documenti sono indicizzati in segmenti immutabili (Segment): ogni add_docs crea un nuovo
+    segmento e un thread in background unisce i segmenti di dimensione simile appena ce ne sono
+    merge_factor consecutivi (merge logaritmico), così ogni documento viene riscritto O(log N) volte.
     """
 
-    def __init__(self, corpus: list[MovieDescription], index: InvertedIndex, biword: InvertedIndex,
-                 invalid_vec: list[bool], max_size_aux=80000) -> None:
+    def __init__(self, segments: list[Segment],
+                 invalid_vec: InvalidVector, merge_factor=4, roaring_min_df: int = None,
+                 positional: bool = False, cache_size: int = 1024, ranked: bool = False,
+                 description_store: StringColumn = None, forward_index: bool = False) -> None:
         """
-        Inizializza il sistema IR con corpus, InvertedIndex principale e secondario,
-        indice biword principale e secondario, vettore di invalidazione e massima dimensione dell'indice ausiliario.
+        Inizializza il sistema IR con segmenti (in ordine di docID, con i loro documenti), vettore di invalidazione,
+        numero di segmenti di dimensione simile che fanno scattare un merge, soglia per le RoaringPostingsList,
+        tipo di indice per le phrase query dei nuovi segmenti (posizionale o biword),
+        numero massimo di risultati nella cache delle query (0 = nessuna cache),
+        se i nuovi segmenti salvano i dati per il ranking BM25
+        l'eventuale colonna su disco delle descrizioni (None = descrizioni nei DocStore dei segmenti)
+        e se i nuovi segmenti hanno il ForwardIndex (merge dopo le eliminazioni più veloci).
         """
-        self._corpus = corpus
-        self._index = index
-        self._biword = biword
-        self._invalid_vec = invalid_vec
-        self._aux_idx = None
-        self._aux_biword = None
-        self.max_size_aux = max_size_aux
+        # con description_store i DocStore dei segmenti contengono solo i titoli: le descrizioni
+        # (una per docID) vengono scritte su disco appena indicizzate
+        self.description_store = description_store
+        # stato letto dalle query; viene sostituito (mai modificato) da aggiunte, eliminazioni e merge
+        self._snapshot = IndexSnapshot(segments, invalid_vec)
+        self.merge_factor = merge_factor
+        self.roaring_min_df = roaring_min_df
+        self.positional = positional
+        self.ranked = ranked
+        self.forward_index = forward_index
+        # serializza le operazioni di scrittura (add, delete, pubblicazione dei merge)
+        self._lock = threading.Lock()
+        # un solo merge alla volta (thread in background o merge completo sincrono)
+        self._merge_lock = threading.Lock()
+        # thread dei merge in background (None se non ci sono merge in corso)
+        self._merge_thread = None
+        # cache dei risultati delle query (prima della rimozione dei documenti eliminati)
+        self._cache = QueryCache(cache_size)
+        # vocabolari per i termini con caratteri jolly e per quelli tolleranti agli errori,
+        # costruiti qui e aggiornati con i soli termini dei segmenti aggiunti
+        self._wildcards = WildcardIndex()
+        self._fuzzy = FuzzyIndex()
+        self._vocabulary_lock = threading.Lock()
+        self._update_vocabularies(segments)
+        # metriche sui merge
+        self.merge_count = 0
+        self.last_merge_duration = None
 
     @classmethod
-    def create_system(cls, corpus: list[MovieDescription]) -> "IrSystem":
+    def create_system(cls, corpus: list[MovieDescription], roaring_min_df: int = None,
+                      processes: int = None, positional: bool = False, ranked: bool = False,
+                      forward_index: bool = False) -> "IrSystem":
         """
-        Crea un sistema IR generando InvertedIndex e biword dal corpus e l'invalid vetor relativo.
+        Crea un sistema IR generando InvertedIndex e biword dal corpus (in un unico segmento)
+        e l'invalid vetor relativo.
+        Con roaring_min_df i termini con document frequency alta usano RoaringPostingsList.
+        L'indice viene costruito in parallelo su processes processi (None = tutti i core).
+        Con positional=True le phrase query usano un indice posizionale (esatto anche per frasi
+        di più di due parole) al posto del biword index.
+        Con ranked=True l'indice salva anche term frequency e lunghezze dei documenti per ranked_query.
+        Con forward_index=True i segmenti hanno anche il ForwardIndex (docID -> termini), così i merge
+        rimuovono i documenti eliminati riscrivendo solo le PostingsList dei loro termini.
         """
-        index = InvertedIndex.create_idx_from_corpus(corpus)
-        biword = InvertedIndex.create_biword_from_corpus(corpus)
-        invalid_vec = [False] * len(corpus)
-        ir = cls(corpus, index, biword, invalid_vec)
+        with METRICS.timer("build"):
+            segment = Segment.from_corpus(corpus, 0, roaring_min_df, processes, positional, ranked,
+                                          forward=forward_index)
+        invalid_vec = InvalidVector(len(corpus))
+        ir = cls([segment], invalid_vec, roaring_min_df=roaring_min_df, positional=positional,
+                 ranked=ranked, forward_index=forward_index)
         return ir
 
+    @classmethod
+    def create_system_from_stream(cls, docs, batch_size: int = 50_000, roaring_min_df: int = None,
+                                  processes: int = 1, positional: bool = False, ranked: bool = False,
+                                  description_store: StringColumn = None,
+                                  forward_index: bool = False) -> "IrSystem":
+        """
+        Crea un sistema IR leggendo i documenti da un iterabile (es. iter_corpus) a batch di batch_size:
+        ogni batch viene indicizzato in un segmento (uniti poi dal merge logaritmico) e scartato,
+        quindi in memoria non c'è mai l'intero corpus ma solo un batch più gli indici.
+        Con description_store le descrizioni vengono scritte su disco e in memoria restano solo i titoli,
+        così si può indicizzare un corpus più grande della RAM.
+        """
+        ir = cls([], InvalidVector(0), roaring_min_df=roaring_min_df, positional=positional,
+                 ranked=ranked, description_store=description_store, forward_index=forward_index)
+        return ir.ingest(docs, batch_size, processes)
+
+    def ingest(self, docs, batch_size: int = 50_000, processes: int = 1) -> "IrSystem":
+        """
+        Aggiunge i documenti di un iterabile a batch di batch_size (un segmento per batch),
+        leggendo il batch successivo solo dopo aver indicizzato il precedente.
+        """
+        for batch in batched(docs, batch_size):
+            self.add_docs(batch, processes)
+        return self
+
+    def corpus(self) -> CorpusView:
+        """
+        Ritorna il corpus (docID -> documento) dello snapshot corrente.
+        """
+        return self._snapshot.corpus()
+
+    def description(self, doc_id: int) -> str:
+        """
+        Ritorna la descrizione di un documento (dal DocStore del suo segmento o dalla colonna su disco).
+        """
+        if self.description_store is not None:
+            return self.description_store[doc_id]
+        return self._snapshot.corpus().description(doc_id)
+
     def delete_docs(self, documents: list[int]) -> "IrSystem":
         """
         Segna, nell'invalid vector, i documenti specificati come eliminati.
+        Le modifiche vengono fatte su una copia dell'invalid vector, pubblicata con un nuovo snapshot.
         """
-        for doc in documents:
-            self._invalid_vec[doc] = True
+        with self._lock:
+            invalid_vec = self._snapshot.invalid_vec.copy()
+            invalid_vec.delete_many(documents)
+            self._snapshot = self._snapshot.replace(invalid_vec=invalid_vec)
+        METRICS.count("docs.deleted", len(documents))
         return self
 
-    def add_docs(self, new_docs: list[MovieDescription]) -> "IrSystem":
-        """
-        Aggiunge nuovi documenti al sistema, aggiornando l'indice ausiliario.
-        """
-        # crea un InvertedIndex dai nuovi documenti passati,
-        # i nuovi docID partiranno dall'ultimo utlizzato (dalla fine del corpus attuale)
-        aux = InvertedIndex.create_idx_from_corpus(
-            new_docs, len(self._invalid_vec))
-        # crea anche l'indice biword
-        aux_biword = InvertedIndex.create_biword_from_corpus(
-            new_docs, len(self._invalid_vec))
-        # se l'indice ausiliario è vuoto
-        if self._aux_idx is None:
-            # gli indici appena creati diventano quelli ausiliari
-            self._aux_idx = aux
-            self._aux_biword = aux_biword
-        else:
-            # altrimenti fa il merge con quelli già presenti
-            self._aux_idx.merge(aux)
-            self._aux_biword.merge(aux_biword)
+    def add_docs(self, new_docs: list[MovieDescription], processes: int = 1) -> "IrSystem":
+        """
+        Aggiunge nuovi documenti al sistema in un nuovo segmento (indicizzato su processes processi).
+        Se ci sono segmenti da unire avvia il merge in background:
+        nel frattempo le query continuano a usare lo snapshot corrente.
+        """
+        self._add_docs(new_docs, processes)
+        return self
 
-        # se l'indice ausiliario è troppo grande
-        if (len(self._aux_idx) > self.max_size_aux):
-            # fa merge con quello principale
-            self._merge_idx()
+    def replace_docs(self, documents: list[int], new_docs: list[MovieDescription], processes: int = 1) -> range:
+        """
+        Sostituisce i documenti specificati con new_docs: elimina i vecchi e aggiunge i nuovi
+        in un unico snapshot, quindi nessuna query vede entrambe le versioni o nessuna delle due.
+        Ritorna i docID dei nuovi documenti. Con il ForwardIndex il merge che rimuove
+        i documenti sostituiti riscrive solo le PostingsList dei loro termini.
+        """
+        first_doc = self._add_docs(new_docs, processes, documents)
+        return range(first_doc, first_doc + len(new_docs))
 
-        # aumenta l'invalidation bit vector tante volta quante il numero di nuovi documenti aggiunti
-        self._invalid_vec += [False] * len(new_docs)
-        # aggiunge al corpus i nuovi documenti
-        self._corpus += new_docs
-        return self
+    def _add_docs(self, new_docs: list[MovieDescription], processes: int = 1, deleted: list[int] = ()) -> int:
+        """
+        Aggiunge new_docs in un nuovo segmento ed elimina i documenti deleted, pubblicando un solo snapshot.
+        Ritorna il docID del primo documento aggiunto.
+        """
+        if not new_docs and not deleted:
+            return len(self._snapshot.invalid_vec)
+        with self._lock, METRICS.timer("add_docs"):
+            snapshot = self._snapshot
+            # i nuovi docID partiranno dall'ultimo utlizzato (dalla fine del corpus attuale)
+            first_doc = len(snapshot.invalid_vec)
+            invalid_vec = snapshot.invalid_vec.copy()
+            invalid_vec.delete_many(deleted)
+            segments = snapshot.segments
+            if new_docs:
+                segment = Segment.from_corpus(new_docs, first_doc, processes=processes,
+                                              positional=self.positional, ranked=self.ranked,
+                                              descriptions=self.description_store is None,
+                                              forward=self.forward_index)
+                # aumenta l'invalidation bit vector tante volta quante il numero di nuovi documenti aggiunti
+                invalid_vec.extend(len(new_docs))
+                # scrive le descrizioni su disco (prima di pubblicare lo snapshot che le indicizza)
+                if self.description_store is not None:
+                    self.description_store.append(doc.description for doc in new_docs)
+                segments += (segment,)
+                # (un merge non crea termini nuovi: i vocabolari cambiano solo con le aggiunte)
+                self._update_vocabularies([segment])
+            self._snapshot = snapshot.replace(segments=segments, invalid_vec=invalid_vec)
+
+            # se ci sono segmenti da unire e non c'è già un merge in corso li unisce in un thread separato
+            if self._merge_thread is None and self._pick_merge(self._snapshot) is not None:
+                self._merge_thread = threading.Thread(target=self._merge_worker, daemon=True)
+                self._merge_thread.start()
+        if deleted:
+            METRICS.count("docs.deleted", len(deleted))
+        return first_doc
+
+    def _update_vocabularies(self, segments: list[Segment]) -> None:
+        """
+        Aggiunge a WildcardIndex e FuzzyIndex i termini dei segmenti dati
+        e le parole stemmate dal tokenizer dopo l'ultimo aggiornamento.
+        """
+        with self._vocabulary_lock, METRICS.timer("build.vocabulary"):
+            for segment in segments:
+                terms = list(segment.index.btree.keys())
+                for vocabulary in (self._wildcards, self._fuzzy):
+                    vocabulary.update(terms, TOKENIZER)
+
+    def _pick_merge(self, snapshot: IndexSnapshot) -> list[Segment]:
+        """
+        Politica di merge logaritmica: cerca, partendo dai segmenti più recenti, una sequenza
+        di almeno merge_factor segmenti consecutivi dello stesso livello (dimensione simile).
+        Ritorna i segmenti da unire, oppure None se non ce ne sono.
+        """
+        segments = snapshot.segments
+        end = len(segments)
+        while end > 0:
+            level = segments[end - 1].level(self.merge_factor)
+            start = end - 1
+            while start > 0 and segments[start - 1].level(self.merge_factor) == level:
+                start -= 1
+            if end - start >= self.merge_factor:
+                return list(segments[start:end])
+            end = start
+        return None
+
+    def _merge_worker(self) -> None:
+        """
+        Corpo del thread dei merge in background: unisce segmenti finché la politica di merge
+        ne trova (un merge può creare un segmento che ne fa scattare un altro al livello successivo).
+        """
+        while True:
+            with self._lock:
+                segments = self._pick_merge(self._snapshot)
+                if segments is None:
+                    self._merge_thread = None
+                    return
+            self._merge_segments(segments)
+
+    def _merge_segments(self, segments: list[Segment] = None) -> None:
+        """
+        Unisce segmenti consecutivi in un nuovo segmento rimuovendo i documenti cancellati,
+        poi lo pubblica sostituendo lo snapshot. Senza argomenti unisce tutti i segmenti.
+        I segmenti dello snapshot di partenza non vengono modificati, quindi le query possono
+        continuare a leggerli durante tutto il merge.
+        """
+        with self._merge_lock:
+            snapshot = self._snapshot
+            if segments is None:
+                segments = list(snapshot.segments)
+                # nessun documento indicizzato
+                if not segments:
+                    return
+            # i segmenti potrebbero essere già stati uniti da un merge completo
+            elif not all(segment in snapshot.segments for segment in segments):
+                return
+            start = time.perf_counter()
+            invalid_vec = snapshot.invalid_vec
+            # il segmento unito ha i documenti rimossi dall'indice sostituiti da REDACTED nel DocStore
+            with METRICS.timer("merge"):
+                merged = Segment.merge(segments, invalid_vec, self.roaring_min_df)
+
+            with self._lock:
+                # gli eventuali documenti aggiunti o eliminati durante il merge restano
+                # nei segmenti successivi e nell'invalid vector correnti
+                self._snapshot = self._snapshot.replace_segments(segments, merged)
+                self.merge_count += 1
+                self.last_merge_duration = time.perf_counter() - start
+
+    def wait_for_merge(self) -> None:
+        """
+        Attende la fine degli eventuali merge in background.
+        """
+        thread = self._merge_thread
+        if thread is not None:
+            thread.join()
 
     def _merge_idx(self) -> "IrSystem":
         """
-        Effettua il merge dell'indice ausiliario con quello principale e rimuove documenti cancellati.
-        """
-        # se esistono entrambi, fa merge
-        if self._index and self._aux_idx:
-            self._index.merge(self._aux_idx)
-            self._biword.merge(self._aux_biword)
-        # se non esiste l'indice principale (caso raro)
-        elif self._aux_idx:
-            self._index = self._aux_idx
-            self._biword = self._aux_biword
-
-        # aggiorna le PostingList dell'inverted index (toglie i docID segnati come eliminati)
-        self._index.remove_deleted_docs(self._invalid_vec)
-        self._biword.remove_deleted_docs(self._invalid_vec)
-        # elimina dal corpus i documenti che sono stati rimossi dall'indice
-        for doc_id, to_delete in enumerate(self._invalid_vec):
-            if to_delete:
-                self._corpus[doc_id].title = "REDACTED"
-                self._corpus[doc_id].description = ""
-
-        # svuota gli indici temporanei
-        self._aux_idx = None
-        self._aux_biword = None
+        Unisce tutti i segmenti in uno solo e rimuove i documenti cancellati,
+        in modo sincrono (attende prima gli eventuali merge già in corso).
+        """
+        self.wait_for_merge()
+        self._merge_segments()
         return self
 
-    def query(self, query: str) -> list[str]:
+    def merge_stats(self) -> dict:
+        """
+        Ritorna le metriche sui merge: merge in corso, numero di merge completati, durata dell'ultimo
+        (in secondi), dimensioni dei segmenti (docID coperti e termini) e numero di termini
+        nei segmenti successivi al primo, non ancora uniti.
+        """
+        snapshot = self._snapshot
+        return {
+            "merging": self._merge_thread is not None,
+            "merge_count": self.merge_count,
+            "last_merge_duration": self.last_merge_duration,
+            "segments": [(segment.doc_count, len(segment.index)) for segment in snapshot.segments],
+            "pending_aux_size": sum(len(segment.index) for segment in snapshot.segments[1:]),
+        }
+
+    def vocabulary_size(self) -> int:
+        """
+        Ritorna il numero di termini distinti indicizzati in tutti i segmenti.
+        """
+        segments = self._snapshot.segments
+        if len(segments) == 1:
+            return len(segments[0].index)
+        return len(set().union(*(segment.index.btree.keys() for segment in segments)))
+
+    def query(self, query: str) -> QueryResult:
         """
         Esegue una query booleana sul corpus, usando operatori AND, OR e NOT. 
-        Ritorna la lista di titoli/descrizioni dei documenti trovati.
+        Ritorna un QueryResult con i docID trovati: i titoli vengono letti solo per la pagina richiesta.
+        Il risultato viene salvato nella cache delle query, con chiave l'espressione postfix.
+        """
+        # le query lavorano sempre sullo stesso snapshot, anche se nel frattempo ne viene pubblicato un altro
+        with METRICS.timer("query"):
+            return self._query(query, self._snapshot)
+
+    def trace_query(self, query: str) -> tuple[QueryResult, list[str]]:
+        """
+        Esegue una query (booleana, o phrase query se tra virgolette) e ritorna il risultato
+        e il costo di ogni fase (tokenizzazione, parsing, piano con lettura delle posting list,
+        esecuzione, rimozione dei documenti eliminati, prima pagina di titoli) con i contatori della query.
+        """
+        with METRICS.trace() as trace:
+            if query.startswith('"') and query.endswith('"') and len(query) > 1:
+                result = self.phrase_query(query[1:-1])
+            else:
+                result = self.query(query)
+            result.page(0, 20)
+        return result, trace.format()
+
+    def stats(self) -> list[str]:
+        """
+        Ritorna le metriche del sistema come righe di testo: tempi delle fasi e contatori
+        del registro METRICS (se attivo), cache delle query e merge.
+        """
+        lines = METRICS.format() if METRICS.enabled else ["metrics disabled"]
+        lines.append(f"cache: {self.cache_stats()}")
+        merges = self.merge_stats()
+        lines.append(f"segments: {len(merges['segments'])}, merges: {merges['merge_count']}, "
+                     f"last merge: {merges['last_merge_duration']}")
+        return lines
+
+    def _query(self, query: str, snapshot: IndexSnapshot, shared: dict = None) -> QueryResult:
+        """
+        Esegue la query booleana sullo snapshot dato. shared contiene posting list e risultati
+        delle sottoespressioni condivisi tra le query di un batch (None fuori da un batch).
         """
         # tokenizza la query
-        tokens = tokenize_logical_query(query)
+        with METRICS.timer("query.tokenize"):
+            tokens = tokenize_logical_query(query)
         # converte da infix a postfix (per calcolo più semplice)
-        postfixes = infix_to_postfix(tokens)
-        # stack per PostingList ancora da processare
-        stack = []
-        # lista di PostingList da ottimizzare con AND multipli
-        to_optimize = []
-        # per ogni token dell’espressione in notazione postfix
-        for token in postfixes:
-            # Caso in cui il token è l’operatore AND:
-            # per migliorare l’efficienza conviene prima accumulare le posting list da confrontare,
-            # per poi eseguire l'intersezione fra tutte le liste più corte alla fine (_optimize_and_query)
-            if (token == "AND"):
-                # estrae la posting list più a destra dallo stack
-                right = stack.pop()
-                # se lo stack non è vuoto, estrae la posting list di sinistra;
-                # altrimenti la prende da 'to_optimize' (accumulatore usato in precedenza)
-                left = stack.pop() if stack else to_optimize.pop()
-                # aggiunge entrambe alla lista da ottimizzare, dove alla fine farà un AND multiplo
-                to_optimize += [left, right]
-            # Caso in cui il token è l’operatore OR
-            elif token == "OR":
-                # se ha già posting list da ottimizzare, prima esegue l’AND multiplo su di esse;
-                # altrimenti prende semplicemente la posting list più a destra dallo stack
-                right = (
-                    self._optimize_and_query(to_optimize) if to_optimize
-                    else stack.pop()
-                )
-                # prende la posting list più a sinistra dallo stack
-                left = stack.pop()
-                # esegue l’unione tra le due posting list ottenute e rimette il risultato nello stack
-                stack.append(left.union(right))
-            # Caso in cui il token è l’operatore NOT
-            elif token == "NOT":
-                # prende la posting list su cui applicare la negazione:
-                # se lo stack non è vuoto, la prende da lì;
-                # altrimenti da to_optimize
-                plist = stack.pop() if stack else to_optimize.pop()
-                # crea la posting list negata rispetto a tutti i documenti disponibili
-                negated = plist.negation(len(self._invalid_vec))
-                # inserisce il risultato nello stack
-                stack.append(negated)
-            # Caso in cui il token è un termine normale (non un operatore)
-            else:
-                # cerca la posting list di quel termine nell’indice principale e in quello ausiliario
-                # se non c'è, usa una lista vuota
-                base = self._index.btree.get(
-                    token, PostingsList.create_posting_list([]))
-                aux = (self._aux_idx.btree.get(token, PostingsList.create_posting_list([]))
-                       if self._aux_idx
-                       else PostingsList.create_posting_list([])
-                       )
-                # controlla se le posting list trovate sono non vuote
-                if base._postings_list:
-                    if aux._postings_list:
-                        # entrambe le liste hanno risultati: fa il merge per combinarle
-                        stack.append(base.merge(aux))
-                    else:
-                        # solo la lista principale ha risultati: usa quella
-                        stack.append(base)
-                elif aux._postings_list:
-                    # solo la lista ausiliaria ha risultati: usa quella
-                    stack.append(aux)
-
-        # estrae l'ultimo elemento (che rappresenta il risultato finale della query) dallo stack,
-        # oppure, se lo stack è vuoto (può succedere se abbiamo solo operatori AND accumulati),
-        # prende direttamente la lista 'to_optimize' che contiene le posting list da intersecare
-        result = stack.pop() if stack else to_optimize
-        # se è tuttora una lista (= catena di AND), fa l'intersezione
-        if isinstance(result, list):
-            result = self._optimize_and_query(result)
+        with METRICS.timer("query.parse"):
+            postfixes = infix_to_postfix(tokens)
+        max_doc = len(snapshot.invalid_vec)
+        # il NOT unario dipende da tutti i docID e i termini in cui si espande un termine con caratteri jolly
+        # o tollerante agli errori possono cambiare con i documenti aggiunti:
+        # il risultato non si può aggiornare segmento per segmento
+        patchable = "NOT" not in postfixes and not any(is_wildcard(token) or is_fuzzy(token) for token in postfixes)
+        result = self._cached(("query", *postfixes), snapshot,
+                              lambda segments: self._evaluate(postfixes, [s.index for s in segments], max_doc,
+                                                              shared),
+                              patchable=patchable)
 
         # a questo punto ha una sola PostingsList con i docID validi.
         # rimuove eventuali docID che erano stati marcati come cancellati (invalid_vec)
-        # e infine estrae dal corpus i titoli dei documenti corrispondenti
-        return self._remove_deleted(result).get_from_corpus(self._corpus)
+        # (i titoli dei documenti corrispondenti vengono estratti dal corpus solo quando servono)
+        with METRICS.timer("query.remove_deleted"):
+            result = self._remove_deleted(result, snapshot.invalid_vec)
+        return QueryResult(result, snapshot.corpus())
 
-    def _remove_deleted(self, result: PostingsList) -> PostingsList:
+    def _evaluate(self, postfixes: list[str], segments: list[InvertedIndex], max_doc: int,
+                  shared: dict = None) -> PostingsList:
         """
-        Rimuove dai risultati i documenti marcati come eliminati nell'invalid vector.
+        Calcola il risultato di una query in notazione postfix sugli indici segments,
+        senza rimuovere i documenti eliminati. max_doc è il numero di docID usato dal NOT unario.
+        La query viene eseguita secondo il piano scelto da QueryPlanner in base alle document frequency.
+        """
+        postings = results = None
+        if shared is not None:
+            # posting list dei termini e risultati delle sottoespressioni valgono solo per gli stessi segmenti
+            postings, results = shared.setdefault(tuple(segments), ({}, {}))
+        planner = QueryPlanner(lambda term: self._lookup(term, segments), max_doc, postings, results)
+        # il piano legge le posting list dei termini (per le document frequency)
+        with METRICS.timer("query.plan"):
+            plan = planner.plan(postfixes)
+        with METRICS.timer("query.execute"):
+            return planner.execute(plan)
+
+    def explain(self, query: str) -> str:
+        """
+        Ritorna il piano di esecuzione di una query booleana (albero delle operazioni
+        nell'ordine di valutazione) con cardinalità e costi stimati.
+        """
+        snapshot = self._snapshot
+        postfixes = infix_to_postfix(tokenize_logical_query(query))
+        planner = QueryPlanner(lambda term: self._lookup(term, snapshot.term_segments()),
+                               len(snapshot.invalid_vec))
+        return "\n".join(planner.explain(planner.plan(postfixes)))
+
+    def _cached(self, key: tuple, snapshot: IndexSnapshot, evaluate, patchable: bool = True) -> PostingsList:
+        """
+        Ritorna il risultato di una query (prima della rimozione dei documenti eliminati) dalla cache,
+        calcolandolo con evaluate(segmenti) se non c'è.
+        I risultati in cache restano validi dopo eliminazioni e merge: i documenti eliminati vengono
+        tolti a ogni lettura (_remove_deleted) e un merge non cambia i documenti non eliminati.
+        Dopo un'aggiunta di documenti un risultato patchable viene aggiornato valutando la query
+        solo sui segmenti nuovi (i segmenti coprono intervalli di docID disgiunti);
+        gli altri vengono ricalcolati.
         """
-        for doc_id, deleted in enumerate(self._invalid_vec):
-            if deleted and doc_id in result._postings_list:
-                result._postings_list.remove(doc_id)
+        doc_count = len(snapshot.invalid_vec)
+        entry = self._cache.get(key)
+        if entry is not None:
+            result, cached_count = entry
+            if cached_count == doc_count:
+                self._cache.record("hits")
+                return result
+            if patchable and cached_count < doc_count:
+                new_segments = [segment for segment in snapshot.segments if segment.first_doc >= cached_count]
+                # se un merge ha unito documenti vecchi e nuovi in un segmento, ricalcola tutto
+                if sum(segment.doc_count for segment in new_segments) == doc_count - cached_count:
+                    result = result.union(evaluate(new_segments))
+                    self._cache.record("patches")
+                    self._cache.put(key, result, doc_count)
+                    return result
+        self._cache.record("misses")
+        result = evaluate(snapshot.segments)
+        self._cache.put(key, result, doc_count)
         return result
 
-    def _optimize_and_query(self, to_optimize: list[PostingsList]) -> PostingsList:
+    def cache_stats(self) -> dict:
         """
-        Esegue più operazioni AND ottimizzando l'ordine per intersecare prima le liste più piccole.
-        Ritorna la PostingsList risultante dall'intersezione.
+        Ritorna le metriche della cache delle query (hit, miss, aggiornamenti, eliminazioni, dimensione).
         """
-        # ordina le PostingsList per lunghezza crescente
-        plist = sorted(to_optimize, key=lambda x: len(x._postings_list))
-        # applica l'operatore AND (intersection) a tutte le posting list ordinate.
+        return self._cache.stats()
 
-        # se non sono stati trovari risultati ritorna una lista vuota
-        if not plist:
-            return PostingsList.create_posting_list([])
+    def _lookup(self, term: str, segments: list[InvertedIndex]) -> PostingsList:
+        """
+        Ritorna le posting list di un termine nei vari segmenti come un'unica PostingsUnionView,
+        senza copiarle né modificarle (con un solo segmento ritorna direttamente la sua PostingsList).
+        Se il termine non c'è ritorna una lista vuota.
+        Un termine con caratteri jolly (es. "detect*") o tollerante agli errori (es. "detectve~")
+        ritorna l'unione delle posting list di tutti i termini corrispondenti.
+        """
+        if is_wildcard(term):
+            postings = self._expanded_lookup(self._wildcards, term, segments)
+        elif is_fuzzy(term):
+            postings = self._expanded_lookup(self._fuzzy, term, segments)
+        else:
+            postings = PostingsUnionView.of([idx.btree.get(term) for idx in segments])
+        if METRICS.active():
+            METRICS.count("postings.lookups")
+            METRICS.count("postings.docs", len(postings))
+        return postings
 
-        result = reduce(lambda x, y: x.intersection(y), plist)
-        return result
+    def _expanded_lookup(self, vocabulary, term: str, segments: list[InvertedIndex]):
+        """
+        Ritorna i docID dei termini in cui vocabulary (WildcardIndex o FuzzyIndex) espande term:
+        in ogni segmento le posting list dei termini vengono unite con un unico merge a k vie (union_all)
+        e le unioni dei segmenti, con intervalli di docID disgiunti, formano una PostingsUnionView.
+        """
+        # (il lock esclude solo gli aggiornamenti dei vocabolari fatti dalle aggiunte)
+        with self._vocabulary_lock, METRICS.timer("query.expand"):
+            terms = vocabulary.expand(term)
+        METRICS.count("query.expanded_terms", len(terms))
+        return PostingsUnionView.of([union_all([idx.btree.get(term) for term in terms]) for idx in segments])
 
-    def phrase_query(self, query: str) -> list[str]:
+    def _remove_deleted(self, result: PostingsList, invalid_vec: InvalidVector) -> PostingsList:
         """
-        Esegue una ricerca esatta di una frase usando l'indice biword.
-        Ritorna la lista dei documenti che contengono la frase. 
+        Rimuove dai risultati i documenti marcati come eliminati nell'invalid vector.
+        Il costo dipende solo dalla dimensione del risultato, non da quella del corpus.
+        """
+        # nessun documento eliminato: il risultato resta invariato
+        if not invalid_vec.deleted_count:
+            return result
+        # PostingsList semplice: un solo passaggio con la maschera dei documenti validi
+        if isinstance(result, PostingsList):
+            return PostingsList.from_sorted_array(invalid_vec.exclude(result._postings_list))
+        # altri tipi (es. RoaringPostingsList): differenza con i docID eliminati
+        return result.difference(PostingsList.from_sorted_array(invalid_vec.deleted_ids))
+
+    def batch_query(self, queries: list[str], workers: int = None) -> list[tuple[QueryResult, float]]:
+        """
+        Esegue un insieme di query (booleane, o phrase query se tra virgolette) sullo stesso snapshot
+        e ritorna, nell'ordine di queries, le coppie (risultato, durata in secondi).
+        Le query ripetute vengono eseguite una sola volta (e ritornano lo stesso risultato e la stessa durata);
+        le posting list dei termini, delle biword e delle parole dell'indice posizionale e i risultati
+        delle sottoespressioni comuni vengono calcolati una sola volta per tutto il batch.
+        Le query distinte vengono eseguite in parallelo su workers thread (None = default di ThreadPoolExecutor).
+        """
+        snapshot = self._snapshot
+        # dati condivisi dalle query del batch: per le query booleane segmenti -> (posting list
+        # dei termini, risultati delle sottoespressioni), per le phrase query (indice, chiave) -> posting list
+        shared = {}
+        phrase_shared = {}
+
+        def run(query: str) -> tuple[QueryResult, float]:
+            start = time.perf_counter()
+            if query.startswith('"') and query.endswith('"') and len(query) > 1:
+                result = self._phrase_query(query[1:-1], snapshot, phrase_shared)
+            else:
+                result = self._query(query, snapshot, shared)
+            return result, time.perf_counter() - start
+
+        distinct = list(dict.fromkeys(queries))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = dict(zip(distinct, pool.map(run, distinct)))
+        return [results[query] for query in queries]
+
+    @METRICS.timed("ranked_query")
+    def ranked_query(self, query: str, k: int = 10) -> list[str]:
+        """
+        Ricerca a testo libero: ritorna i k documenti validi con punteggio BM25 più alto
+        per i termini della query (tokenizzati come le descrizioni), dal più rilevante.
+        Sui segmenti costruiti senza ranked=True ogni termine conta con term frequency 1
+        e senza normalizzazione per lunghezza.
+        """
+        snapshot = self._snapshot
+        scorer = BM25Scorer(snapshot.segments, snapshot.invalid_vec)
+        corpus = snapshot.corpus()
+        results = []
+        for doc_id, score in scorer.top_k(TOKENIZER.tokenize_query(query), k):
+            results.append(f"{doc_id}: {corpus.title(doc_id)} (score {score:.2f})")
+        return results
+
+    def phrase_query(self, query: str) -> QueryResult:
+        """
+        Esegue una ricerca esatta di una frase: sui segmenti con indice posizionale confronta
+        le posizioni delle parole (phrase_match), sugli altri interseca le biword.
+        Ritorna un QueryResult con i documenti che contengono la frase.
+        """
+        # le query lavorano sempre sullo stesso snapshot, anche se nel frattempo ne viene pubblicato un altro
+        with METRICS.timer("phrase_query"):
+            return self._phrase_query(query, self._snapshot)
+
+    def _phrase_query(self, query: str, snapshot: IndexSnapshot, shared: dict = None) -> QueryResult:
+        """
+        Esegue la phrase query sullo snapshot dato. shared contiene le posting list (biword
+        o posizionali) già lette dalle query di un batch (None fuori da un batch).
         """
-        # lista che conterrà le coppie di parole (biword) generate dalla frase
-        biword_query = []
         # normalizza la query
-        words = normalize(query).split()
-
-        for i in range(len(words) - 1):
-            # concatena le parole successive della query per formare le biword
-            biword_query.append(words[i] + words[i + 1])
-        # lista che conterrà le PostingsList trovate per ciascuna biword
-        postings = []
-        # per ogni biword della query
-        for biword in biword_query:
-            # cerca le biword nell'indice principale e nell'ausiliario
-            # se non le trova, ritorna lista vuota
-            base = self._biword.btree.get(
-                biword, PostingsList.create_posting_list([]))
-
-            aux = (self._aux_biword.btree.get(biword, PostingsList.create_posting_list([]))
-                   if self._aux_biword
-                   else PostingsList.create_posting_list([])
-                   )
-            # unisce (merge) le PostingsList dei due indici per la specifica biword
-            postings.append(base.merge(aux))
-
-        # se non trova risultati restituisce una stringa vuota
-        if not postings:
-            return []
-        # se trova una sola biword (frase di 2 parole),
-        # restituisce direttamente i docID dopo aver rimosso i cancellati
-        if len(postings) == 1:
-            return self._remove_deleted(postings[0]).get_from_corpus(self._corpus)
-
-        # se invece ci sono più biword, calcola l'intersezione:
-        plist = reduce(lambda x, y: x.intersection(y), postings)
+        with METRICS.timer("query.tokenize"):
+            words = normalize(query).split()
+        # se non ci sono parole restituisce un risultato vuoto
+        if not words:
+            return QueryResult(PostingsList(), snapshot.corpus())
+        plist = self._cached(("phrase", *words), snapshot,
+                             lambda segments: self._phrase_postings(segments, words, shared))
 
         # a questo punto ha una sola PostingsList con i docID validi.
         # rimuove eventuali docID che erano stati marcati come cancellati (invalid_vec)
-        # e infine estrae dal corpus i titoli dei documenti corrispondenti
-        return self._remove_deleted(plist).get_from_corpus(self._corpus)
+        with METRICS.timer("query.remove_deleted"):
+            plist = self._remove_deleted(plist, snapshot.invalid_vec)
+        return QueryResult(plist, snapshot.corpus())
+
+    def _phrase_postings(self, segments: list[Segment], words: list[str], shared: dict = None) -> PostingsList:
+        """
+        Ritorna i docID dei segmenti che contengono la frase (senza rimuovere i documenti eliminati).
+        I segmenti coprono intervalli di docID disgiunti: cerca la frase in ciascuno e unisce i risultati.
+        """
+        with METRICS.timer("query.phrase_match"):
+            return PostingsUnionView.of([self._segment_phrase_query(segment, words, shared)
+                                         for segment in segments])
 
-    def write_ir_system_to_disk(self, filepath: str = None):
+    @staticmethod
+    def _get_postings(idx: InvertedIndex, key: str, shared: dict = None):
+        """
+        Ritorna la posting list di key nell'indice idx (None se non c'è), leggendola
+        una sola volta per tutte le query di un batch se shared non è None.
+        """
+        if shared is None:
+            return idx.btree.get(key)
+        lookup = (idx, key)
+        if lookup not in shared:
+            shared[lookup] = idx.btree.get(key)
+        return shared[lookup]
+
+    def _segment_phrase_query(self, segment: Segment, words: list[str], shared: dict = None) -> PostingsList:
         """
-        Salva su disco l'indice principale, il biword index e il corpus.
+        Ritorna i docID del segmento che contengono la frase (lista di parole normalizzate),
+        oppure None se non ce ne sono.
+        """
+        if segment.positions is not None:
+            postings = [self._get_postings(segment.positions, word, shared) for word in words]
+            # se una parola non compare nel segmento nessun documento contiene la frase
+            if not all(postings):
+                return None
+            return phrase_match(postings)
+        if segment.biword is None:
+            return None
+        # concatena le parole successive della query per formare le biword
+        # (una frase di una sola parola non ha biword e non trova documenti)
+        postings = [self._get_postings(segment.biword, first + second, shared)
+                    for first, second in zip(words, words[1:])]
+        if not postings or not all(postings):
+            return None
+        # se ci sono più biword, calcola l'intersezione
+        return reduce(lambda x, y: x.intersection(y), postings)
+
+    @METRICS.timed("save")
+    def write_ir_system_to_disk(self, filepath: str = None, merge: bool = False):
+        """
+        Salva su disco il sistema IR.
+        Ogni segmento è immutabile e viene scritto una sola volta nei propri file; a ogni salvataggio
+        vengono scritti solo i segmenti nuovi e il manifest (elenco dei segmenti e invalid vector),
+        quindi il costo del salvataggio è proporzionale a quanto è cambiato.
+        Con merge=True fa prima il merge completo dei segmenti (compattazione).
         """
         # se non viene passato un path
         if filepath is None:
@@ -271,47 +637,126 @@ class IrSystem:
             filepath = "index_files"
         # si assicura che la cartella esista
         os.makedirs(filepath, exist_ok=True)
-        # prima di srivere su disco si fa il merge degli indici (principale e ausiliario)
-        self._merge_idx()
-
-        self._index.write_idx_to_disk(os.path.join(filepath, "index.pkl"))
-        self._biword.write_idx_to_disk(os.path.join(filepath, "biword.pkl"))
-        with open(os.path.join(filepath, "corpus.pkl"), "wb") as f:
-            pickle.dump(self._corpus, f)
+        if merge:
+            self._merge_idx()
+        snapshot = self._snapshot
+
+        for segment in snapshot.segments:
+            segment.write_to_disk(filepath)
+        if self.description_store is not None:
+            self.description_store.flush()
+        TOKENIZER.save(os.path.join(filepath, STEMS_FILE))
+        manifest = {
+            "segments": [(segment.segment_id, segment.first_doc, segment.doc_count)
+                         for segment in snapshot.segments],
+            "invalid_vec": snapshot.invalid_vec,
+            "positional": self.positional,
+            "ranked": self.ranked,
+            "forward_index": self.forward_index,
+            "merge_factor": self.merge_factor,
+            "roaring_min_df": self.roaring_min_df,
+            # percorso relativo alla cartella del salvataggio, così la cartella si può spostare
+            "description_store": os.path.relpath(self.description_store.path, filepath)
+            if self.description_store is not None else None,
+        }
+        # scrive il manifest su un file temporaneo e poi lo rinomina, così un salvataggio
+        # interrotto non lascia un manifest corrotto
+        manifest_path = os.path.join(filepath, MANIFEST_FILE)
+        with open(manifest_path + ".tmp", "wb") as f:
+            pickle.dump(manifest, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+        # rimuove i file dei segmenti che sono stati uniti in altri e quelli del formato precedente
+        live_files = {path for segment in snapshot.segments for path in segment.file_paths(filepath)}
+        legacy_files = {*LEGACY_MAIN_FILES, *LEGACY_AUX_FILES, LEGACY_SNAPSHOT_FILE}
+        for name in os.listdir(filepath):
+            path = os.path.join(filepath, name)
+            if (name.startswith("segment_") and path not in live_files) or name in legacy_files:
+                os.remove(path)
 
     @classmethod
-    def load_ir_system_from_disk(cls, filepath: str = None) -> None:
+    @METRICS.timed("load")
+    def load_ir_system_from_disk(cls, filepath: str = None) -> "IrSystem":
         """
-        Carica il sistema IR da disco.
+        Carica il sistema IR da disco: segmenti, documenti e documenti eliminati.
         """
         if filepath is None:
             filepath = "index_files"
-        with open(os.path.join(filepath, "corpus.pkl"), "rb") as f:
+        manifest_path = os.path.join(filepath, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return cls._load_legacy(filepath)
+        with open(manifest_path, "rb") as f:
+            manifest = pickle.load(f)
+        # gli stem già calcolati evitano di stemmare di nuovo le parole delle query e dei documenti aggiunti
+        TOKENIZER.load(os.path.join(filepath, STEMS_FILE))
+        segments = [Segment.load_from_disk(filepath, segment_id, first_doc, doc_count)
+                    for segment_id, first_doc, doc_count in manifest["segments"]]
+        store_path = manifest.get("description_store")
+        return cls(segments, manifest["invalid_vec"], merge_factor=manifest.get("merge_factor", 4),
+                   roaring_min_df=manifest.get("roaring_min_df"), positional=manifest.get("positional", False),
+                   ranked=manifest.get("ranked", False), forward_index=manifest.get("forward_index", False),
+                   description_store=StringColumn(os.path.join(filepath, store_path))
+                   if store_path is not None else None)
+
+    @classmethod
+    def _load_legacy(cls, filepath: str) -> "IrSystem":
+        """
+        Carica un salvataggio nel formato precedente: indice principale, biword e corpus,
+        più l'eventuale snapshot con indice ausiliario e invalid vector.
+        """
+        index_path, biword_path, corpus_path = (os.path.join(filepath, name) for name in LEGACY_MAIN_FILES)
+        with open(corpus_path, "rb") as f:
             corpus = pickle.load(f)
-        index = InvertedIndex.load_idx_from_disk(
-            os.path.join(filepath, "index.pkl"))
-        biword = InvertedIndex.load_idx_from_disk(
-            os.path.join(filepath, "biword.pkl"))
-        invalid_vec = [False] * len(corpus)
-        ir = cls(corpus, index, biword, invalid_vec)
-        return ir
+        segments = [Segment(InvertedIndex.load_idx_from_disk(index_path),
+                            InvertedIndex.load_idx_from_disk(biword_path), 0, len(corpus),
+                            docs=DocStore.from_docs(corpus))]
+        invalid_vec = InvalidVector(len(corpus))
+
+        snapshot_path = os.path.join(filepath, LEGACY_SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "rb") as f:
+                saved_state = pickle.load(f)
+            aux_paths = [os.path.join(filepath, name) for name in LEGACY_AUX_FILES]
+            aux_corpus = saved_state["aux_corpus"]
+            if aux_corpus:
+                # senza i file dell'indice ausiliario i documenti restano nel corpus ma non sono indicizzati
+                if all(map(os.path.exists, aux_paths)):
+                    aux_index, aux_biword = map(InvertedIndex.load_idx_from_disk, aux_paths)
+                else:
+                    aux_index, aux_biword = InvertedIndex(), InvertedIndex()
+                segments.append(Segment(aux_index, aux_biword, len(corpus), len(aux_corpus),
+                                        docs=DocStore.from_docs(aux_corpus)))
+            invalid_vec = saved_state["invalid_vec"]
+        return cls(segments, invalid_vec)
 
     def __len__(self):
-        return sum(x.title != "REDACTED" for x in self._corpus)
+        # documenti non ancora rimossi da un merge (i documenti eliminati ma non uniti sono contati)
+        return sum(segment.docs.live_count for segment in self._snapshot.segments)
 
 
 def infix_to_postfix(tokens: list[str]) -> list[str]:
     """
     Converte una lista di token da notazione infix a postfix.
     a AND b OR c -> a b AND c OR
+    a NOT b -> a b ANDNOT
     """
     # query risultato finale
     output = []
     # token ancora da processare
     stack = []
+    # token precedente, per distinguere il NOT binario (a NOT b) da quello unario (NOT a)
+    prev = None
     for token in tokens:
+        # Caso NOT binario: "a AND NOT b" e "a NOT b" diventano l'operatore ANDNOT (a - b)
+        if token == "NOT" and prev == "AND":
+            # sostituisce l'AND appena inserito nello stack
+            stack[-1] = "ANDNOT"
+        elif token == "NOT" and prev is not None and prev not in ("AND", "OR", "NOT", "("):
+            while stack and stack[-1] != "(":
+                output.append(stack.pop())
+            stack.append("ANDNOT")
         # Caso il token è un operatore
-        if token in ("AND", "OR", "NOT"):
+        elif token in ("AND", "OR", "NOT"):
             # finchè ci sono token da processare e il token non è una parentesi, né un NOT
             while stack and stack[-1] != "(" and token != "NOT":
                 # aggiungi alla query finale un token dopo l'altro
@@ -334,6 +779,7 @@ def infix_to_postfix(tokens: list[str]) -> list[str]:
         else:
             # aggiungi il termine all'outpuit
             output.append(token)
+        prev = token
     # svuota lo stack mettendo in output
     while stack:
         output.append(stack.pop())
@@ -344,8 +790,8 @@ def tokenize_logical_query(query: str):
     """
     Tokenizza una query, mantenendo operatori e parentesi.
     """
-    # RegEx per parole, operatori e parentesi
-    pattern = r"\b(?:AND|OR|NOT)\b|\(|\)|\w+"
+    # RegEx per parole (anche con caratteri jolly o con ~ per la tolleranza agli errori), operatori e parentesi
+    pattern = r"\b(?:AND|OR|NOT)\b|\(|\)|[\w*]+(?:~\d?)?"
     raw_tokens = re.findall(pattern, query)
 
     # lista processata di token della query
@@ -355,10 +801,23 @@ def tokenize_logical_query(query: str):
         # se sono operatori logici li mantiene
         if token.upper() in {"AND", "OR", "NOT", "(", ")"}:
             processed_query.append(token.upper())
+        elif is_fuzzy(token) and not is_wildcard(token):
+            # termine tollerante agli errori: normalizza la parola (senza stemming) e mantiene la distanza
+            word, _, distance = token.partition(FUZZY)
+            word = TOKENIZER.normalize(word)
+            processed_query.append(word + FUZZY + distance if word else EMPTY_TERM)
+        elif is_wildcard(token):
+            # un eventuale ~ dopo un pattern con caratteri jolly viene ignorato
+            token = token.partition(FUZZY)[0]
+            # pattern con caratteri jolly: normalizza i pezzi tra gli * (senza stemming né stop words)
+            wildcard = WILDCARD.join(map(TOKENIZER.normalize, token.split(WILDCARD)))
+            wildcard = re.sub(r"\*+", WILDCARD, wildcard)
+            # un pattern di soli * corrisponderebbe a tutti i termini: viene ignorato
+            processed_query.append(wildcard if wildcard.strip(WILDCARD) else EMPTY_TERM)
         else:
             # altrimenti tokenizza, normalizza, stemma e rimuove le stop words
-            stemmatized = tokenize(token)
-            if stemmatized:
-                # salva il token (se non è una stop word)
-                processed_query.append(stemmatized[0])
+            stemmatized = TOKENIZER.tokenize_query(token)
+            # salva il token, o il segnaposto EMPTY_TERM se è una stop word
+            # (così gli operatori della query restano con i loro operandi)
+            processed_query.append(stemmatized[0] if stemmatized else EMPTY_TERM)
     return processed_query
@@ -0,0 +1,203 @@
+import threading
+import time
+from functools import wraps
+
+
+class _NullTimer:
+    """
+    Timer che non misura nulla, usato quando le metriche sono disattivate e non c'è un trace.
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    """
+    Misura la durata di un blocco with e la registra nel registro (se attivo) e nel trace corrente.
+    """
+    __slots__ = ("_metrics", "_name", "_trace", "_entry", "_start")
+
+    def __init__(self, metrics: 'Metrics', name: str, trace: 'Trace') -> None:
+        self._metrics = metrics
+        self._name = name
+        self._trace = trace
+        self._entry = None
+
+    def __enter__(self):
+        if self._trace is not None:
+            self._entry = self._trace._open(self._name)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self._start
+        if self._metrics.enabled:
+            self._metrics.record(self._name, elapsed)
+        if self._entry is not None:
+            self._trace._close(self._entry, elapsed)
+
+
+class Trace:
+    """
+    Costo di ogni fase di una singola operazione (es. una query): le fasi, nell'ordine in cui iniziano
+    e con il livello di annidamento, e i contatori incrementati durante l'operazione.
+    """
+
+    def __init__(self) -> None:
+        # [nome, livello, durata in secondi]
+        self.stages = []
+        self.counters = {}
+        self._depth = 0
+
+    def _open(self, name: str) -> list:
+        entry = [name, self._depth, 0.0]
+        self.stages.append(entry)
+        self._depth += 1
+        return entry
+
+    def _close(self, entry: list, elapsed: float) -> None:
+        entry[2] = elapsed
+        self._depth -= 1
+
+    def format(self) -> list[str]:
+        """
+        Ritorna una riga per fase (indentata secondo l'annidamento) e una per contatore.
+        """
+        lines = [f"{'  ' * depth}{name}: {elapsed * 1000:.3f} ms" for name, depth, elapsed in self.stages]
+        lines += [f"{name}: {value}" for name, value in sorted(self.counters.items())]
+        return lines
+
+
+class _TraceContext:
+    """
+    Attiva un Trace per il thread corrente fino all'uscita dal blocco with.
+    """
+
+    def __init__(self, metrics: 'Metrics') -> None:
+        self._metrics = metrics
+        self._previous = None
+
+    def __enter__(self) -> Trace:
+        self._previous = self._metrics._trace()
+        self._metrics._local.trace = trace = Trace()
+        return trace
+
+    def __exit__(self, *exc) -> None:
+        self._metrics._local.trace = self._previous
+
+
+class Metrics:
+    """
+    Registro delle metriche del sistema: timer (numero di misure, tempo totale e massimo per nome)
+    e contatori. Le metriche sono disattivate di default (enabled=False): timer e contatori costano
+    solo una chiamata, così la strumentazione può restare sui percorsi critici delle query.
+    Un trace (with METRICS.trace() as trace) raccoglie le fasi e i contatori di una singola operazione
+    del thread corrente, anche con il registro disattivato.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # nome -> [numero di misure, totale in secondi, massimo in secondi]
+        self._timers = {}
+        self._counters = {}
+        # trace attivo per thread
+        self._local = threading.local()
+
+    def _trace(self) -> Trace:
+        return getattr(self._local, "trace", None)
+
+    def timer(self, name: str):
+        """
+        Context manager che misura la durata del blocco with con nome name.
+        """
+        trace = self._trace()
+        if not self.enabled and trace is None:
+            return _NULL_TIMER
+        return _Timer(self, name, trace)
+
+    def timed(self, name: str):
+        """
+        Decoratore che misura ogni chiamata della funzione con il timer name.
+        """
+        def decorator(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Registra una durata misurata altrove.
+        """
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                self._timers[name] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                timer[2] = max(timer[2], seconds)
+
+    def count(self, name: str, value: int = 1) -> None:
+        """
+        Incrementa il contatore name di value.
+        """
+        if self.enabled:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + value
+        trace = self._trace()
+        if trace is not None:
+            trace.counters[name] = trace.counters.get(name, 0) + value
+
+    def active(self) -> bool:
+        """
+        True se le misure vengono registrate (registro attivo o trace in corso nel thread):
+        permette di evitare il calcolo dei valori dei contatori quando non servono.
+        """
+        return self.enabled or self._trace() is not None
+
+    def trace(self) -> '_TraceContext':
+        """
+        Context manager che raccoglie in un Trace le misure del thread corrente.
+        """
+        return _TraceContext(self)
+
+    def stats(self) -> dict:
+        """
+        Ritorna timer (numero di misure, tempo totale, medio e massimo in millisecondi) e contatori.
+        """
+        with self._lock:
+            timers = {name: {"count": count, "total_ms": round(total * 1000, 3),
+                             "mean_ms": round(total / count * 1000, 3), "max_ms": round(maximum * 1000, 3)}
+                      for name, (count, total, maximum) in sorted(self._timers.items())}
+            return {"timers": timers, "counters": dict(sorted(self._counters.items()))}
+
+    def format(self) -> list[str]:
+        """
+        Ritorna le metriche come righe di testo (una per timer e una per contatore).
+        """
+        stats = self.stats()
+        lines = [f"{name}: {timer['count']} x {timer['mean_ms']} ms (total {timer['total_ms']} ms, "
+                 f"max {timer['max_ms']} ms)" for name, timer in stats["timers"].items()]
+        lines += [f"{name}: {value}" for name, value in stats["counters"].items()]
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+
+
+# registro condiviso da tutti i moduli
+METRICS = Metrics()
@@ -0,0 +1,207 @@
+import mmap
+import os
+import struct
+from array import array
+
+from src.postings_list import PostingsList
+from src.roaring_postings import RoaringPostingsList
+from src.positional_postings import PositionalPostingsList
+from src.frequency_postings import FrequencyPostingsList
+
+# Formato binario di un InvertedIndex (interi little endian):
+#   header: magic, versione, numero di termini, posizione delle sezioni, numero di documenti
+#   term_offsets:     n + 1 uint64, i termini sono terms_blob[term_offsets[i]:term_offsets[i + 1]]
+#   terms_blob:       termini in UTF-8 concatenati, in ordine crescente
+#   postings_offsets: n + 1 uint64, le posting list sono postings_blob[postings_offsets[i]:postings_offsets[i + 1]]
+#   postings_blob:    posting list codificate con PostingsList.encode (delta + variable-byte)
+#   kinds:            un byte per termine, tipo di posting list (0 = PostingsList, 1 = RoaringPostingsList,
+#                     2 = PositionalPostingsList, codificata con PositionalPostingsList.encode,
+#                     3 = FrequencyPostingsList, codificata con FrequencyPostingsList.encode)
+#   doc_lengths:      (opzionale, posizione 0 se assente) uint32 per documento, lunghezze dei documenti
+#                     per il ranking BM25
+# La versione 1 non ha la sezione doc_lengths (e nell'header mancano posizione e numero di documenti).
+# Ogni sezione inizia a un offset multiplo di 8 così gli offset possono essere letti
+# direttamente dal file mappato in memoria con memoryview.cast.
+MAGIC = b"IRIX"
+VERSION = 2
+HEADER_V1 = struct.Struct("<4sHxxQQQQQQ")
+HEADER = struct.Struct("<4sHxxQQQQQQQQ")
+KIND_PLAIN = 0
+KIND_ROARING = 1
+KIND_POSITIONAL = 2
+KIND_FREQUENCY = 3
+
+
+def align(f) -> None:
+    """
+    Porta la posizione del file a un multiplo di 8 (scrivendo byte a zero),
+    così gli array scritti dopo si possono mappare in memoria allineati.
+    """
+    f.write(bytes(-f.tell() % 8))
+
+
+def write_mmap_index(filepath: str, items, doc_lengths: array = None) -> None:
+    """
+    Scrive le coppie (termine, posting list), già in ordine di termine, nel formato binario,
+    insieme alle eventuali lunghezze dei documenti.
+    Il file viene scritto a parte e poi sostituito atomicamente, così un indice già mappato
+    in memoria dallo stesso percorso non viene mai troncato.
+    """
+    term_offsets = array('Q', (0,))
+    postings_offsets = array('Q', (0,))
+    terms_blob = bytearray()
+    postings_blob = bytearray()
+    kinds = bytearray()
+    for term, postings in items:
+        terms_blob += term.encode("utf-8")
+        term_offsets.append(len(terms_blob))
+        if isinstance(postings, RoaringPostingsList):
+            kinds.append(KIND_ROARING)
+            postings = PostingsList.from_sorted_array(postings.to_array())
+        elif isinstance(postings, PositionalPostingsList):
+            kinds.append(KIND_POSITIONAL)
+        elif isinstance(postings, FrequencyPostingsList):
+            kinds.append(KIND_FREQUENCY)
+        else:
+            kinds.append(KIND_PLAIN)
+        postings_blob += postings.encode()
+        postings_offsets.append(len(postings_blob))
+
+    tmp_path = filepath + ".tmp"
+    with open(tmp_path, "wb") as f:
+        # lascia spazio per l'header, scritto alla fine quando le posizioni sono note
+        f.write(bytes(HEADER.size))
+        positions = []
+        for section in (term_offsets, terms_blob, postings_offsets, postings_blob, kinds):
+            align(f)
+            positions.append(f.tell())
+            f.write(section)
+        doc_lengths_pos = n_docs = 0
+        if doc_lengths is not None:
+            align(f)
+            doc_lengths_pos = f.tell()
+            n_docs = len(doc_lengths)
+            f.write(array('I', doc_lengths))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(kinds), *positions, doc_lengths_pos, n_docs))
+    os.replace(tmp_path, filepath)
+
+
+def is_mmap_index(filepath: str) -> bool:
+    """
+    True se il file è nel formato binario (altrimenti è un indice salvato con pickle).
+    """
+    with open(filepath, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class MmapTermDictionary:
+    """
+    Dizionario termine -> posting list in sola lettura sopra un file nel formato binario mappato
+    in memoria. Espone la stessa interfaccia di lettura dell'OOBTree (get, items, keys con intervalli)
+    così da poter essere usato come InvertedIndex.btree.
+    L'apertura costa O(1): i termini vengono cercati con una ricerca binaria sul file e le
+    posting list vengono decodificate solo quando una query le richiede.
+    """
+
+    def __init__(self, filepath: str) -> None:
+        with open(filepath, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = struct.unpack_from("<4sH", self._mmap, 0)
+        if magic != MAGIC or version not in (1, VERSION):
+            raise ValueError(f"{filepath} is not a binary index (version {VERSION})")
+        if version == 1:
+            _, _, n_terms, *positions = HEADER_V1.unpack_from(self._mmap, 0)
+            doc_lengths_pos = n_docs = 0
+        else:
+            _, _, n_terms, *positions, doc_lengths_pos, n_docs = HEADER.unpack_from(self._mmap, 0)
+        self._len = n_terms
+        view = memoryview(self._mmap)
+        # lunghezze dei documenti (solo per gli indici costruiti per il ranking)
+        self.doc_lengths = view[doc_lengths_pos:doc_lengths_pos + 4 * n_docs].cast('I') if doc_lengths_pos else None
+        term_offsets_pos, terms_pos, postings_offsets_pos, postings_pos, kinds_pos = positions
+        size = 8 * (n_terms + 1)
+        self._term_offsets = view[term_offsets_pos:term_offsets_pos + size].cast('Q')
+        self._terms_pos = terms_pos
+        self._postings_offsets = view[postings_offsets_pos:postings_offsets_pos + size].cast('Q')
+        self._postings_pos = postings_pos
+        self._kinds = view[kinds_pos:kinds_pos + n_terms]
+
+    def _term_bytes(self, i: int) -> bytes:
+        start = self._terms_pos + self._term_offsets[i]
+        return self._mmap[start:self._terms_pos + self._term_offsets[i + 1]]
+
+    def _term(self, i: int) -> str:
+        return self._term_bytes(i).decode("utf-8")
+
+    def _postings(self, i: int):
+        start = self._postings_pos + self._postings_offsets[i]
+        data = self._mmap[start:self._postings_pos + self._postings_offsets[i + 1]]
+        if self._kinds[i] == KIND_POSITIONAL:
+            return PositionalPostingsList.decode(data)
+        if self._kinds[i] == KIND_FREQUENCY:
+            return FrequencyPostingsList.decode(data)
+        postings = PostingsList.decode(data)
+        if self._kinds[i] == KIND_ROARING:
+            return RoaringPostingsList.from_postings(postings)
+        return postings
+
+    def _bisect(self, key: str, right: bool = False) -> int:
+        """
+        Ricerca binaria sui termini (l'ordine dei byte UTF-8 coincide con l'ordine delle stringhe).
+        """
+        target = key.encode("utf-8")
+        lo, hi = 0, self._len
+        while lo < hi:
+            mid = (lo + hi) // 2
+            term = self._term_bytes(mid)
+            if term < target or (right and term == target):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _find(self, key: str) -> int:
+        i = self._bisect(key)
+        if i < self._len and self._term(i) == key:
+            return i
+        return -1
+
+    def _range(self, min=None, max=None, excludemin=False, excludemax=False) -> range:
+        """
+        Intervallo di indici dei termini compresi tra min e max (come gli intervalli dell'OOBTree).
+        """
+        lo = 0 if min is None else self._bisect(min, right=excludemin)
+        hi = self._len if max is None else self._bisect(max, right=not excludemax)
+        return range(lo, hi)
+
+    def get(self, key: str, default=None):
+        i = self._find(key)
+        return self._postings(i) if i >= 0 else default
+
+    def keys(self, min=None, max=None, excludemin=False, excludemax=False):
+        return map(self._term, self._range(min, max, excludemin, excludemax))
+
+    def values(self, min=None, max=None, excludemin=False, excludemax=False):
+        return map(self._postings, self._range(min, max, excludemin, excludemax))
+
+    def items(self, min=None, max=None, excludemin=False, excludemax=False):
+        return ((self._term(i), self._postings(i)) for i in self._range(min, max, excludemin, excludemax))
+
+    def __getitem__(self, key: str):
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._postings(i)
+
+    def __contains__(self, key: str) -> bool:
+        return self._find(key) >= 0
+
+    def __iter__(self):
+        return self.keys()
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __repr__(self) -> str:
+        return f"MmapTermDictionary(terms={self._len})"
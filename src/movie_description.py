@@ -4,34 +4,66 @@ class MovieDescription:
     """
     Classe che rappresenta una coppia titolo-descrizione di un film.
     """
+    # niente __dict__ per ogni documento
+    __slots__ = ("title", "description")
 
     def __init__(self, title: str, description: str) -> None:
         self.title = title
         self.description = description
 
+    def __getstate__(self):
+        return self.title, self.description
+
+    def __setstate__(self, state) -> None:
+        # compatibilità con i pickle creati prima di __slots__ (stato = __dict__)
+        if isinstance(state, dict):
+            state = state["title"], state["description"]
+        self.title, self.description = state
+
     def __repr__(self) -> str:
         return self.title
 
-def create_corpus(movie_metadata, description_file) -> list[MovieDescription]:
+def iter_corpus(movie_metadata, description_file):
     """
-    Crea il corpus di film a partire da due file:
+    Legge il corpus di film un documento alla volta (generatore), senza caricare in memoria
+    tutte le descrizioni: in memoria resta solo la mappa ID del film -> titolo.
     - movie_metadata: file TSV che contiene informazioni sui film (compreso l'ID e il titolo)
     - description_file: file TSV che contiene l'ID del film e la sua descrizione
     """
     # dizionario che mapperà l'ID del film al suo titolo
     names = {}
-    # lista finale che conterrà gli oggetti MovieDescription
-    corpus = []
-    with open(movie_metadata, 'r') as file: 
+    with open(movie_metadata, 'r') as file:
         movie_names = csv.reader(file, delimiter='\t')
         for description in movie_names:
             names[description[0]] = description[2]
     with open(description_file, 'r') as file:
         descriptions = csv.reader(file, delimiter='\t')
         for description in descriptions:
-            try:
-                corpus.append(MovieDescription(
-                    names[description[0]], description[1]))
-            except KeyError:
-                pass
-    return corpus
+            # i film senza titolo nei metadati vengono saltati
+            title = names.get(description[0])
+            if title is not None:
+                yield MovieDescription(title, description[1])
+
+
+def create_corpus(movie_metadata, description_file) -> list[MovieDescription]:
+    """
+    Crea il corpus di film a partire da due file:
+    - movie_metadata: file TSV che contiene informazioni sui film (compreso l'ID e il titolo)
+    - description_file: file TSV che contiene l'ID del film e la sua descrizione
+    """
+    return list(iter_corpus(movie_metadata, description_file))
+
+
+def batched(docs, batch_size: int):
+    """
+    Divide un iterabile di documenti in liste di al più batch_size documenti, leggendone
+    uno alla volta: in memoria c'è un solo batch per volta.
+    """
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,228 @@
+from array import array
+from bisect import bisect_left
+
+from src.bitmap import DOC_ID_TYPECODE
+from src.postings_list import PostingsList, encode_vbyte, decode_vbyte, delta_encode, delta_decode
+
+# tipo degli offset nel blob delle posizioni
+OFFSET_TYPECODE = 'I'
+
+
+class PositionalPostingsList:
+    """
+    PostingsList posizionale: per ogni docID (in ordine crescente) salva anche le posizioni,
+    all'interno del documento, in cui compare il termine.
+    Le posizioni di tutti i documenti sono compresse in un unico blob (delta + variable-byte):
+    le posizioni del documento i sono _positions[_offsets[i]:_offsets[i + 1]].
+    Usata per le phrase query esatte (phrase_match) al posto del biword index.
+    """
+    __slots__ = ("_doc_ids", "_offsets", "_positions")
+
+    def __init__(self) -> None:
+        self._doc_ids: array = array(DOC_ID_TYPECODE)
+        self._offsets: array = array(OFFSET_TYPECODE, (0,))
+        self._positions = bytearray()
+
+    def append(self, doc_id: int, positions: list[int]) -> None:
+        """
+        Aggiunge un documento (con docID maggiore di quelli già presenti) e le sue posizioni crescenti.
+        Usata durante la costruzione dell'indice.
+        """
+        self._doc_ids.append(doc_id)
+        encode_vbyte(delta_encode(positions), self._positions)
+        self._offsets.append(len(self._positions))
+
+    def extend(self, other: 'PositionalPostingsList') -> 'PositionalPostingsList':
+        """
+        Aggiunge in coda i documenti di other, che devono avere docID maggiori di quelli già presenti.
+        I blob delle posizioni vengono concatenati senza decodificarli.
+        """
+        shift = len(self._positions)
+        self._doc_ids += other._doc_ids
+        self._offsets.extend(map(shift.__add__, other._offsets[1:]))
+        self._positions += other._positions
+        return self
+
+    def positions(self, i: int) -> list[int]:
+        """
+        Ritorna le posizioni del termine nell'i-esimo documento della lista.
+        """
+        values, _ = decode_vbyte(self._positions[self._offsets[i]:self._offsets[i + 1]])
+        return delta_decode(values)
+
+    def doc_postings(self) -> PostingsList:
+        """
+        Ritorna i soli docID come PostingsList (condivide l'array, nessuna copia).
+        """
+        return PostingsList.from_sorted_array(self._doc_ids)
+
+    def union(self, other: 'PositionalPostingsList') -> 'PositionalPostingsList':
+        """
+        Ritorna una nuova lista con i documenti di entrambe (per i documenti comuni unisce le posizioni).
+        Nessuna delle due liste viene modificata.
+        """
+        result = PositionalPostingsList()
+        # caso tipico (segmenti in ordine di docID): basta concatenare
+        if not self._doc_ids or not other._doc_ids or self._doc_ids[-1] < other._doc_ids[0]:
+            return result.extend(self).extend(other)
+        i = j = 0
+        while i < len(self._doc_ids) or j < len(other._doc_ids):
+            left = self._doc_ids[i] if i < len(self._doc_ids) else None
+            right = other._doc_ids[j] if j < len(other._doc_ids) else None
+            if right is None or (left is not None and left < right):
+                result.append(left, self.positions(i))
+                i += 1
+            elif left is None or right < left:
+                result.append(right, other.positions(j))
+                j += 1
+            else:
+                result.append(left, sorted(set(self.positions(i)).union(other.positions(j))))
+                i += 1
+                j += 1
+        return result
+
+    def select(self, keep) -> 'PositionalPostingsList':
+        """
+        Ritorna una nuova lista con i soli documenti per cui keep(doc_id) è vero
+        (le posizioni vengono copiate senza decodificarle).
+        """
+        result = PositionalPostingsList()
+        for i, doc_id in enumerate(self._doc_ids):
+            if keep(doc_id):
+                result._doc_ids.append(doc_id)
+                result._positions += self._positions[self._offsets[i]:self._offsets[i + 1]]
+                result._offsets.append(len(result._positions))
+        return result
+
+    def encode(self) -> bytes:
+        """
+        Codifica la lista con variable-byte encoding: numero di documenti, gap tra i docID,
+        lunghezza in byte delle posizioni di ogni documento e infine il blob delle posizioni.
+        """
+        encoded = bytearray()
+        encode_vbyte((len(self._doc_ids),), encoded)
+        encode_vbyte(delta_encode(self._doc_ids), encoded)
+        encode_vbyte(map(int.__sub__, self._offsets[1:], self._offsets), encoded)
+        encoded += self._positions
+        return bytes(encoded)
+
+    @classmethod
+    def decode(cls, data: bytes) -> 'PositionalPostingsList':
+        """
+        Decodifica una lista prodotta da encode(). Il blob delle posizioni non viene decodificato.
+        """
+        plist = cls()
+        (n,), pos = decode_vbyte(data, 0, 1)
+        gaps, pos = decode_vbyte(data, pos, n)
+        lengths, pos = decode_vbyte(data, pos, n)
+        plist._doc_ids = array(DOC_ID_TYPECODE, delta_decode(gaps))
+        plist._offsets = array(OFFSET_TYPECODE, [0] + delta_decode(lengths))
+        plist._positions = bytearray(data[pos:])
+        return plist
+
+    def __getstate__(self) -> bytes:
+        return self.encode()
+
+    def __setstate__(self, state) -> None:
+        decoded = PositionalPostingsList.decode(state)
+        self._doc_ids, self._offsets, self._positions = decoded._doc_ids, decoded._offsets, decoded._positions
+
+    def __len__(self) -> int:
+        return len(self._doc_ids)
+
+    def __iter__(self):
+        return iter(self._doc_ids)
+
+    def __contains__(self, doc_id: int) -> bool:
+        i = bisect_left(self._doc_ids, doc_id)
+        return i < len(self._doc_ids) and self._doc_ids[i] == doc_id
+
+    def __repr__(self) -> str:
+        return ", ".join(f"{doc_id}: {self.positions(i)}" for i, doc_id in enumerate(self._doc_ids))
+
+
+def phrase_match(postings: list[PositionalPostingsList]) -> PostingsList:
+    """
+    Ritorna i docID in cui i termini delle posting list compaiono in posizioni consecutive,
+    nell'ordine dato (merge posizionale): prima interseca i docID, partendo dalla lista
+    più corta, poi per ogni documento candidato confronta le posizioni dei termini.
+    """
+    if not postings:
+        return PostingsList.create_posting_list([])
+    by_length = sorted(postings, key=len)
+    candidates = by_length[0].doc_postings()
+    for plist in by_length[1:]:
+        candidates = candidates.intersection(plist.doc_postings())
+    # indice del prossimo candidato in ciascuna lista (i candidati sono crescenti)
+    cursors = [0] * len(postings)
+    matches = array(DOC_ID_TYPECODE)
+    for doc_id in candidates:
+        starts = None
+        for k, plist in enumerate(postings):
+            i = bisect_left(plist._doc_ids, doc_id, cursors[k])
+            cursors[k] = i
+            # posizioni da cui potrebbe iniziare la frase, secondo il k-esimo termine
+            shifted = {position - k for position in plist.positions(i)}
+            starts = shifted if starts is None else starts & shifted
+            if not starts:
+                break
+        if starts:
+            matches.append(doc_id)
+    return PostingsList.from_sorted_array(matches)
+
+
+def add_positions(positions: dict, words: list[str], doc_id: int) -> None:
+    """
+    Aggiunge doc_id, con le posizioni in cui compare, alla PositionalPostingsList
+    di ciascuna parola di words (creandola se la parola è nuova).
+    """
+    word_positions = {}
+    for position, word in enumerate(words):
+        occurrences = word_positions.get(word)
+        if occurrences is None:
+            word_positions[word] = [position]
+        else:
+            occurrences.append(position)
+    for word, occurrences in word_positions.items():
+        plist = positions.get(word)
+        if plist is None:
+            positions[word] = plist = PositionalPostingsList()
+        plist.append(doc_id, occurrences)
+
+
+def pack_positions(positions: dict) -> tuple[list[str], array, array, array, bytearray]:
+    """
+    Converte una mappa parola -> PositionalPostingsList in (parole, offset, docID concatenati,
+    fine delle posizioni di ogni documento nel blob, blob concatenato):
+    i docID della parola i sono doc_ids[bounds[i]:bounds[i + 1]].
+    """
+    bounds = array(DOC_ID_TYPECODE, (0,))
+    doc_ids = array(DOC_ID_TYPECODE)
+    ends = array(OFFSET_TYPECODE)
+    blob = bytearray()
+    for plist in positions.values():
+        doc_ids += plist._doc_ids
+        ends.extend(map(len(blob).__add__, plist._offsets[1:]))
+        blob += plist._positions
+        bounds.append(len(doc_ids))
+    return list(positions), bounds, doc_ids, ends, blob
+
+
+def merge_position_shards(shards: list[tuple[list[str], array, array, array, bytearray]]) -> dict:
+    """
+    Unisce le mappe compatte (pack_positions) di più shard, in ordine di shard,
+    in una mappa parola -> PositionalPostingsList concatenando i pezzi di ogni shard.
+    """
+    merged = {}
+    for words, bounds, doc_ids, ends, blob in shards:
+        for i, word in enumerate(words):
+            lo, hi = bounds[i], bounds[i + 1]
+            start = ends[lo - 1] if lo else 0
+            plist = merged.get(word)
+            if plist is None:
+                merged[word] = plist = PositionalPostingsList()
+            shift = len(plist._positions) - start
+            plist._doc_ids += doc_ids[lo:hi]
+            plist._offsets.extend(map(shift.__add__, ends[lo:hi]))
+            plist._positions += blob[start:ends[hi - 1]]
+    return merged
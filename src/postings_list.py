@@ -1,22 +1,89 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import chain, filterfalse
+
+from src.bitmap import Bitmap, DOC_ID_TYPECODE
+
+
+def encode_vbyte(values, out: bytearray) -> None:
+    """
+    Aggiunge a out i valori (interi non negativi) con variable-byte encoding:
+    7 bit per byte, il bit alto segna l'ultimo byte del numero.
+    """
+    for value in values:
+        while value >= 0x80:
+            out.append(value & 0x7F)
+            value >>= 7
+        out.append(value | 0x80)
+
+
+def decode_vbyte(data, start: int = 0, count: int = -1) -> tuple[list[int], int]:
+    """
+    Decodifica count valori (tutti se count è -1) da data a partire dalla posizione start.
+    Ritorna i valori e la posizione successiva all'ultimo byte letto.
+    """
+    values = []
+    value = 0
+    shift = 0
+    pos = start
+    end = len(data)
+    while pos < end and count:
+        byte = data[pos]
+        pos += 1
+        if byte & 0x80:
+            values.append(value | ((byte & 0x7F) << shift))
+            value = 0
+            shift = 0
+            count -= 1
+        else:
+            value |= byte << shift
+            shift += 7
+    return values, pos
+
+
+def delta_encode(values):
+    """
+    Delta encoding di una sequenza crescente: ritorna i gap tra valori consecutivi.
+    """
+    prev = 0
+    for value in values:
+        yield value - prev
+        prev = value
+
+
+def delta_decode(gaps) -> list[int]:
+    """
+    Ricostruisce la sequenza crescente a partire dai gap (inverso di delta_encode).
+    """
+    total = 0
+    values = []
+    for gap in gaps:
+        total += gap
+        values.append(total)
+    return values
+
+
 # Lista dei postings aka i docID
 class PostingsList:
     """
-    Classe che rappresenta una posting list. Una PostingsList è una lista di interi
-    dove ogni intero è un posting, ovvero il docID di un documento.
+    Classe che rappresenta una posting list. Una PostingsList è un array compatto di interi
+    senza segno dove ogni intero è un posting, ovvero il docID di un documento.
+    Su disco (pickle) i docID vengono salvati con delta + variable-byte encoding.
     """
+    # niente __dict__ per ogni posting list: l'indice ne contiene una per ogni termine
+    __slots__ = ("_postings_list",)
 
     def __init__(self) -> None:
-        self._postings_list: list[int] = []
+        self._postings_list: array = array(DOC_ID_TYPECODE)
 
     @classmethod
-    def create_posting_list(cls, postings_list: list[int]) -> 'PostingsList':
+    def create_posting_list(cls, postings_list) -> 'PostingsList':
         """
-        Crea una PostingsList a partire da una lista di docID.
+        Crea una PostingsList a partire da una lista (o iterabile) di docID.
         Ordina i docID per garantire che siano sempre in ordine crescente.
         """
         plist = cls()
-        postings_list.sort()
-        plist._postings_list = postings_list
+        plist._postings_list = array(DOC_ID_TYPECODE, sorted(postings_list))
         return plist
 
     @classmethod
@@ -25,7 +92,16 @@ class PostingsList:
         Crea una PostingsList che contiene un singolo docID.
         """
         plist = cls()
-        plist._postings_list = [doc_id]
+        plist._postings_list = array(DOC_ID_TYPECODE, (doc_id,))
+        return plist
+
+    @classmethod
+    def from_sorted_array(cls, postings: array) -> 'PostingsList':
+        """
+        Crea una PostingsList da un array di docID già ordinato e senza duplicati (nessuna copia).
+        """
+        plist = cls()
+        plist._postings_list = postings
         return plist
 
     def merge(self, other: "PostingsList") -> 'PostingsList':
@@ -33,21 +109,21 @@ class PostingsList:
         Concatena due PostingsList ordinate evitando duplicati.
         other contiene una PostingsList creata successivamente a self (i docID saranno piu grandi o uguali)
         """
+        # other è una posting list di tipo diverso (es. RoaringPostingsList): la converte in array
+        if not isinstance(other, PostingsList):
+            other = PostingsList.from_sorted_array(other.to_array())
         # se la lista corrente è vuota
-        if self._postings_list == []:
+        if not self._postings_list:
             # e se anche other è vuota, ritorna direttamente una nuova PostingsList vuota
-            if other._postings_list == []:
+            if not other._postings_list:
                 return PostingsList.create_posting_list([])
-            else:
-                # altrimenti copia direttamente l'altra
-                self._postings_list = other._postings_list
-        # start index per la posting list other
-        i = 0
+            # altrimenti copia direttamente l'altra
+            self._postings_list = array(DOC_ID_TYPECODE, other._postings_list)
+            return self
         # ultimo docID nella lista corrente
         last = self._postings_list[-1]
-        # loop su i. Salta i duplicati in 'other' che coincidono con l'ultimo docID di self
-        while (i < len(other._postings_list) and last == other._postings_list[i]):
-            i += 1
+        # salta i duplicati in 'other' che coincidono con l'ultimo docID di self (ricerca binaria)
+        i = bisect_left(other._postings_list, last + 1)
         # aggiunge tutti i restanti docID (quelli non duplicati)
         self._postings_list += other._postings_list[i:]
         return self
@@ -55,74 +131,269 @@ class PostingsList:
     def get_from_corpus(self, corpus) -> list[str]:
         """
         Ritorna una lista di stringhe descrittive per ciascun docID nella lista,
-        nella forma "docID: titolo".
+        nella forma "docID: titolo" (i titoli vengono letti da un CorpusView).
         """
-        return list(map(lambda x: str(x) + ": " + str(corpus[x]), self._postings_list))
+        return list(map(lambda x: str(x) + ": " + corpus.title(x), self._postings_list))
 
     def intersection(self, other: "PostingsList") -> 'PostingsList':
         """
-        Effettua l'intersezione (AND) tra due PostingsList usando l'algoritmo a doppio indice.
+        Effettua l'intersezione (AND) tra due PostingsList con galloping search:
+        per ogni docID della lista più corta cerca la posizione nella più lunga con
+        ricerca esponenziale + binaria, a partire dall'ultima posizione trovata.
+        Il costo è O(corta * log(lunga / corta)) invece di O(corta + lunga).
         Ritorna una nuova PostingsList con i docID presenti in entrambe le liste.
         """
-        plist = []
-        i = 0  # indice riferito a self
-        j = 0  # indice riferito a other
-        # finché non si eccede la dimensione di ciascuna lista:
-        while (i < len(self._postings_list)) and (j < len(other._postings_list)):
-            # se c'e' un match aggiungi l'elemento e incrmeneta entrambi
-            if self._postings_list[i] == other._postings_list[j]:
-                plist.append(self._postings_list[i])
-                i += 1
-                j += 1
-            # se questo id è più piccolo aumentalo
-            elif self._postings_list[i] <= other._postings_list[j]:
-                i += 1
-            # altrimenti aumenta l'altro
-            else:
-                j += 1
-        return PostingsList.create_posting_list(plist)
+        # other è una posting list di tipo diverso (es. RoaringPostingsList): delega a lei
+        if not isinstance(other, PostingsList):
+            return other.intersection(self)
+        small, large = self._postings_list, other._postings_list
+        if len(small) > len(large):
+            small, large = large, small
+        plist = array(DOC_ID_TYPECODE)
+        # se una delle due è vuota o gli intervalli non si sovrappongono non c'è nulla da fare
+        if not small or small[0] > large[-1] or large[0] > small[-1]:
+            return PostingsList.from_sorted_array(plist)
+        n = len(large)
+        lo = 0  # posizione corrente nella lista lunga
+        for doc_id in small:
+            # galloping: raddoppia il passo finché non supera doc_id
+            step = 1
+            hi = lo + 1
+            while hi < n and large[hi] < doc_id:
+                lo = hi
+                step <<= 1
+                hi = lo + step
+            # ricerca binaria nell'intervallo individuato
+            lo = bisect_left(large, doc_id, lo, min(hi + 1, n))
+            if lo == n:
+                break
+            if large[lo] == doc_id:
+                plist.append(doc_id)
+                lo += 1
+        return PostingsList.from_sorted_array(plist)
 
     def union(self, other: "PostingsList") -> 'PostingsList':
         """
-        Effettua l'unione (OR) tra due PostingsList usando l'algoritmo a doppio indice.
+        Effettua l'unione (OR) tra due PostingsList.
         Ritorna una nuova PostingsList con tutti i docID presenti almeno in una delle due liste.
         """
-        plist = []
-        i = 0  # indice riferito a self
-        j = 0  # indice riferito a other
-        # fintanto che gli indici sono più piccoli di entrambe le liste
-        while (i < len(self._postings_list)) and (j < len(other._postings_list)):
-            # Caso docID presente in entrambe: lo aggiunge una sola volta
-            if self._postings_list[i] == other._postings_list[j]:
-                plist.append(self._postings_list[i])
-                i += 1
-                j += 1
-            # Caso aggiunta docID solo da self o solo da other:
-            # aggiunge il docID e aumenta il più piccolo
-            elif self._postings_list[i] < other._postings_list[j]:
-                plist.append(self._postings_list[i])
-                i += 1
-            else:
-                plist.append(other._postings_list[j])
-                j += 1
-        # aggiunge eventuali docID rimasti nella lista più lunga
-        if i < len(self._postings_list):
-            plist += self._postings_list[i:]
-        elif j < len(other._postings_list):
-            plist += other._postings_list[j:]
-        return PostingsList.create_posting_list(plist)
+        # other è una posting list di tipo diverso (es. RoaringPostingsList): delega a lei
+        if not isinstance(other, PostingsList):
+            return other.union(self)
+        left, right = self._postings_list, other._postings_list
+        # casi banali: una delle due liste è vuota
+        if not left or not right:
+            return PostingsList.from_sorted_array(array(DOC_ID_TYPECODE, left or right))
+        # intervalli disgiunti: basta concatenare gli array
+        if left[-1] < right[0]:
+            return PostingsList.from_sorted_array(left + right)
+        if right[-1] < left[0]:
+            return PostingsList.from_sorted_array(right + left)
+        # caso generale: unione e ordinamento eseguiti in C invece del doppio indice in Python
+        return PostingsList.from_sorted_array(
+            array(DOC_ID_TYPECODE, sorted(set(left).union(right))))
+
+    def difference(self, other: "PostingsList") -> 'PostingsList':
+        """
+        Effettua la differenza (AND NOT) tra due PostingsList: i docID di self che non sono in other.
+        other viene trasformata in una Bitmap e self viene filtrata in un unico passaggio.
+        """
+        # vista su più segmenti: la concatena una volta invece di cercare ogni docID nei segmenti
+        if isinstance(other, PostingsUnionView):
+            other = other.materialize()
+        # other è una posting list di tipo diverso (es. RoaringPostingsList): usa il suo test di appartenenza
+        if not isinstance(other, PostingsList):
+            return PostingsList.from_sorted_array(
+                array(DOC_ID_TYPECODE, filterfalse(other.__contains__, self._postings_list)))
+        left, right = self._postings_list, other._postings_list
+        # se non ci sono docID in comune possibili, il risultato è self
+        if not left or not right or left[-1] < right[0] or right[-1] < left[0]:
+            return PostingsList.from_sorted_array(array(DOC_ID_TYPECODE, left))
+        return PostingsList.from_sorted_array(
+            Bitmap.from_postings(right, left[-1] + 1).exclude(left))
 
     def negation(self, max_doc: int) -> 'PostingsList':
         """
         Ritorna una nuova PostingsList che rappresenta la negazione:
         tutti i docID possibili [0, ..., max_doc - 1] esclusi quelli presenti in self.
+        Il complemento viene calcolato sulla Bitmap dei docID di self.
+        """
+        return PostingsList.from_sorted_array(
+            Bitmap.from_postings(self._postings_list, max_doc).complement().to_array())
+
+    def to_array(self) -> array:
+        """
+        Ritorna l'array ordinato dei docID (senza copiarlo: non va modificato).
+        """
+        return self._postings_list
+
+    def encode(self) -> bytes:
         """
-        # crea una lista iniziale con tutti i docID possibili
-        plist = [i for i in range(max_doc)]
-        # rimuove i docID presenti in self
-        for i in self._postings_list:
-            plist.remove(i)
-        return PostingsList.create_posting_list(plist)
+        Codifica i docID con delta encoding (gap tra docID consecutivi)
+        e variable-byte encoding (7 bit per byte, il bit alto segna l'ultimo byte del numero).
+        """
+        encoded = bytearray()
+        encode_vbyte(delta_encode(self._postings_list), encoded)
+        return bytes(encoded)
+
+    @classmethod
+    def decode(cls, data: bytes) -> 'PostingsList':
+        """
+        Decodifica una PostingsList prodotta da encode().
+        """
+        gaps, _ = decode_vbyte(data)
+        return cls.from_sorted_array(array(DOC_ID_TYPECODE, delta_decode(gaps)))
+
+    def __getstate__(self) -> bytes:
+        # nel pickle salva la versione compressa
+        return self.encode()
+
+    def __setstate__(self, state) -> None:
+        # compatibilità con i pickle creati quando _postings_list era una list[int]
+        if isinstance(state, dict):
+            self._postings_list = array(DOC_ID_TYPECODE, state["_postings_list"])
+        else:
+            self._postings_list = PostingsList.decode(state)._postings_list
+
+    def __len__(self) -> int:
+        return len(self._postings_list)
+
+    def __iter__(self):
+        return iter(self._postings_list)
+
+    def __contains__(self, doc_id: int) -> bool:
+        i = bisect_left(self._postings_list, doc_id)
+        return i < len(self._postings_list) and self._postings_list[i] == doc_id
 
     def __repr__(self) -> str:
         return ", ".join(map(str, self._postings_list))
+
+
+def union_all(postings: list) -> PostingsList:
+    """
+    Unione di più posting list in un unico passaggio (merge a k vie) invece di k - 1 unioni a coppie,
+    che creerebbero ciascuna una lista intermedia: tutti i docID vengono raccolti in un set
+    e ordinati una sola volta (in C). Con una sola lista non vuota la ritorna senza copiarla.
+    """
+    postings = [plist for plist in postings if plist]
+    if not postings:
+        return PostingsList()
+    if len(postings) == 1:
+        return postings[0]
+    doc_ids = set()
+    for plist in postings:
+        doc_ids.update(plist.to_array())
+    return PostingsList.from_sorted_array(array(DOC_ID_TYPECODE, sorted(doc_ids)))
+
+
+def _first(postings) -> int:
+    # primo docID di una posting list non vuota
+    return postings._postings_list[0] if isinstance(postings, PostingsList) else next(iter(postings))
+
+
+def _last(postings) -> int:
+    # ultimo docID di una posting list non vuota
+    return postings.to_array()[-1]
+
+
+class PostingsUnionView:
+    """
+    Vista in sola lettura sull'unione delle posting list di un termine nei vari segmenti.
+    I segmenti coprono intervalli di docID disgiunti e crescenti, quindi l'unione è la
+    concatenazione delle parti: la vista le scorre in ordine di docID senza copiarle né modificarle.
+    Le operazioni lavorano parte per parte; solo unione e negazione generali concatenano le parti
+    (con una copia degli array in C) in una PostingsList.
+    """
+    __slots__ = ("_parts", "_firsts")
+
+    def __init__(self, parts: list) -> None:
+        # parti non vuote, in ordine crescente di docID e con intervalli disgiunti
+        self._parts = parts
+        # primo docID di ogni parte, per cercare la parte che può contenere un docID
+        self._firsts = [_first(part) for part in parts]
+
+    @classmethod
+    def of(cls, parts):
+        """
+        Ritorna l'unione delle parti (posting list con intervalli di docID disgiunti e crescenti,
+        None per i segmenti che non contengono il termine): una lista vuota se non ce ne sono,
+        la parte stessa se è una sola (nessun costo rispetto a un indice unico), altrimenti una vista.
+        """
+        parts = [part for part in parts if part]
+        if not parts:
+            return PostingsList()
+        if len(parts) == 1:
+            return parts[0]
+        return cls(parts)
+
+    def to_array(self) -> array:
+        """
+        Ritorna l'array ordinato di tutti i docID (concatenando quelli delle parti).
+        """
+        postings = array(DOC_ID_TYPECODE)
+        for part in self._parts:
+            postings += part.to_array()
+        return postings
+
+    def materialize(self) -> PostingsList:
+        """
+        Ritorna una PostingsList con tutti i docID della vista.
+        """
+        return PostingsList.from_sorted_array(self.to_array())
+
+    def intersection(self, other) -> 'PostingsUnionView':
+        """
+        Effettua l'intersezione (AND) parte per parte: ogni risultato è contenuto nella propria parte,
+        quindi i risultati formano a loro volta una vista.
+        """
+        return PostingsUnionView.of([part.intersection(other) for part in self._parts])
+
+    def union(self, other):
+        """
+        Effettua l'unione (OR). Se other segue (o precede) tutti i docID della vista
+        basta aggiungere le sue parti, altrimenti concatena la vista in una PostingsList.
+        """
+        if not other:
+            return self
+        other_parts = other._parts if isinstance(other, PostingsUnionView) else [other]
+        if _last(self._parts[-1]) < _first(other_parts[0]):
+            return PostingsUnionView(self._parts + other_parts)
+        if _last(other_parts[-1]) < self._firsts[0]:
+            return PostingsUnionView(other_parts + self._parts)
+        if isinstance(other, PostingsUnionView):
+            other = other.materialize()
+        return self.materialize().union(other)
+
+    def difference(self, other) -> 'PostingsUnionView':
+        """
+        Effettua la differenza (AND NOT) parte per parte.
+        """
+        if isinstance(other, PostingsUnionView):
+            other = other.materialize()
+        return PostingsUnionView.of([part.difference(other) for part in self._parts])
+
+    def negation(self, max_doc: int) -> PostingsList:
+        """
+        Ritorna la negazione rispetto ai docID [0, ..., max_doc - 1].
+        """
+        return self.materialize().negation(max_doc)
+
+    def get_from_corpus(self, corpus) -> list[str]:
+        """
+        Ritorna una lista di stringhe descrittive per ciascun docID nella lista,
+        nella forma "docID: titolo" (i titoli vengono letti da un CorpusView).
+        """
+        return list(map(lambda x: str(x) + ": " + corpus.title(x), self))
+
+    def __len__(self) -> int:
+        return sum(map(len, self._parts))
+
+    def __iter__(self):
+        return chain.from_iterable(self._parts)
+
+    def __contains__(self, doc_id: int) -> bool:
+        i = bisect_right(self._firsts, doc_id) - 1
+        return i >= 0 and doc_id in self._parts[i]
+
+    def __repr__(self) -> str:
+        return ", ".join(map(str, self))
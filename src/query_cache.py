@@ -0,0 +1,91 @@
+import threading
+from collections import OrderedDict
+
+from src.metrics import METRICS
+
+
+class QueryCache:
+    """
+    Cache LRU dei risultati delle query: chiave = query normalizzata (espressione postfix
+    o parole della frase), valore = (PostingsList del risultato, numero di docID del sistema
+    quando è stato calcolato).
+    La cache ha un limite sul numero di risultati e sul numero totale di docID salvati:
+    oltre i limiti vengono eliminati i risultati usati meno di recente.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_postings: int = 1_000_000) -> None:
+        self.max_entries = max_entries
+        self.max_postings = max_postings
+        self._entries = OrderedDict()
+        # numero totale di docID nei risultati salvati
+        self._postings = 0
+        # le query possono essere eseguite da più thread
+        self._lock = threading.Lock()
+        # metriche
+        self.hits = 0
+        self.misses = 0
+        self.patches = 0
+        self.evictions = 0
+
+    def get(self, key: tuple):
+        """
+        Ritorna (risultato, numero di docID) salvati per la query, oppure None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple, result, doc_count: int) -> None:
+        """
+        Salva il risultato di una query calcolato su doc_count docID.
+        Un risultato più vecchio (calcolato su meno docID) non sostituisce quello già presente.
+        """
+        size = len(result)
+        if not self.max_entries or size > self.max_postings:
+            return
+        with self._lock:
+            old = self._entries.get(key)
+            if old is not None:
+                if old[1] > doc_count:
+                    return
+                self._postings -= len(old[0])
+            self._entries[key] = (result, doc_count)
+            self._entries.move_to_end(key)
+            self._postings += size
+            while len(self._entries) > self.max_entries or self._postings > self.max_postings:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._postings -= len(evicted)
+                self.evictions += 1
+
+    def record(self, event: str) -> None:
+        """
+        Incrementa una metrica ("hits", "misses" o "patches").
+        """
+        with self._lock:
+            setattr(self, event, getattr(self, event) + 1)
+        METRICS.count("cache." + event)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._postings = 0
+
+    def stats(self) -> dict:
+        """
+        Ritorna le metriche della cache: hit, miss, risultati aggiornati dopo un'aggiunta
+        di documenti, risultati eliminati, numero di risultati e di docID salvati.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "patches": self.patches,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "postings": self._postings,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
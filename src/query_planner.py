@@ -0,0 +1,263 @@
+from functools import reduce
+from math import log2
+
+from src.metrics import METRICS
+from src.postings_list import PostingsList
+
+
+class PlanNode:
+    """
+    Nodo dell'albero di una query booleana:
+    - TERM: un termine (term)
+    - AND: intersezione dei figli (children) meno l'unione degli esclusi (excluded),
+      cioè c1 AND c2 AND ... AND NOT e1 AND NOT e2 ...
+    - OR: unione dei figli
+    - NOT: complemento dell'unico figlio rispetto a tutti i docID
+    estimate è la cardinalità stimata del risultato, cost il costo stimato della valutazione
+    (numero di docID letti o scritti).
+    """
+    __slots__ = ("op", "term", "children", "excluded", "estimate", "cost")
+
+    def __init__(self, op: str, children: list['PlanNode'] = None, excluded: list['PlanNode'] = None,
+                 term: str = None) -> None:
+        self.op = op
+        self.term = term
+        self.children = children or []
+        self.excluded = excluded or []
+        self.estimate = 0
+        self.cost = 0
+
+    def __repr__(self) -> str:
+        if self.op == "TERM":
+            return self.term
+        if self.op == "NOT":
+            return f"NOT {self.children[0]!r}"
+        parts = [repr(child) for child in self.children] + [f"NOT {node!r}" for node in self.excluded]
+        return "(" + f" {self.op} ".join(parts) + ")"
+
+
+def make_not(node: PlanNode) -> PlanNode:
+    # doppia negazione: NOT NOT a = a
+    if node.op == "NOT":
+        return node.children[0]
+    return PlanNode("NOT", [node])
+
+
+def make_and(nodes: list[PlanNode]) -> PlanNode:
+    """
+    Crea un AND appiattendo gli AND annidati; i figli negati (NOT y) diventano esclusi,
+    così x AND NOT y viene eseguito come differenza senza calcolare il complemento di y.
+    """
+    children = []
+    excluded = []
+    for node in nodes:
+        if node.op == "AND":
+            children += node.children
+            excluded += node.excluded
+        elif node.op == "NOT":
+            excluded.append(node.children[0])
+        else:
+            children.append(node)
+    # solo negazioni: NOT a AND NOT b = NOT (a OR b), un solo complemento
+    if not children:
+        return make_not(make_or(excluded))
+    if len(children) == 1 and not excluded:
+        return children[0]
+    return PlanNode("AND", children, excluded)
+
+
+def make_or(nodes: list[PlanNode]) -> PlanNode:
+    """
+    Crea un OR appiattendo gli OR annidati.
+    """
+    children = []
+    for node in nodes:
+        children += node.children if node.op == "OR" else [node]
+    if len(children) == 1:
+        return children[0]
+    return PlanNode("OR", children)
+
+
+# segnaposto di un operando rimosso dalla tokenizzazione (es. una stop word): non vincola la query
+EMPTY_TERM = ""
+
+
+def _combine(token: str, left: PlanNode, right: PlanNode) -> PlanNode:
+    # un operatore binario con un solo operando equivale all'operando rimasto
+    if left is None or right is None:
+        return left if right is None else right
+    if token == "AND":
+        return make_and([left, right])
+    if token == "OR":
+        return make_or([left, right])
+    return make_and([left, make_not(right)])
+
+
+def build_tree(postfixes: list[str]) -> PlanNode:
+    """
+    Costruisce l'albero della query a partire dall'espressione postfix di infix_to_postfix
+    (operatori AND, OR, ANDNOT e NOT unario). Ritorna None se la query è vuota.
+    Gli operandi mancanti (EMPTY_TERM o assenti, es. "dog AND the") vengono ignorati:
+    l'operatore binario diventa l'operando rimasto e il NOT di niente non ha effetto.
+    """
+    stack = []
+
+    def pop() -> PlanNode:
+        return stack.pop() if stack else None
+
+    for token in postfixes:
+        if token in ("AND", "OR", "ANDNOT"):
+            right = pop()
+            left = pop()
+            stack.append(_combine(token, left, right))
+        elif token == "NOT":
+            operand = pop()
+            stack.append(make_not(operand) if operand is not None else None)
+        elif token == EMPTY_TERM:
+            stack.append(None)
+        else:
+            stack.append(PlanNode("TERM", term=token))
+    return pop()
+
+
+def _intersection_cost(a: float, b: float) -> float:
+    # intersezione con galloping search: O(corta * log(lunga / corta))
+    small, large = min(a, b), max(a, b)
+    return small * max(1.0, log2(large / max(small, 1.0) + 1))
+
+
+class QueryPlanner:
+    """
+    Planner basato sui costi: costruisce l'albero della query, stima la cardinalità di ogni nodo
+    dalle document frequency dei termini (assumendo termini indipendenti) e sceglie l'ordine
+    di valutazione che minimizza la dimensione dei risultati intermedi:
+    - AND: interseca partendo dai figli più piccoli, poi sottrae gli esclusi partendo dai più grandi
+      (quelli che riducono di più il risultato) e si ferma appena il risultato è vuoto
+    - OR: unisce partendo dai figli più piccoli
+    lookup(term) ritorna la PostingsList di un termine, max_doc è il numero di docID (per i NOT).
+    Più planner sugli stessi segmenti possono condividere le PostingsList dei termini (postings)
+    e i risultati delle sottoespressioni (results, chiave = descrizione del nodo), così in un batch
+    di query ogni termine e ogni sottoespressione comune vengono valutati una sola volta.
+    """
+
+    def __init__(self, lookup, max_doc: int, postings: dict = None, results: dict = None) -> None:
+        self._lookup = lookup
+        self.max_doc = max_doc
+        # PostingsList dei termini della query, cercate una sola volta
+        self._postings = postings if postings is not None else {}
+        # risultati delle sottoespressioni (None = non condivisi)
+        self._results = results
+
+    def plan(self, postfixes: list[str]) -> PlanNode:
+        """
+        Ritorna l'albero della query, con stime e ordine di valutazione dei figli.
+        """
+        root = build_tree(postfixes)
+        if root is not None:
+            self._estimate(root)
+        return root
+
+    def _term_postings(self, term: str):
+        postings = self._postings.get(term)
+        if postings is None:
+            postings = self._postings[term] = self._lookup(term)
+        return postings
+
+    def _estimate(self, node: PlanNode) -> None:
+        """
+        Calcola (ricorsivamente) cardinalità stimata e costo del nodo e ordina i figli.
+        """
+        n = max(self.max_doc, 1)
+        if node.op == "TERM":
+            # la document frequency è esatta
+            node.estimate = len(self._term_postings(node.term))
+            node.cost = 0
+            return
+        for child in node.children + node.excluded:
+            self._estimate(child)
+        cost = sum(child.cost for child in node.children + node.excluded)
+        if node.op == "NOT":
+            node.estimate = max(0, self.max_doc - node.children[0].estimate)
+            # il complemento scorre tutti i docID
+            node.cost = cost + self.max_doc
+        elif node.op == "OR":
+            node.children.sort(key=lambda child: child.estimate)
+            missing = 1.0
+            size = 0.0
+            for i, child in enumerate(node.children):
+                if i:
+                    cost += size + child.estimate
+                missing *= 1 - min(child.estimate / n, 1.0)
+                size = n * (1 - missing)
+            node.estimate = round(size)
+            node.cost = cost
+        else:
+            node.children.sort(key=lambda child: child.estimate)
+            node.excluded.sort(key=lambda child: child.estimate, reverse=True)
+            size = float(node.children[0].estimate)
+            for child in node.children[1:]:
+                cost += _intersection_cost(size, child.estimate)
+                size *= child.estimate / n
+            for child in node.excluded:
+                cost += size + child.estimate
+                size *= 1 - min(child.estimate / n, 1.0)
+            node.estimate = round(size)
+            node.cost = cost
+
+    def execute(self, node: PlanNode):
+        """
+        Valuta il piano e ritorna la PostingsList del risultato (senza rimuovere i documenti eliminati).
+        """
+        if node is None:
+            return PostingsList.create_posting_list([])
+        if node.op == "TERM":
+            return self._term_postings(node.term)
+        if self._results is None:
+            result = self._execute_node(node)
+        else:
+            key = repr(node)
+            result = self._results.get(key)
+            if result is None:
+                result = self._results[key] = self._execute_node(node)
+        if METRICS.active():
+            # dimensione dei risultati intermedi (sottoespressioni AND, OR e NOT)
+            METRICS.count("query.intermediate_docs", len(result))
+        return result
+
+    def _execute_node(self, node: PlanNode):
+        """
+        Valuta un nodo AND, OR o NOT.
+        """
+        if node.op == "NOT":
+            return self.execute(node.children[0]).negation(self.max_doc)
+        if node.op == "OR":
+            return reduce(lambda x, y: x.union(y), map(self.execute, node.children))
+        result = self.execute(node.children[0])
+        for child in node.children[1:]:
+            # intersezione vuota: non serve valutare gli altri figli
+            if not result:
+                return result
+            result = result.intersection(self.execute(child))
+        for child in node.excluded:
+            if not result:
+                return result
+            result = result.difference(self.execute(child))
+        return result
+
+    def explain(self, node: PlanNode, indent: int = 0) -> list[str]:
+        """
+        Ritorna la descrizione del piano, una riga per nodo nell'ordine di valutazione,
+        con cardinalità e costo stimati.
+        """
+        pad = "  " * indent
+        if node is None:
+            return [pad + "EMPTY"]
+        if node.op == "TERM":
+            return [f"{pad}TERM {node.term} (df={node.estimate})"]
+        lines = [f"{pad}{node.op} (estimated rows={node.estimate}, cost={round(node.cost)})"]
+        for child in node.children:
+            lines += self.explain(child, indent + 1)
+        for child in node.excluded:
+            lines.append(f"{pad}  EXCEPT")
+            lines += self.explain(child, indent + 2)
+        return lines
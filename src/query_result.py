@@ -0,0 +1,49 @@
+from itertools import islice
+
+from src.doc_store import CorpusView
+from src.metrics import METRICS
+from src.postings_list import PostingsList
+
+
+class QueryResult:
+    """
+    Risultato di una query: i docID trovati (già senza i documenti eliminati) e il corpus
+    dello snapshot da cui leggere i titoli. Il numero di risultati è disponibile subito, mentre le stringhe
+    "docID: titolo" vengono create solo per la pagina richiesta (page), non per tutto il risultato.
+    """
+    __slots__ = ("_postings", "_corpus")
+
+    def __init__(self, postings, corpus: CorpusView) -> None:
+        # PostingsList, RoaringPostingsList o PostingsUnionView (non vengono mai modificate)
+        self._postings = postings
+        self._corpus = corpus
+
+    def doc_ids(self, offset: int = 0, limit: int = None) -> list[int]:
+        """
+        Ritorna i docID dei risultati da offset (compreso) per al più limit risultati
+        (tutti quelli da offset in poi se limit è None), in ordine crescente.
+        """
+        stop = None if limit is None else offset + limit
+        # PostingsList semplice: basta una slice dell'array
+        if isinstance(self._postings, PostingsList):
+            return self._postings.to_array()[offset:stop].tolist()
+        return list(islice(self._postings, offset, stop))
+
+    def page(self, offset: int = 0, limit: int = None) -> list[str]:
+        """
+        Ritorna le stringhe "docID: titolo" dei risultati da offset per al più limit risultati.
+        """
+        with METRICS.timer("query.page"):
+            return [f"{doc_id}: {self._corpus.title(doc_id)}" for doc_id in self.doc_ids(offset, limit)]
+
+    def __len__(self) -> int:
+        return len(self._postings)
+
+    def __iter__(self):
+        return iter(self._postings)
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self._postings
+
+    def __repr__(self) -> str:
+        return f"QueryResult(count={len(self)})"
@@ -0,0 +1,162 @@
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+from math import log
+
+from src.bitmap import DOC_ID_TYPECODE, InvalidVector
+from src.frequency_postings import FrequencyPostingsList, TF_TYPECODE
+from src.segment import Segment
+
+# parametri di BM25: saturazione della term frequency e peso della normalizzazione per lunghezza
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+class TermCursor:
+    """
+    Cursore sui docID (e term frequency) di un termine in tutti i segmenti,
+    con il contributo massimo del termine al punteggio (upper bound usato da MaxScore).
+    """
+    __slots__ = ("doc_ids", "frequencies", "idf", "upper_bound", "pos")
+
+    def __init__(self, doc_ids: array, frequencies: array, idf: float, upper_bound: float) -> None:
+        self.doc_ids = doc_ids
+        self.frequencies = frequencies
+        self.idf = idf
+        self.upper_bound = upper_bound
+        self.pos = 0
+
+    def current(self) -> int:
+        """
+        docID corrente, None se il cursore è esaurito.
+        """
+        return self.doc_ids[self.pos] if self.pos < len(self.doc_ids) else None
+
+    def seek(self, doc_id: int) -> bool:
+        """
+        Avanza fino al primo docID >= doc_id; ritorna True se è proprio doc_id.
+        """
+        self.pos = bisect_left(self.doc_ids, doc_id, self.pos)
+        return self.pos < len(self.doc_ids) and self.doc_ids[self.pos] == doc_id
+
+
+class BM25Scorer:
+    """
+    Ranking BM25 sui segmenti di uno snapshot. Le term frequency vengono dalle FrequencyPostingsList
+    (1 per le PostingsList semplici), le lunghezze dei documenti dagli InvertedIndex dei segmenti:
+    se qualche segmento non le ha, la normalizzazione per lunghezza viene disattivata (b = 0).
+    I top k vengono calcolati document-at-a-time con l'algoritmo MaxScore: i termini sono ordinati
+    per contributo massimo e quelli la cui somma dei contributi massimi non supera il punteggio
+    minimo del heap dei top k (non essenziali) non possono da soli portare un documento nei top k,
+    quindi vengono cercati solo nei documenti dei termini essenziali e solo finché il punteggio
+    può ancora superare la soglia.
+    """
+
+    def __init__(self, segments: tuple[Segment, ...], invalid_vec: InvalidVector,
+                 k1: float = BM25_K1, b: float = BM25_B) -> None:
+        self.segments = segments
+        self.invalid_vec = invalid_vec
+        self.k1 = k1
+        # numero di documenti validi
+        self.n_docs = len(invalid_vec) - invalid_vec.deleted_count
+        # primo docID di ogni segmento, per trovare il segmento di un documento
+        self._firsts = [segment.first_doc for segment in segments]
+        if all(segment.index.doc_lengths is not None for segment in segments) and self.n_docs:
+            total = sum(segment.total_length() for segment in segments)
+            # esclude i documenti eliminati dalla lunghezza media
+            total -= sum(map(self.doc_length, invalid_vec.deleted_ids))
+            self.avg_length = max(total / self.n_docs, 1.0)
+            self.b = b
+        else:
+            self.avg_length = 1.0
+            self.b = 0.0
+
+    def doc_length(self, doc_id: int) -> int:
+        return self.segments[bisect_right(self._firsts, doc_id) - 1].doc_length(doc_id)
+
+    def _cursor(self, term: str) -> TermCursor:
+        """
+        Crea il cursore di un termine concatenando le sue posting list nei vari segmenti
+        (in ordine di docID). Ritorna None se il termine non compare.
+        """
+        doc_ids = array(DOC_ID_TYPECODE)
+        frequencies = array(TF_TYPECODE)
+        for segment in self.segments:
+            postings = segment.index.btree.get(term)
+            if not postings:
+                continue
+            doc_ids += postings.to_array()
+            if isinstance(postings, FrequencyPostingsList):
+                frequencies += postings.frequencies()
+            else:
+                frequencies.extend([1] * len(postings))
+        if not doc_ids:
+            return None
+        df = len(doc_ids)
+        idf = log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+        # contributo massimo: term frequency massima e documento di lunghezza minima (0)
+        max_tf = max(frequencies)
+        upper_bound = idf * max_tf * (self.k1 + 1) / (max_tf + self.k1 * (1 - self.b))
+        return TermCursor(doc_ids, frequencies, idf, upper_bound)
+
+    def _score(self, cursor: TermCursor, doc_id: int) -> float:
+        # contributo del termine al punteggio del documento (il cursore è posizionato su doc_id)
+        tf = cursor.frequencies[cursor.pos]
+        norm = 1 - self.b + self.b * self.doc_length(doc_id) / self.avg_length if self.b else 1.0
+        return cursor.idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+
+    def top_k(self, terms: list[str], k: int) -> list[tuple[int, float]]:
+        """
+        Ritorna i k documenti validi con punteggio BM25 più alto per i termini dati,
+        come coppie (docID, punteggio) in ordine decrescente di punteggio.
+        """
+        if k <= 0 or not self.n_docs:
+            return []
+        cursors = [cursor for cursor in map(self._cursor, dict.fromkeys(terms)) if cursor is not None]
+        # ordine crescente di contributo massimo; bounds[i] = somma dei contributi massimi dei primi i + 1
+        cursors.sort(key=lambda cursor: cursor.upper_bound)
+        bounds = []
+        total = 0.0
+        for cursor in cursors:
+            total += cursor.upper_bound
+            bounds.append(total)
+
+        heap = []
+        threshold = 0.0
+        # i cursori da first_essential in poi sono essenziali
+        first_essential = 0
+        invalid_vec = self.invalid_vec
+        while first_essential < len(cursors):
+            essential = cursors[first_essential:]
+            current = [cursor.current() for cursor in essential]
+            candidates = [doc_id for doc_id in current if doc_id is not None]
+            if not candidates:
+                break
+            doc_id = min(candidates)
+            score = 0.0
+            for cursor, cursor_doc in zip(essential, current):
+                if cursor_doc == doc_id:
+                    score += self._score(cursor, doc_id)
+                    cursor.pos += 1
+            if invalid_vec[doc_id]:
+                continue
+            # termini non essenziali, dal contributo massimo più alto: si ferma appena
+            # il punteggio non può più superare la soglia
+            for i in range(first_essential - 1, -1, -1):
+                if score + bounds[i] <= threshold:
+                    break
+                cursor = cursors[i]
+                if cursor.seek(doc_id):
+                    score += self._score(cursor, doc_id)
+            if len(heap) < k:
+                heapq.heappush(heap, (score, -doc_id))
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, (score, -doc_id))
+            else:
+                continue
+            if len(heap) == k:
+                threshold = heap[0][0]
+                # i termini la cui somma dei contributi massimi non supera la soglia diventano non essenziali
+                while first_essential < len(cursors) and bounds[first_essential] <= threshold:
+                    first_essential += 1
+        return [(-neg_doc, score) for score, neg_doc in sorted(heap, key=lambda x: (-x[0], -x[1]))]
@@ -0,0 +1,286 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import compress
+
+from src.bitmap import DOC_ID_TYPECODE, bits_to_flags
+from src.postings_list import PostingsList, PostingsUnionView
+
+# ogni container copre 2^16 docID consecutivi (stessi 16 bit alti)
+CHUNK_BITS = 16
+CHUNK_SIZE = 1 << CHUNK_BITS
+LOW_MASK = CHUNK_SIZE - 1
+# oltre questa cardinalità un array container (2 byte per docID) occupa più di un bitmap container (8 KB)
+ARRAY_MAX_CARDINALITY = 4096
+BITMAP_BYTES = CHUNK_SIZE >> 3
+
+
+class RunContainer:
+    """
+    Container di sequenze (run) di docID consecutivi: per ogni run salva l'inizio
+    e la lunghezza - 1, entrambi come interi a 16 bit.
+    """
+    __slots__ = ("starts", "lengths")
+
+    def __init__(self, starts: array, lengths: array) -> None:
+        self.starts = starts
+        self.lengths = lengths
+
+    def __getstate__(self):
+        return (self.starts, self.lengths)
+
+    def __setstate__(self, state) -> None:
+        self.starts, self.lengths = state
+
+
+# Un container è uno tra:
+# - array('H') ordinato dei 16 bit bassi (chunk sparsi)
+# - int usato come bitmap da 2^16 bit (chunk densi)
+# - RunContainer (chunk con lunghe sequenze di docID consecutivi)
+
+def _cardinality(container) -> int:
+    if isinstance(container, array):
+        return len(container)
+    if isinstance(container, int):
+        return container.bit_count()
+    return len(container.lengths) + sum(container.lengths)
+
+
+def _to_bitmap(container) -> int:
+    """
+    Converte un container nella rappresentazione bitmap (int da 2^16 bit).
+    """
+    if isinstance(container, int):
+        return container
+    if isinstance(container, array):
+        bits = bytearray(BITMAP_BYTES)
+        for low in container:
+            bits[low >> 3] |= 1 << (low & 7)
+        return int.from_bytes(bits, "little")
+    value = 0
+    for start, length in zip(container.starts, container.lengths):
+        value |= ((1 << (length + 1)) - 1) << start
+    return value
+
+
+def _bitmap_values(value: int) -> array:
+    """
+    Ritorna l'array ordinato delle posizioni dei bit a 1 di un bitmap container.
+    """
+    return array('H', compress(range(CHUNK_SIZE), bits_to_flags(value.to_bytes(BITMAP_BYTES, "little"))))
+
+
+def _values(container) -> array:
+    """
+    Ritorna i 16 bit bassi dei docID del container, in ordine crescente.
+    """
+    if isinstance(container, array):
+        return container
+    if isinstance(container, int):
+        return _bitmap_values(container)
+    values = array('H')
+    for start, length in zip(container.starts, container.lengths):
+        values.extend(range(start, start + length + 1))
+    return values
+
+
+def _contains(container, low: int) -> bool:
+    if isinstance(container, array):
+        i = bisect_left(container, low)
+        return i < len(container) and container[i] == low
+    if isinstance(container, int):
+        return bool(container >> low & 1)
+    i = bisect_right(container.starts, low) - 1
+    return i >= 0 and low <= container.starts[i] + container.lengths[i]
+
+
+def _optimize(value: int):
+    """
+    Sceglie la rappresentazione più compatta per un chunk dato come bitmap:
+    run container, array container o bitmap container. Ritorna None se il chunk è vuoto.
+    """
+    cardinality = value.bit_count()
+    if not cardinality:
+        return None
+    # un run inizia dove un bit a 1 non è preceduto da un altro bit a 1
+    run_starts = value & ~(value << 1)
+    runs = run_starts.bit_count()
+    if 4 * runs < min(2 * cardinality, BITMAP_BYTES):
+        # un run finisce dove un bit a 1 non è seguito da un altro bit a 1
+        starts = _bitmap_values(run_starts)
+        ends = _bitmap_values(value & ~(value >> 1))
+        return RunContainer(starts, array('H', map(int.__sub__, ends, starts)))
+    if cardinality <= ARRAY_MAX_CARDINALITY:
+        return _bitmap_values(value)
+    return value
+
+
+def _from_values(values: array):
+    """
+    Crea il container per un chunk a partire dall'array ordinato dei suoi 16 bit bassi.
+    """
+    if len(values) <= ARRAY_MAX_CARDINALITY:
+        return values
+    return _optimize(_to_bitmap(values))
+
+
+class RoaringPostingsList:
+    """
+    PostingsList ibrida in stile roaring bitmap: i docID sono divisi in chunk da 2^16
+    (in base ai 16 bit alti) e ogni chunk usa il container più compatto tra array ordinato,
+    bitmap e run. Intersezione, unione, differenza e negazione lavorano container per container.
+    Adatta ai termini con document frequency molto alta.
+    """
+
+    def __init__(self) -> None:
+        # chiavi (16 bit alti) dei chunk non vuoti, in ordine crescente
+        self._keys: list[int] = []
+        # container dei chunk, paralleli a _keys
+        self._containers: list = []
+
+    @classmethod
+    def create_posting_list(cls, postings_list) -> 'RoaringPostingsList':
+        """
+        Crea una RoaringPostingsList a partire da una lista (o iterabile) di docID.
+        """
+        return cls.from_sorted_array(array(DOC_ID_TYPECODE, sorted(set(postings_list))))
+
+    @classmethod
+    def from_sorted_array(cls, postings) -> 'RoaringPostingsList':
+        """
+        Crea una RoaringPostingsList da un array di docID ordinato e senza duplicati.
+        """
+        plist = cls()
+        lo = 0
+        n = len(postings)
+        while lo < n:
+            key = postings[lo] >> CHUNK_BITS
+            # fine del chunk corrente (primo docID con chiave successiva)
+            hi = bisect_left(postings, (key + 1) << CHUNK_BITS, lo)
+            plist._keys.append(key)
+            plist._containers.append(_from_values(array('H', map(LOW_MASK.__and__, postings[lo:hi]))))
+            lo = hi
+        return plist
+
+    @classmethod
+    def from_postings(cls, postings) -> 'RoaringPostingsList':
+        """
+        Converte una PostingsList (o una RoaringPostingsList o una PostingsUnionView) in RoaringPostingsList.
+        """
+        if isinstance(postings, RoaringPostingsList):
+            return postings
+        return cls.from_sorted_array(postings.to_array())
+
+    def _binary_op(self, other: 'RoaringPostingsList', bitmap_op, keep_left: bool, keep_right: bool) -> 'RoaringPostingsList':
+        """
+        Applica un'operazione chunk per chunk: bitmap_op combina due bitmap container
+        dei chunk presenti in entrambe; keep_left/keep_right indicano se i chunk presenti
+        solo a sinistra/destra vanno copiati nel risultato.
+        """
+        result = RoaringPostingsList()
+        i = j = 0
+        left_keys, right_keys = self._keys, other._keys
+        while i < len(left_keys) or j < len(right_keys):
+            left_key = left_keys[i] if i < len(left_keys) else None
+            right_key = right_keys[j] if j < len(right_keys) else None
+            if right_key is None or (left_key is not None and left_key < right_key):
+                if keep_left:
+                    result._keys.append(left_key)
+                    result._containers.append(self._containers[i])
+                i += 1
+            elif left_key is None or right_key < left_key:
+                if keep_right:
+                    result._keys.append(right_key)
+                    result._containers.append(other._containers[j])
+                j += 1
+            else:
+                container = _optimize(bitmap_op(_to_bitmap(self._containers[i]), _to_bitmap(other._containers[j])))
+                if container is not None:
+                    result._keys.append(left_key)
+                    result._containers.append(container)
+                i += 1
+                j += 1
+        return result
+
+    def intersection(self, other) -> 'RoaringPostingsList':
+        """
+        Effettua l'intersezione (AND). Se other è una PostingsList semplice
+        controlla l'appartenenza di ciascun suo docID: O(len(other)).
+        """
+        # vista su più segmenti: interseca parte per parte
+        if isinstance(other, PostingsUnionView):
+            return other.intersection(self)
+        if isinstance(other, PostingsList):
+            return PostingsList.from_sorted_array(
+                array(DOC_ID_TYPECODE, filter(self.__contains__, other._postings_list)))
+        return self._binary_op(other, int.__and__, False, False)
+
+    def union(self, other) -> 'RoaringPostingsList':
+        """
+        Effettua l'unione (OR) chunk per chunk.
+        """
+        return self._binary_op(RoaringPostingsList.from_postings(other), int.__or__, True, True)
+
+    def difference(self, other) -> 'RoaringPostingsList':
+        """
+        Effettua la differenza (AND NOT) chunk per chunk.
+        """
+        return self._binary_op(RoaringPostingsList.from_postings(other),
+                               lambda x, y: x & ~y, True, False)
+
+    def negation(self, max_doc: int) -> 'RoaringPostingsList':
+        """
+        Ritorna la negazione rispetto ai docID [0, ..., max_doc - 1]:
+        ogni chunk viene complementato come bitmap, i chunk assenti diventano un unico run.
+        """
+        result = RoaringPostingsList()
+        containers = dict(zip(self._keys, self._containers))
+        for key in range((max_doc + CHUNK_SIZE - 1) >> CHUNK_BITS):
+            # numero di docID validi nel chunk (l'ultimo può essere parziale)
+            limit = min(CHUNK_SIZE, max_doc - (key << CHUNK_BITS))
+            if key in containers:
+                container = _optimize(~_to_bitmap(containers[key]) & ((1 << limit) - 1))
+            else:
+                container = RunContainer(array('H', (0,)), array('H', (limit - 1,)))
+            if container is not None:
+                result._keys.append(key)
+                result._containers.append(container)
+        return result
+
+    def merge(self, other) -> 'RoaringPostingsList':
+        """
+        Aggiunge a questa lista i docID di other (unione sul posto).
+        """
+        merged = self.union(other)
+        self._keys, self._containers = merged._keys, merged._containers
+        return self
+
+    def to_array(self) -> array:
+        """
+        Ritorna l'array ordinato di tutti i docID.
+        """
+        postings = array(DOC_ID_TYPECODE)
+        for key, container in zip(self._keys, self._containers):
+            postings.extend(map((key << CHUNK_BITS).__add__, _values(container)))
+        return postings
+
+    def get_from_corpus(self, corpus) -> list[str]:
+        """
+        Ritorna una lista di stringhe descrittive per ciascun docID nella lista,
+        nella forma "docID: titolo" (i titoli vengono letti da un CorpusView).
+        """
+        return list(map(lambda x: str(x) + ": " + corpus.title(x), self))
+
+    def __len__(self) -> int:
+        return sum(map(_cardinality, self._containers))
+
+    def __iter__(self):
+        for key, container in zip(self._keys, self._containers):
+            yield from map((key << CHUNK_BITS).__add__, _values(container))
+
+    def __contains__(self, doc_id: int) -> bool:
+        key = doc_id >> CHUNK_BITS
+        i = bisect_left(self._keys, key)
+        return i < len(self._keys) and self._keys[i] == key and _contains(self._containers[i], doc_id & LOW_MASK)
+
+    def __repr__(self) -> str:
+        return ", ".join(map(str, self))
@@ -0,0 +1,230 @@
+import os
+import pickle
+import uuid
+from bisect import bisect_left
+
+from src.inverted_index import InvertedIndex, to_roaring
+from src.movie_description import MovieDescription
+from src.bitmap import InvalidVector
+from src.doc_store import DocStore
+from src.forward_index import ForwardIndex
+from src.metrics import METRICS
+
+
+class Segment:
+    """
+    Segmento immutabile del sistema IR: InvertedIndex e biword index (oppure indice posizionale)
+    e DocStore (titoli e descrizioni) dei documenti con docID in [first_doc, first_doc + doc_count).
+    I segmenti non vengono mai modificati: un merge crea un nuovo segmento che sostituisce quelli uniti.
+    Il ForwardIndex (opzionale) permette ai merge di rimuovere i documenti eliminati
+    riscrivendo solo le PostingsList dei loro termini.
+    """
+
+    def __init__(self, index: InvertedIndex, biword: InvertedIndex, first_doc: int, doc_count: int,
+                 segment_id: str = None, positions: InvertedIndex = None, docs: DocStore = None,
+                 forward: ForwardIndex = None) -> None:
+        self.index = index
+        # indici per le phrase query: biword index oppure indice posizionale (l'altro è None)
+        self.biword = biword
+        self.positions = positions
+        # documenti del segmento, in ordine di docID
+        self.docs = docs
+        # forward index (None se il segmento non lo ha); quello di un segmento caricato da disco
+        # viene letto dal file _forward_path solo quando serve (al primo merge)
+        self._forward = forward
+        self._forward_path = None
+        # somma delle lunghezze dei documenti (per il ranking), calcolata alla prima richiesta
+        self._total_length = None
+        self.first_doc = first_doc
+        self.doc_count = doc_count
+        # identificativo univoco, usato anche per i nomi dei file su disco
+        self.segment_id = segment_id if segment_id is not None else uuid.uuid4().hex
+
+    @classmethod
+    def from_corpus(cls, docs: list[MovieDescription], first_doc: int, roaring_min_df: int = None,
+                    processes: int = 1, positional: bool = False, ranked: bool = False,
+                    descriptions: bool = True, forward: bool = False) -> 'Segment':
+        """
+        Crea un segmento indicizzando i documenti docs, con docID a partire da first_doc.
+        Con processes > 1 l'indicizzazione viene divisa tra più processi.
+        Con positional=True crea l'indice posizionale invece del biword index,
+        con ranked=True salva anche term frequency e lunghezze dei documenti.
+        Con descriptions=False il DocStore del segmento contiene solo i titoli.
+        Con forward=True crea anche il ForwardIndex del segmento.
+        """
+        with METRICS.timer("build.index"):
+            index, phrase_idx = InvertedIndex.create_indexes_from_corpus(
+                docs, first_doc, processes=processes, roaring_min_df=roaring_min_df, positional=positional,
+                ranked=ranked)
+        with METRICS.timer("build.docs"):
+            store = DocStore.from_docs(docs, descriptions)
+        METRICS.count("build.docs_indexed", len(docs))
+        forward_idx = None
+        if forward:
+            with METRICS.timer("build.forward"):
+                forward_idx = ForwardIndex.from_indexes(index, phrase_idx, first_doc, len(docs))
+        if positional:
+            return cls(index, None, first_doc, len(docs), positions=phrase_idx, docs=store, forward=forward_idx)
+        return cls(index, phrase_idx, first_doc, len(docs), docs=store, forward=forward_idx)
+
+    @classmethod
+    def merge(cls, segments: list['Segment'], invalid_vec: InvalidVector, roaring_min_df: int = None) -> 'Segment':
+        """
+        Unisce segmenti contigui (in ordine di docID) in un nuovo segmento,
+        rimuovendo i documenti marcati come eliminati in invalid_vec dagli indici
+        e sostituendoli con REDACTED nel DocStore.
+        Se tutti i segmenti hanno il ForwardIndex vengono riscritte solo le PostingsList
+        dei termini dei documenti eliminati, altrimenti tutte.
+        I segmenti di partenza non vengono modificati.
+        """
+        with METRICS.timer("merge.indexes"):
+            index = InvertedIndex.merge_all([segment.index for segment in segments])
+            # biword index e indice posizionale vengono uniti solo se tutti i segmenti li hanno
+            biword = positions = None
+            if all(segment.biword is not None for segment in segments):
+                biword = InvertedIndex.merge_all([segment.biword for segment in segments])
+            if all(segment.positions is not None for segment in segments):
+                positions = InvertedIndex.merge_all([segment.positions for segment in segments])
+        first_doc = segments[0].first_doc
+        doc_count = segments[-1].first_doc + segments[-1].doc_count - first_doc
+        deleted = [doc_id - first_doc for segment in segments for doc_id in segment.deleted_in_range(invalid_vec)]
+        forwards = [segment.forward for segment in segments]
+        forward = None
+        if all(forward is not None for forward in forwards):
+            forward = ForwardIndex.concat(forwards, [segment.doc_count for segment in segments])
+        # aggiorna le PostingList (toglie i docID segnati come eliminati)
+        if deleted:
+            with METRICS.timer("merge.remove_deleted"):
+                if forward is not None:
+                    # solo i termini dei documenti eliminati (e non già rimossi da un merge precedente)
+                    terms, phrases = forward.affected(deleted)
+                    METRICS.count("merge.rewritten_terms", len(terms) + len(phrases))
+                    index.remove_deleted_docs(invalid_vec, terms)
+                    for idx in (biword, positions):
+                        if idx is not None:
+                            idx.remove_deleted_docs(invalid_vec, phrases)
+                    forward = forward.purge(deleted)
+                else:
+                    for idx in (index, biword, positions):
+                        if idx is not None:
+                            idx.remove_deleted_docs(invalid_vec)
+        if forward is not None:
+            with METRICS.timer("merge.forward"):
+                forward = forward.compact()
+        # i termini diventati frequenti passano a RoaringPostingsList
+        if roaring_min_df is not None:
+            index.btree.update(to_roaring(dict(index.btree.items()), roaring_min_df))
+            if biword is not None:
+                biword.btree.update(to_roaring(dict(biword.btree.items()), roaring_min_df))
+        with METRICS.timer("merge.docs"):
+            docs = DocStore.merge([segment.docs for segment in segments], deleted)
+        return cls(index, biword, first_doc, doc_count, positions=positions, docs=docs, forward=forward)
+
+    @property
+    def forward(self) -> ForwardIndex:
+        """
+        ForwardIndex del segmento (None se non lo ha), letto da disco alla prima richiesta.
+        """
+        if self._forward is None and self._forward_path is not None:
+            self._forward = ForwardIndex.load(self._forward_path)
+        return self._forward
+
+    def level(self, merge_factor: int) -> int:
+        """
+        Livello del segmento nella politica di merge logaritmica:
+        floor(log_merge_factor(doc_count)). Segmenti dello stesso livello hanno dimensioni simili.
+        """
+        level = 0
+        size = self.doc_count
+        while size >= merge_factor:
+            size //= merge_factor
+            level += 1
+        return level
+
+    def total_length(self) -> int:
+        """
+        Ritorna la somma delle lunghezze dei documenti del segmento (0 se l'indice non le ha).
+        """
+        if self._total_length is None:
+            lengths = self.index.doc_lengths
+            self._total_length = sum(lengths) if lengths is not None else 0
+        return self._total_length
+
+    def doc_length(self, doc_id: int) -> int:
+        """
+        Ritorna la lunghezza di un documento del segmento (l'indice deve avere le lunghezze).
+        """
+        return self.index.doc_lengths[doc_id - self.first_doc]
+
+    def deleted_in_range(self, invalid_vec: InvalidVector):
+        """
+        Ritorna i docID eliminati che appartengono a questo segmento.
+        """
+        deleted = invalid_vec.deleted_ids
+        lo = bisect_left(deleted, self.first_doc)
+        hi = bisect_left(deleted, self.first_doc + self.doc_count)
+        return deleted[lo:hi]
+
+    def file_paths(self, filepath: str) -> tuple[str, str, str, str, str]:
+        """
+        Ritorna i percorsi dei file (indice, biword, indice posizionale, documenti, forward index)
+        del segmento nella cartella filepath. Gli indici sono nel formato binario di src.mmap_index,
+        i documenti in quello di src.doc_store.
+        """
+        return tuple(os.path.join(filepath, f"segment_{self.segment_id}_{name}")
+                     for name in ("index.idx", "biword.idx", "positions.idx", "docs.bin", "forward.pkl"))
+
+    def write_to_disk(self, filepath: str) -> None:
+        """
+        Salva indici e documenti del segmento. Essendo immutabile,
+        se i file esistono già non vengono riscritti.
+        """
+        index_path, biword_path, positions_path, docs_path, forward_path = self.file_paths(filepath)
+        indexes = [(idx, path) for idx, path in ((self.index, index_path), (self.biword, biword_path),
+                                                 (self.positions, positions_path)) if idx is not None]
+        # (un segmento caricato da un'altra cartella legge il suo forward index per copiarlo)
+        if not os.path.exists(forward_path) and self.forward is not None:
+            self.forward.write(forward_path)
+        if all(os.path.exists(path) for _, path in indexes) and os.path.exists(docs_path):
+            return
+        for idx, path in indexes:
+            idx.write_idx_to_disk(path)
+        self.docs.write(docs_path)
+
+    @classmethod
+    def load_from_disk(cls, filepath: str, segment_id: str, first_doc: int, doc_count: int) -> 'Segment':
+        """
+        Carica un segmento e i suoi documenti da disco.
+        I segmenti salvati prima del DocStore hanno i documenti in un file .pkl (lista di MovieDescription):
+        vengono convertiti e riscritti nel nuovo formato al salvataggio successivo.
+        """
+        segment = cls(None, None, first_doc, doc_count, segment_id)
+        index_path, biword_path, positions_path, docs_path, forward_path = segment.file_paths(filepath)
+        segment.index = cls._load_index(index_path)
+        segment.biword = cls._load_index(biword_path)
+        segment.positions = cls._load_index(positions_path)
+        if os.path.exists(docs_path):
+            segment.docs = DocStore.load(docs_path)
+        else:
+            with open(os.path.join(filepath, f"segment_{segment_id}_corpus.pkl"), "rb") as f:
+                segment.docs = DocStore.from_docs(pickle.load(f))
+        if os.path.exists(forward_path):
+            segment._forward_path = forward_path
+        return segment
+
+    @staticmethod
+    def _load_index(path: str) -> InvertedIndex:
+        """
+        Carica un indice del segmento, None se il segmento non lo ha.
+        I segmenti salvati prima del formato binario hanno indice e biword in file .pkl:
+        vengono caricati con pickle e riscritti nel nuovo formato al salvataggio successivo.
+        """
+        legacy_path = os.path.splitext(path)[0] + ".pkl"
+        if os.path.exists(path):
+            return InvertedIndex.load_idx_from_disk(path)
+        if os.path.exists(legacy_path):
+            return InvertedIndex.load_idx_from_disk(legacy_path)
+        return None
+
+    def __repr__(self) -> str:
+        return f"Segment(docs={self.first_doc}-{self.first_doc + self.doc_count - 1}, terms={len(self.index)})"
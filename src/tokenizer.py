@@ -0,0 +1,124 @@
+import os
+import pickle
+import re
+from itertools import islice
+
+from stop_words import get_stop_words
+# stemmer per ridurre le parole alla loro radice
+from nltk.stem import SnowballStemmer
+
+STOP_WORDS = frozenset(get_stop_words('english'))
+# punteggiatura da rimuovere in normalizzazione (compilata una sola volta)
+PUNCTUATION = re.compile(r'[^\w\s^-]')
+# numero massimo di stem memorizzati (oltre, gli stem nuovi vengono calcolati ma non salvati)
+MAX_STEMS = 1_000_000
+
+
+class Tokenizer:
+    """
+    Pipeline di tokenizzazione usata sia per i documenti sia per le query:
+    normalizzazione (rimozione della punteggiatura con un pattern precompilato e minuscole),
+    rimozione delle stop words e stemming.
+    Lo stemmer è uno solo, riusato per tutte le parole, e gli stem calcolati vengono memorizzati
+    in un dizionario parola -> stem che può essere salvato insieme all'indice e ricaricato
+    all'apertura, così le parole già viste non vengono mai stemmate di nuovo.
+    """
+
+    def __init__(self, max_stems: int = MAX_STEMS) -> None:
+        self._stemmer = SnowballStemmer("english")
+        self.max_stems = max_stems
+        # parola -> stem
+        self._stems = {}
+
+    def normalize(self, text: str) -> str:
+        """
+        Rimuove la punteggiatura e converte il testo in minuscolo.
+        """
+        return PUNCTUATION.sub('', text).lower()
+
+    def stem(self, word: str) -> str:
+        """
+        Ritorna lo stem di una parola, calcolandolo solo la prima volta.
+        """
+        stem = self._stems.get(word)
+        if stem is None:
+            stem = self._stemmer.stem(word)
+            if len(self._stems) < self.max_stems:
+                self._stems[word] = stem
+        return stem
+
+    def stem_words(self, words: list[str]) -> list[str]:
+        """
+        Rimuove le stop words da una lista di parole già normalizzate e applica lo stemming.
+        """
+        stems = self._stems
+        stem = self.stem
+        # lookup diretto nel dizionario, il metodo stem solo per le parole nuove
+        return [stems.get(word) or stem(word) for word in words if word not in STOP_WORDS]
+
+    def tokenize(self, text: str) -> list[str]:
+        """
+        Normalizza il testo, rimuove le stop words e applica lo stemming a ogni parola.
+        """
+        return self.stem_words(self.normalize(text).split())
+
+    def tokenize_query(self, text: str) -> list[str]:
+        """
+        Come tokenize, ma gli stem delle parole nuove non vengono memorizzati: il dizionario
+        contiene solo le parole dei documenti ed è usato anche come vocabolario delle parole
+        non stemmate per le query con caratteri jolly.
+        """
+        stems = self._stems
+        stemmer = self._stemmer
+        return [stems.get(word) or stemmer.stem(word)
+                for word in self.normalize(text).split() if word not in STOP_WORDS]
+
+    def tokenize_many(self, texts, stem: bool = True) -> list[list[str]]:
+        """
+        Tokenizza più testi: ritorna, per ciascuno, la lista dei termini (come tokenize)
+        oppure, con stem=False, la lista delle parole normalizzate (per biword e posizioni).
+        """
+        normalize = self.normalize
+        if not stem:
+            return [normalize(text).split() for text in texts]
+        stem_words = self.stem_words
+        return [stem_words(normalize(text).split()) for text in texts]
+
+    def warm(self, stems: dict) -> None:
+        """
+        Aggiunge al dizionario degli stem quelli già calcolati (es. caricati da disco).
+        """
+        for word, stem in stems.items():
+            if len(self._stems) >= self.max_stems:
+                break
+            self._stems.setdefault(word, stem)
+
+    def stems_since(self, start: int) -> dict:
+        """
+        Ritorna gli stem memorizzati dopo i primi start (il dizionario mantiene l'ordine di inserimento
+        e non viene mai ridotto), per esempio quelli calcolati da un processo del pool.
+        """
+        return dict(islice(self._stems.items(), start, None))
+
+    def save(self, filepath: str) -> None:
+        """
+        Salva il dizionario degli stem (su un file temporaneo poi rinominato).
+        """
+        with open(filepath + ".tmp", "wb") as f:
+            pickle.dump(self._stems, f)
+        os.replace(filepath + ".tmp", filepath)
+
+    def load(self, filepath: str) -> None:
+        """
+        Carica il dizionario degli stem salvato con save, se il file esiste.
+        """
+        if os.path.exists(filepath):
+            with open(filepath, "rb") as f:
+                self.warm(pickle.load(f))
+
+    def __len__(self) -> int:
+        return len(self._stems)
+
+
+# tokenizer condiviso da indicizzazione e query (ogni processo del pool ne ha una copia)
+TOKENIZER = Tokenizer()
@@ -0,0 +1,75 @@
+from abc import ABC, abstractmethod
+
+
+class Vocabulary(ABC):
+    """
+    Vocabolario dei termini su cui espandere i termini speciali delle query (caratteri jolly, errori
+    di battitura). Contiene sia i termini stemmati degli indici sia le parole non stemmate dei documenti
+    (il dizionario degli stem del tokenizer), ciascuna associata ai termini dell'indice da cercare:
+    i termini stemmati a sé stessi, le parole al proprio stem.
+    Il vocabolario viene costruito con il sistema e cresce in modo incrementale (update, con i soli
+    termini dei segmenti nuovi) e non viene mai ridotto: un termine non più presente negli indici
+    produce solo una posting list vuota.
+    Le sottoclassi costruiscono la propria struttura di ricerca in _index_term.
+    """
+
+    def __init__(self) -> None:
+        # termine -> id
+        self._ids = {}
+        # id -> termine e id -> termini dell'indice da cercare
+        self._terms = []
+        self._targets = []
+        # numero di parole del tokenizer già aggiunte
+        self._word_count = 0
+
+    @abstractmethod
+    def _index_term(self, term_id: int, term: str) -> None:
+        """
+        Aggiunge un termine nuovo (con id crescenti) alla struttura di ricerca.
+        """
+
+    def _add(self, term: str, target: str) -> None:
+        term_id = self._ids.get(term)
+        if term_id is not None:
+            targets = self._targets[term_id]
+            if target not in targets:
+                targets.append(target)
+            return
+        term_id = len(self._terms)
+        self._ids[term] = term_id
+        self._terms.append(term)
+        self._targets.append([target])
+        self._index_term(term_id, term)
+
+    def add_terms(self, terms) -> None:
+        """
+        Aggiunge termini dell'indice (già stemmati).
+        """
+        for term in terms:
+            self._add(term, term)
+
+    def add_words(self, stems: dict) -> None:
+        """
+        Aggiunge parole non stemmate, come dizionario parola -> stem.
+        """
+        for word, stem in stems.items():
+            self._add(word, stem)
+
+    def update(self, terms, tokenizer) -> None:
+        """
+        Aggiunge i termini di un segmento nuovo e le parole stemmate dal tokenizer
+        dopo l'ultimo aggiornamento.
+        """
+        self.add_terms(terms)
+        stems = tokenizer.stems_since(self._word_count)
+        self.add_words(stems)
+        self._word_count += len(stems)
+
+    def _targets_of(self, term_ids) -> set[str]:
+        targets = set()
+        for term_id in term_ids:
+            targets.update(self._targets[term_id])
+        return targets
+
+    def __len__(self) -> int:
+        return len(self._terms)
@@ -0,0 +1,85 @@
+import re
+from array import array
+
+from BTrees._OOBTree import OOBTree
+
+from src.vocabulary import Vocabulary
+
+# lunghezza dei k-gram di caratteri
+KGRAM_SIZE = 3
+# carattere di inizio e fine parola nei k-gram
+BOUNDARY = "$"
+# carattere jolly delle query
+WILDCARD = "*"
+# chiave massima per le scansioni per prefisso (maggiore di qualunque carattere)
+MAX_CHAR = chr(0x10FFFF)
+ID_TYPECODE = 'I'
+
+
+def kgrams(text: str, k: int = KGRAM_SIZE) -> set[str]:
+    """
+    Ritorna i k-gram di caratteri di text (tutte le sottostringhe di lunghezza k).
+    """
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def is_wildcard(term: str) -> bool:
+    return WILDCARD in term
+
+
+class WildcardIndex(Vocabulary):
+    """
+    Vocabolario per le query con caratteri jolly (es. "detect*", "*tect*ion").
+    Essendo costruito anche sulle parole non stemmate, "detecti*" trova "detection"
+    anche se il suo stem è "detect".
+    - le query per prefisso ("foo*") sono una scansione di un intervallo dell'OOBTree del vocabolario
+    - le altre usano un indice di k-gram di caratteri (k-gram -> id dei termini che lo contengono):
+      i termini candidati sono l'intersezione delle liste dei k-gram del pattern
+      e vengono poi verificati con un'espressione regolare
+    """
+
+    def __init__(self, k: int = KGRAM_SIZE) -> None:
+        super().__init__()
+        self.k = k
+        # termine -> id, ordinato per le scansioni per prefisso
+        self._ids = OOBTree()
+        # k-gram -> array ordinato degli id dei termini che lo contengono
+        self._kgrams = {}
+
+    def _index_term(self, term_id: int, term: str) -> None:
+        # gli id crescono, quindi le liste dei k-gram restano ordinate
+        for gram in kgrams(BOUNDARY + term + BOUNDARY, self.k):
+            ids = self._kgrams.get(gram)
+            if ids is None:
+                self._kgrams[gram] = ids = array(ID_TYPECODE)
+            ids.append(term_id)
+
+    def expand(self, pattern: str) -> set[str]:
+        """
+        Ritorna i termini dell'indice corrispondenti a un pattern con caratteri jolly
+        (* = qualunque sequenza di caratteri, anche vuota).
+        """
+        pieces = pattern.split(WILDCARD)
+        prefix = pieces[0]
+        # solo prefisso: scansione dell'intervallo [prefix, prefix + MAX_CHAR) dell'OOBTree
+        if len(pieces) == 2 and not pieces[1]:
+            return self._targets_of(self._ids.values(min=prefix, max=prefix + MAX_CHAR, excludemax=True))
+        # k-gram del pattern (con i delimitatori di inizio e fine se non c'è * agli estremi)
+        grams = set()
+        for piece in (BOUNDARY + pattern + BOUNDARY).split(WILDCARD):
+            grams |= kgrams(piece, self.k)
+        if grams:
+            # intersezione delle liste dei k-gram, dalla più corta; un k-gram assente non ha termini
+            lists = sorted((self._kgrams.get(gram, ()) for gram in grams), key=len)
+            candidates = set(lists[0]).intersection(*lists[1:])
+        elif prefix:
+            candidates = self._ids.values(min=prefix, max=prefix + MAX_CHAR, excludemax=True)
+        else:
+            candidates = range(len(self._terms))
+        # i k-gram non garantiscono l'ordine dei pezzi: verifica i candidati con il pattern
+        regex = re.compile(".*".join(map(re.escape, pieces)), re.DOTALL)
+        terms = self._terms
+        return self._targets_of(term_id for term_id in candidates if regex.fullmatch(terms[term_id]))
+
+    def __repr__(self) -> str:
+        return f"WildcardIndex(terms={len(self)}, kgrams={len(self._kgrams)})"
@@ -0,0 +1,32 @@
+import random
+
+import pytest
+
+from src.movie_description import MovieDescription
+from src.tokenizer import TOKENIZER
+
+# parole del corpus sintetico dei test (nessuna stop word, stem distinti)
+WORDS = ("alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet")
+
+
+def make_docs(n: int, seed: int = 0, first: int = 0) -> list[MovieDescription]:
+    """
+    Genera n documenti con descrizioni casuali di parole di WORDS (riproducibili dato seed).
+    """
+    rng = random.Random(seed)
+    return [MovieDescription(f"movie {first + i}", " ".join(rng.choices(WORDS, k=rng.randint(3, 8))))
+            for i in range(n)]
+
+
+def brute_force(docs: list[MovieDescription], word: str, deleted=()) -> list[int]:
+    """
+    Ritorna i docID dei documenti non eliminati che contengono word, scorrendo tutto il corpus.
+    """
+    stem = TOKENIZER.tokenize_query(word)[0]
+    return [doc_id for doc_id, doc in enumerate(docs)
+            if doc_id not in deleted and stem in TOKENIZER.tokenize(doc.description)]
+
+
+@pytest.fixture
+def docs() -> list[MovieDescription]:
+    return make_docs(200)
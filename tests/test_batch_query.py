@@ -0,0 +1,20 @@
+from src.ir_system import IrSystem
+
+
+def test_batch_query_matches_single_queries(docs):
+    ir = IrSystem.create_system(docs[:100], processes=1)
+    ir.add_docs(docs[100:])
+    ir.wait_for_merge()
+    queries = ["alpha AND bravo", "charlie OR delta", "alpha AND bravo", "NOT echo", '"alpha bravo"']
+    batch = ir.batch_query(queries)
+    for query, (result, _) in zip(queries, batch):
+        single = ir.phrase_query(query[1:-1]) if query.startswith('"') else ir.query(query)
+        assert list(result) == list(single)
+
+
+def test_repeated_queries_run_once(docs):
+    ir = IrSystem.create_system(docs, processes=1)
+    batch = ir.batch_query(["alpha OR bravo", "charlie", "alpha OR bravo"], workers=2)
+    # stesso risultato e stessa durata per la query ripetuta
+    assert batch[0] == batch[2] and batch[0][0] is batch[2][0]
+    assert list(batch[1][0]) == list(ir.query("charlie"))
@@ -0,0 +1,33 @@
+import random
+from array import array
+
+import pytest
+
+from src.bitmap import Bitmap, InvalidVector, DOC_ID_TYPECODE
+
+
+@pytest.mark.parametrize("deleted_count", [0, 3, 500, 5000])
+def test_exclude_matches_brute_force(deleted_count):
+    rng = random.Random(deleted_count)
+    vec = InvalidVector(10_000)
+    deleted = set(rng.sample(range(10_000), deleted_count))
+    vec.delete_many(deleted)
+    # docID oltre la fine del vettore: mantenuti
+    postings = array(DOC_ID_TYPECODE, sorted(rng.sample(range(12_000), 1000)))
+    expected = [doc_id for doc_id in postings if doc_id not in deleted]
+    assert list(vec.exclude(postings)) == expected
+    assert list(Bitmap.exclude(vec, postings)) == expected
+
+
+def test_delete_many():
+    vec = InvalidVector(100)
+    vec.delete(50)
+    vec.delete_many([70, 10, 50, 10, 99])
+    assert list(vec.deleted_ids) == [10, 50, 70, 99]
+    assert [doc_id for doc_id in range(100) if vec[doc_id]] == [10, 50, 70, 99]
+    with pytest.raises(IndexError):
+        vec.delete_many([5, 100])
+    with pytest.raises(IndexError):
+        vec.delete_many([-1])
+    # un batch con un docID non valido non modifica il vettore
+    assert vec.deleted_count == 4 and not vec[5]
@@ -0,0 +1,35 @@
+import pytest
+
+import src.inverted_index as inverted_index
+from src.inverted_index import InvertedIndex
+from src.tokenizer import TOKENIZER
+from tests.conftest import make_docs
+
+
+def snapshot(idx: InvertedIndex) -> dict:
+    # tipo e codifica binaria di ogni posting list (docID, posizioni e frequenze);
+    # le RoaringPostingsList non hanno una codifica propria: si confrontano i docID
+    return {term: (type(postings), postings.encode() if hasattr(postings, "encode") else list(postings))
+            for term, postings in idx.btree.items()}
+
+
+@pytest.mark.parametrize("options", [{}, {"positional": True}, {"ranked": True}, {"roaring_min_df": 20},
+                                     {"positional": True, "ranked": True}])
+def test_pool_build_matches_single_process(monkeypatch, options):
+    # shard piccoli, così anche un corpus di test viene diviso tra più processi
+    monkeypatch.setattr(inverted_index, "MIN_DOCS_PER_PROCESS", 10)
+    docs = make_docs(400, seed=8)
+    # dizionario degli stem vuoto: gli stem arrivano tutti dai processi del pool (stems_since + warm)
+    monkeypatch.setattr(TOKENIZER, "_stems", {})
+    docs[5].description += " zebras wandering"
+    pooled, pooled_phrases = InvertedIndex.create_indexes_from_corpus(docs, 100, processes=3, **options)
+    stems = TOKENIZER.stems_since(0)
+    assert stems["zebras"] == "zebra" and stems["wandering"] == "wander"
+
+    single, single_phrases = InvertedIndex.create_indexes_from_corpus(docs, 100, processes=1, **options)
+    assert snapshot(pooled) == snapshot(single)
+    assert snapshot(pooled_phrases) == snapshot(single_phrases)
+    if options.get("ranked"):
+        assert list(pooled.doc_lengths) == list(single.doc_lengths)
+    else:
+        assert pooled.doc_lengths is None and single.doc_lengths is None
@@ -0,0 +1,65 @@
+import pytest
+
+from src.doc_store import REDACTED
+from src.ir_system import IrSystem
+from src.segment import Segment
+from src.tokenizer import TOKENIZER
+from tests.conftest import WORDS, brute_force, make_docs
+
+# termine indicizzato (stem) di ogni parola del corpus sintetico
+TOKEN = {word: TOKENIZER.tokenize_query(word)[0] for word in WORDS}
+
+
+def build(docs, forward_index: bool) -> IrSystem:
+    # quattro segmenti, uniti poi esplicitamente
+    ir = IrSystem.create_system(docs[:50], processes=1, forward_index=forward_index)
+    ir.merge_factor = len(docs)
+    for start in range(50, len(docs), 50):
+        ir.add_docs(docs[start:start + 50])
+    return ir
+
+
+@pytest.mark.parametrize("forward_index", [False, True])
+def test_merge_removes_deleted_docs(docs, forward_index):
+    ir = build(docs, forward_index)
+    deleted = {3, 60, 61, 149, 199}
+    ir.delete_docs(sorted(deleted))
+    ir._merge_idx()
+    (segment,) = ir._snapshot.segments
+    for word in WORDS:
+        expected = brute_force(docs, word, deleted)
+        assert list(ir.query(word)) == expected
+        # i docID eliminati sono stati rimossi anche dalle PostingsList del segmento unito
+        assert list(segment.index.btree.get(TOKEN[word])) == expected
+    for doc_id in range(len(docs)):
+        assert (segment.docs.title(doc_id) == REDACTED) == (doc_id in deleted)
+
+
+def test_merge_ignores_delete_published_during_merge(docs):
+    ir = build(docs, forward_index=True)
+    ir.delete_docs([10])
+    snapshot = ir._snapshot
+    # eliminazione pubblicata mentre il merge lavora sullo snapshot precedente
+    ir.delete_docs([20])
+    merged = Segment.merge(list(snapshot.segments), snapshot.invalid_vec)
+    assert merged.docs.title(10) == REDACTED
+    assert merged.docs.title(20) != REDACTED
+    assert 20 not in merged.forward.purged
+    # il merge successivo, con l'invalid vector corrente, rimuove anche il documento 20
+    remerged = Segment.merge([merged], ir._snapshot.invalid_vec)
+    assert remerged.docs.title(20) == REDACTED
+    for word in WORDS:
+        assert list(remerged.index.btree.get(TOKEN[word])) == brute_force(docs, word, {10, 20})
+
+
+def test_merge_after_incremental_merges_with_forward_index():
+    docs = make_docs(300, seed=1)
+    ir = IrSystem.create_system(docs[:10], processes=1, forward_index=True)
+    for start in range(10, len(docs), 10):
+        ir.delete_docs([start - 1])
+        ir.add_docs(docs[start:start + 10])
+    ir.wait_for_merge()
+    ir._merge_idx()
+    deleted = set(range(9, len(docs) - 10, 10))
+    for word in WORDS:
+        assert list(ir.query(word)) == brute_force(docs, word, deleted)
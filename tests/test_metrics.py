@@ -0,0 +1,75 @@
+import threading
+
+from src.ir_system import IrSystem
+from src.metrics import Metrics, METRICS
+
+
+def test_disabled_registry_records_nothing():
+    metrics = Metrics()
+    with metrics.timer("stage"):
+        metrics.count("counter")
+    assert metrics.stats() == {"timers": {}, "counters": {}}
+    assert not metrics.active()
+
+
+def test_timers_and_counters():
+    metrics = Metrics(enabled=True)
+    for _ in range(3):
+        with metrics.timer("stage"):
+            metrics.count("counter", 2)
+
+    @metrics.timed("decorated")
+    def work():
+        return 42
+
+    assert work() == 42
+    stats = metrics.stats()
+    assert stats["timers"]["stage"]["count"] == 3 and stats["timers"]["decorated"]["count"] == 1
+    assert stats["counters"] == {"counter": 6}
+    assert metrics.format()[-1] == "counter: 6"
+    metrics.reset()
+    assert metrics.stats() == {"timers": {}, "counters": {}}
+
+
+def test_trace_is_per_thread_and_nested():
+    metrics = Metrics()
+    with metrics.trace() as trace:
+        with metrics.timer("outer"):
+            with metrics.timer("inner"):
+                metrics.count("hits")
+        # le misure di un altro thread non entrano nel trace
+        other = threading.Thread(target=lambda: metrics.count("other"))
+        other.start()
+        other.join()
+    assert [(name, depth) for name, depth, _ in trace.stages] == [("outer", 0), ("inner", 1)]
+    assert trace.counters == {"hits": 1}
+    lines = trace.format()
+    assert lines[0].startswith("outer: ") and lines[1].startswith("  inner: ") and lines[2] == "hits: 1"
+    # con il registro disattivato il trace non lascia metriche globali
+    assert metrics.stats() == {"timers": {}, "counters": {}}
+
+
+def test_trace_query(docs):
+    ir = IrSystem.create_system(docs[:100], processes=1)
+    ir.add_docs(docs[100:])
+    ir.wait_for_merge()
+    result, lines = ir.trace_query("alpha AND alph*")
+    assert list(result) == list(ir.query("alpha"))
+    stages = [line.split(":")[0].strip() for line in lines]
+    for stage in ("query", "query.tokenize", "query.parse", "query.plan", "query.expand", "query.execute",
+                  "query.remove_deleted", "query.page", "postings.lookups", "query.expanded_terms"):
+        assert stage in stages
+    assert not METRICS.enabled
+
+
+def test_system_stats(docs, monkeypatch):
+    monkeypatch.setattr(METRICS, "enabled", True)
+    METRICS.reset()
+    ir = IrSystem.create_system(docs, processes=1)
+    ir.query("alpha")
+    ir.query("alpha")
+    lines = ir.stats()
+    assert any(line.startswith("query: 2 x ") for line in lines)
+    assert "cache.hits: 1" in lines
+    assert any(line.startswith("segments: 1, merges: 0") for line in lines)
+    METRICS.reset()
@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+from main import build_index
+from src.doc_store import StringColumn
+from src.ir_system import IrSystem
+from src.roaring_postings import RoaringPostingsList
+from tests.conftest import WORDS, brute_force, make_docs
+
+OPTIONS = [
+    {},
+    {"positional": True},
+    {"ranked": True},
+    {"forward_index": True},
+    {"roaring_min_df": 50},
+    {"positional": True, "forward_index": True, "roaring_min_df": 50},
+    {"positional": True, "ranked": True, "forward_index": True, "roaring_min_df": 50},
+]
+
+
+@pytest.mark.parametrize("options", OPTIONS)
+def test_save_load_round_trip(tmp_path, docs, options):
+    ir = IrSystem.create_system(docs[:150], processes=1, **options)
+    ir.merge_factor = 3
+    ir.add_docs(docs[150:])
+    ir.wait_for_merge()
+    ir.delete_docs([5, 160])
+    ir.write_ir_system_to_disk(str(tmp_path))
+
+    loaded = IrSystem.load_ir_system_from_disk(str(tmp_path))
+    assert loaded.merge_factor == 3
+    assert loaded.roaring_min_df == options.get("roaring_min_df")
+    for name in ("positional", "ranked", "forward_index"):
+        assert getattr(loaded, name) == options.get(name, False)
+    assert list(loaded._snapshot.invalid_vec.deleted_ids) == [5, 160]
+    for word in WORDS:
+        assert list(loaded.query(word)) == list(ir.query(word)) == brute_force(docs, word, {5, 160})
+    assert list(loaded.phrase_query("alpha bravo")) == list(ir.phrase_query("alpha bravo"))
+    if options.get("ranked"):
+        assert loaded.ranked_query("alpha bravo", 5) == ir.ranked_query("alpha bravo", 5)
+
+    # dopo il caricamento aggiunte e merge usano ancora le opzioni salvate
+    extra = make_docs(100, seed=2, first=len(docs))
+    loaded.add_docs(extra)
+    loaded._merge_idx()
+    (segment,) = loaded._snapshot.segments
+    roaring = [postings for postings in segment.index.btree.values() if isinstance(postings, RoaringPostingsList)]
+    # (le FrequencyPostingsList degli indici per il ranking non vengono convertite)
+    assert bool(roaring) == ("roaring_min_df" in options and not options.get("ranked"))
+    for word in WORDS:
+        assert list(loaded.query(word)) == brute_force(docs + extra, word, {5, 160})
+
+
+def test_save_load_description_store(tmp_path):
+    docs = make_docs(120, seed=3)
+    store = StringColumn.create(os.path.join(str(tmp_path), "descriptions.bin"))
+    ir = IrSystem.create_system_from_stream(iter(docs), batch_size=40, description_store=store)
+    ir.wait_for_merge()
+    ir.write_ir_system_to_disk(str(tmp_path))
+
+    loaded = IrSystem.load_ir_system_from_disk(str(tmp_path))
+    assert [loaded.description(doc_id) for doc_id in range(len(docs))] == [doc.description for doc in docs]
+    for word in WORDS:
+        assert list(loaded.query(word)) == brute_force(docs, word)
+
+
+def test_failed_stream_build_keeps_saved_descriptions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("index_files")
+    store_path = os.path.join("index_files", "descriptions")
+    saved = StringColumn.create(store_path)
+    saved.append(["saved description"])
+    saved.flush()
+
+    assert build_index("missing.tsv", "missing.txt", stream=True) is None
+    assert StringColumn(store_path)[0] == "saved description"
+    assert sorted(os.listdir("index_files")) == ["descriptions.bin", "descriptions.off"]
+
+    docs = make_docs(30, seed=6)
+    with open("metadata.tsv", "w") as metadata, open("plots.txt", "w") as plots:
+        for movie_id, doc in enumerate(docs):
+            metadata.write(f"{movie_id}\t/m/{movie_id}\t{doc.title}\n")
+            plots.write(f"{movie_id}\t{doc.description}\n")
+    ir = build_index("metadata.tsv", "plots.txt", stream=True)
+    assert ir.description_store.path == store_path
+    assert StringColumn(store_path)[0] == docs[0].description
+    assert list(ir.query("alpha")) == brute_force(docs, "alpha")
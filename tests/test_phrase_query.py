@@ -0,0 +1,35 @@
+import pytest
+
+from src.ir_system import IrSystem
+from src.tokenizer import TOKENIZER
+from tests.conftest import make_docs
+
+
+def phrase_brute_force(docs, phrase: str, deleted=()) -> list[int]:
+    """
+    Ritorna i docID dei documenti non eliminati in cui le parole della frase compaiono consecutive.
+    """
+    words = TOKENIZER.tokenize(phrase)
+    result = []
+    for doc_id, doc in enumerate(docs):
+        tokens = TOKENIZER.tokenize(doc.description)
+        if doc_id not in deleted and any(tokens[i:i + len(words)] == words for i in range(len(tokens))):
+            result.append(doc_id)
+    return result
+
+
+@pytest.mark.parametrize("positional", [False, True])
+def test_two_word_phrase_queries(docs, positional):
+    ir = IrSystem.create_system(docs[:100], processes=1, positional=positional)
+    ir.add_docs(docs[100:])
+    ir.wait_for_merge()
+    ir.delete_docs([7])
+    for phrase in ("alpha bravo", "golf hotel", "juliet alpha"):
+        assert list(ir.phrase_query(phrase)) == phrase_brute_force(docs, phrase, {7})
+
+
+def test_positional_long_phrase_is_exact():
+    docs = make_docs(300, seed=5)
+    ir = IrSystem.create_system(docs, processes=1, positional=True)
+    for phrase in ("alpha bravo charlie", "delta delta echo"):
+        assert list(ir.phrase_query(phrase)) == phrase_brute_force(docs, phrase)
@@ -0,0 +1,30 @@
+import pickle
+import random
+
+import pytest
+
+from src.bitmap import InvalidVector
+from src.inverted_index import InvertedIndex
+from src.postings_list import PostingsList
+from src.tokenizer import TOKENIZER
+from tests.conftest import WORDS, brute_force
+
+
+@pytest.mark.parametrize("size", [0, 1, 100, 10_000])
+def test_encode_decode_round_trip(size):
+    doc_ids = sorted(random.Random(size).sample(range(2 ** 31), size))
+    postings = PostingsList.create_posting_list(doc_ids)
+    assert list(PostingsList.decode(postings.encode())) == doc_ids
+    assert list(pickle.loads(pickle.dumps(postings))) == doc_ids
+
+
+@pytest.mark.parametrize("options", [{}, {"roaring_min_df": 1}, {"positional": True}, {"ranked": True}])
+def test_remove_deleted_keeps_docs_past_invalid_vector(docs, options):
+    index, _ = InvertedIndex.create_indexes_from_corpus(docs, 0, processes=1, **options)
+    # invalid vector più corto del corpus: i docID oltre la fine non sono eliminati
+    invalid_vec = InvalidVector(100)
+    invalid_vec.delete(0)
+    invalid_vec.delete(99)
+    index.remove_deleted_docs(invalid_vec)
+    for word in WORDS:
+        assert list(index.btree.get(TOKENIZER.tokenize_query(word)[0])) == brute_force(docs, word, {0, 99})
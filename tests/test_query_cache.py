@@ -0,0 +1,49 @@
+from src.ir_system import IrSystem
+from src.postings_list import PostingsList
+from src.query_cache import QueryCache
+from tests.conftest import brute_force
+
+
+def test_cached_results_follow_add_delete_and_merge(docs):
+    ir = IrSystem.create_system(docs[:100], processes=1)
+    assert list(ir.query("alpha AND bravo")) == sorted(set(brute_force(docs[:100], "alpha"))
+                                                       & set(brute_force(docs[:100], "bravo")))
+    # il risultato in cache viene aggiornato con i nuovi segmenti e filtrato dai documenti eliminati
+    for start in range(100, len(docs), 25):
+        ir.add_docs(docs[start:start + 25])
+    ir.delete_docs([1, 150])
+    ir.wait_for_merge()
+    expected = sorted(set(brute_force(docs, "alpha", {1, 150})) & set(brute_force(docs, "bravo")))
+    assert list(ir.query("alpha AND bravo")) == expected
+    ir._merge_idx()
+    assert list(ir.query("alpha AND bravo")) == expected
+    assert ir.cache_stats()["hits"] > 0
+
+
+def test_patched_and_unpatchable_results(docs):
+    ir = IrSystem.create_system(docs[:100], processes=1)
+    ir.query("alpha OR bravo")
+    ir.query("NOT alpha")
+    ir.add_docs(docs[100:])
+    ir.wait_for_merge()
+    # l'OR viene aggiornato con il solo segmento nuovo, il NOT unario ricalcolato
+    assert list(ir.query("alpha OR bravo")) == sorted(set(brute_force(docs, "alpha")) | set(brute_force(docs, "bravo")))
+    assert list(ir.query("NOT alpha")) == sorted(set(range(len(docs))) - set(brute_force(docs, "alpha")))
+    assert ir.cache_stats()["patches"] >= 1
+
+
+def test_lru_eviction_and_limits():
+    cache = QueryCache(max_entries=2, max_postings=5)
+    cache.put(("a",), PostingsList.create_posting_list([1, 2]), 10)
+    cache.put(("b",), PostingsList.create_posting_list([3]), 10)
+    cache.get(("a",))
+    cache.put(("c",), PostingsList.create_posting_list([4]), 10)
+    # "b" è il meno usato di recente
+    assert cache.get(("b",)) is None and cache.get(("a",)) is not None
+    # un risultato calcolato su meno docID non sostituisce quello presente
+    cache.put(("a",), PostingsList.create_posting_list([1]), 5)
+    assert list(cache.get(("a",))[0]) == [1, 2]
+    # troppi docID: non viene salvato
+    cache.put(("d",), PostingsList.create_posting_list(list(range(6))), 10)
+    assert cache.get(("d",)) is None
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,55 @@
+import pytest
+
+from src.ir_system import IrSystem, infix_to_postfix, tokenize_logical_query
+from src.query_planner import build_tree
+from tests.conftest import brute_force
+
+
+def plan(query: str):
+    return build_tree(infix_to_postfix(tokenize_logical_query(query)))
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("dog AND the", "dog"),
+    ("the OR dog", "dog"),
+    ("dog AND NOT the", "dog"),
+    ("cat OR (dog AND the)", "(cat OR dog)"),
+    ("(the AND dog) OR cat", "(dog OR cat)"),
+    ("the", "None"),
+    ("NOT the", "None"),
+    ("AND dog", "dog"),
+])
+def test_missing_operands(query, expected):
+    assert repr(plan(query)) == expected
+
+
+@pytest.fixture
+def ir(docs):
+    ir = IrSystem.create_system(docs[:100], processes=1)
+    ir.add_docs(docs[100:])
+    ir.wait_for_merge()
+    return ir
+
+
+def test_stop_word_operands(ir, docs):
+    assert list(ir.query("alpha AND the")) == brute_force(docs, "alpha")
+    assert list(ir.query("the OR alpha")) == brute_force(docs, "alpha")
+    assert list(ir.query("the")) == []
+
+
+def test_not_only_queries(ir, docs):
+    ir.delete_docs([0, 1])
+    everything = set(range(len(docs))) - {0, 1}
+    assert list(ir.query("NOT alpha")) == sorted(everything - set(brute_force(docs, "alpha")))
+    expected = everything - set(brute_force(docs, "alpha")) - set(brute_force(docs, "bravo"))
+    assert list(ir.query("NOT alpha AND NOT bravo")) == sorted(expected)
+    assert list(ir.query("NOT NOT alpha")) == brute_force(docs, "alpha", {0, 1})
+    assert list(ir.query("NOT the")) == []
+
+
+def test_queries_match_brute_force(ir, docs):
+    alpha, bravo, charlie = (set(brute_force(docs, word)) for word in ("alpha", "bravo", "charlie"))
+    assert list(ir.query("alpha AND bravo")) == sorted(alpha & bravo)
+    assert list(ir.query("alpha OR bravo AND charlie")) == sorted((alpha | bravo) & charlie)
+    assert list(ir.query("alpha NOT bravo")) == sorted(alpha - bravo)
+    assert list(ir.query("(alpha OR charlie) AND NOT bravo")) == sorted((alpha | charlie) - bravo)
@@ -0,0 +1,35 @@
+import pytest
+
+from src.ir_system import IrSystem
+from tests.conftest import brute_force
+
+
+@pytest.fixture
+def ir(docs):
+    ir = IrSystem.create_system(docs[:100], processes=1, roaring_min_df=1)
+    ir.add_docs(docs[100:])
+    ir.wait_for_merge()
+    return ir
+
+
+# PostingsList di un solo segmento, PostingsUnionView su più segmenti, risultato filtrato dagli eliminati
+@pytest.mark.parametrize("query", ["alpha", "alpha OR bravo", "alpha AND NOT bravo"])
+def test_pages_cover_the_result(ir, query):
+    result = ir.query(query)
+    doc_ids = list(result)
+    assert len(result) == len(doc_ids) and doc_ids == sorted(doc_ids)
+    pages = [result.doc_ids(offset, 7) for offset in range(0, len(result), 7)]
+    assert [doc_id for page in pages for doc_id in page] == doc_ids
+    assert all(len(page) == 7 for page in pages[:-1])
+    assert result.doc_ids(len(result), 7) == []
+    assert result.doc_ids(3) == doc_ids[3:]
+
+
+def test_page_titles(ir, docs):
+    deleted = brute_force(docs, "alpha")[0]
+    ir.delete_docs([deleted])
+    result = ir.query("alpha")
+    expected = brute_force(docs, "alpha", {deleted})
+    assert result.page(0, 2) == [f"{doc_id}: {docs[doc_id].title}" for doc_id in expected[:2]]
+    assert result.page(len(expected) - 1) == [f"{expected[-1]}: {docs[expected[-1]].title}"]
+    assert expected[0] in result and deleted not in result
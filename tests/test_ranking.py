@@ -0,0 +1,60 @@
+from collections import Counter
+from math import log
+
+import pytest
+
+from src.ir_system import IrSystem
+from src.ranking import BM25Scorer, BM25_B, BM25_K1
+from src.tokenizer import TOKENIZER
+from tests.conftest import make_docs
+
+
+def exhaustive_top_k(docs, query: str, k: int, deleted=(), ranked: bool = True) -> list[tuple[int, float]]:
+    """
+    BM25 calcolato su tutti i documenti validi, senza posting list né MaxScore.
+    Senza ranked ogni termine ha term frequency 1 e non c'è normalizzazione per lunghezza.
+    """
+    valid = [doc_id for doc_id in range(len(docs)) if doc_id not in deleted]
+    tokens = {doc_id: TOKENIZER.tokenize(docs[doc_id].description) for doc_id in valid}
+    counts = {doc_id: Counter(tokens[doc_id]) for doc_id in valid}
+    b = BM25_B if ranked else 0.0
+    avg_length = max(sum(map(len, tokens.values())) / len(valid), 1.0)
+    scores = Counter()
+    for term in dict.fromkeys(TOKENIZER.tokenize_query(query)):
+        # la document frequency conta anche i documenti eliminati ancora negli indici
+        df = sum(term in TOKENIZER.tokenize(doc.description) for doc in docs)
+        if not df:
+            continue
+        idf = log(1 + (len(valid) - df + 0.5) / (df + 0.5))
+        for doc_id in valid:
+            tf = counts[doc_id][term] if ranked else min(counts[doc_id][term], 1)
+            if tf:
+                norm = 1 - b + b * len(tokens[doc_id]) / avg_length
+                scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+
+@pytest.mark.parametrize("ranked", [True, False])
+@pytest.mark.parametrize("k", [1, 5, 40])
+def test_top_k_matches_exhaustive_scoring(ranked, k):
+    docs = make_docs(300, seed=11)
+    ir = IrSystem.create_system(docs[:150], processes=1, ranked=ranked)
+    ir.add_docs(docs[150:])
+    ir.wait_for_merge()
+    deleted = {2, 151, 299}
+    ir.delete_docs(sorted(deleted))
+    snapshot = ir._snapshot
+    for query in ("alpha", "alpha bravo", "golf hotel india juliet", "alpha alpha zulu"):
+        scorer = BM25Scorer(snapshot.segments, snapshot.invalid_vec)
+        result = scorer.top_k(TOKENIZER.tokenize_query(query), k)
+        expected = exhaustive_top_k(docs, query, k, deleted, ranked)
+        assert [score for _, score in result] == pytest.approx([score for _, score in expected])
+        assert [doc_id for doc_id, _ in result] == [doc_id for doc_id, _ in expected]
+
+
+def test_ranked_query_output():
+    docs = make_docs(50, seed=12)
+    ir = IrSystem.create_system(docs, processes=1, ranked=True)
+    (doc_id, score), = exhaustive_top_k(docs, "alpha", 1)
+    assert ir.ranked_query("alpha", 1) == [f"{doc_id}: {docs[doc_id].title} (score {score:.2f})"]
+    assert ir.ranked_query("alpha", 0) == []
@@ -0,0 +1,47 @@
+import pytest
+
+from src.ir_system import IrSystem
+from tests.conftest import WORDS, brute_force, make_docs
+
+
+@pytest.mark.parametrize("forward_index", [False, True])
+def test_replace_docs(docs, forward_index):
+    ir = IrSystem.create_system(docs, processes=1, forward_index=forward_index)
+    new_docs = make_docs(2, seed=9, first=len(docs))
+    new_ids = ir.replace_docs([3, 4], new_docs)
+    assert list(new_ids) == [len(docs), len(docs) + 1]
+    all_docs = docs + new_docs
+    ir._merge_idx()
+    for word in WORDS:
+        assert list(ir.query(word)) == brute_force(all_docs, word, {3, 4})
+    assert ir.corpus().title(len(docs)) == new_docs[0].title
+
+
+def test_replace_out_of_range_leaves_system_unchanged(docs):
+    ir = IrSystem.create_system(docs, processes=1)
+    for doc_id in (len(docs), -1):
+        with pytest.raises(IndexError):
+            ir.replace_docs([doc_id], make_docs(1, seed=4))
+    assert len(ir._snapshot.invalid_vec) == len(docs) and not ir._snapshot.invalid_vec.deleted_count
+
+
+def test_repeated_replace_keeps_forward_index_compact(docs):
+    ir = IrSystem.create_system(docs, processes=1, forward_index=True)
+    all_docs = list(docs)
+    current = [3, 4]
+    deleted = set()
+    for seed in range(20):
+        new_docs = make_docs(2, seed=100 + seed, first=len(all_docs))
+        deleted.update(current)
+        current = list(ir.replace_docs(current, new_docs))
+        all_docs += new_docs
+    ir._merge_idx()
+    for word in WORDS:
+        assert list(ir.query(word)) == brute_force(all_docs, word, deleted)
+    segment, = ir._snapshot.segments
+    (first, terms, _), = segment.forward.blocks
+    assert first == 0 and not segment.forward.purged
+    assert all(not terms.keys(doc_id) for doc_id in deleted)
+    live_terms = {term for doc_id in range(len(all_docs)) if doc_id not in deleted
+                  for term in terms.keys(doc_id)}
+    assert len(terms.terms) == len(live_terms)
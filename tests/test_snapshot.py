@@ -0,0 +1,51 @@
+import threading
+
+from src.bitmap import InvalidVector
+from src.ir_system import IrSystem
+from tests.conftest import brute_force
+
+
+def test_invalid_vector_copy_is_independent():
+    vec = InvalidVector(10)
+    copy = vec.copy()
+    copy.delete(3)
+    assert list(vec.deleted_ids) == [] and not vec[3]
+    assert list(copy.deleted_ids) == [3] and copy[3]
+
+
+def test_snapshot_isolated_from_later_delete(docs):
+    # due segmenti: i risultati multi-segmento sono PostingsUnionView
+    ir = IrSystem.create_system(docs[:100], processes=1)
+    ir.add_docs(docs[100:])
+    ir.wait_for_merge()
+    snapshot = ir._snapshot
+    before = list(ir._query("alpha", snapshot))
+    assert before == brute_force(docs, "alpha")
+    victim = before[len(before) // 2]
+    ir.delete_docs([victim])
+    # lo snapshot trattenuto non vede l'eliminazione, quello corrente sì
+    assert list(ir._query("alpha", snapshot)) == before
+    assert list(ir.query("alpha")) == brute_force(docs, "alpha", {victim})
+
+
+def test_concurrent_readers_see_consistent_snapshots(docs):
+    ir = IrSystem.create_system(docs[:100], processes=1)
+    ir.add_docs(docs[100:])
+    ir.wait_for_merge()
+    errors = []
+
+    def reader():
+        for _ in range(50):
+            snapshot = ir._snapshot
+            deleted = set(snapshot.invalid_vec.deleted_ids)
+            if list(ir._query("bravo", snapshot)) != brute_force(docs, "bravo", deleted):
+                errors.append(deleted)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for doc_id in range(0, len(docs), 7):
+        ir.delete_docs([doc_id])
+    for thread in threads:
+        thread.join()
+    assert not errors
@@ -0,0 +1,38 @@
+import os
+
+from src.tokenizer import Tokenizer
+
+TEXTS = ["The Detective's running, jumping!", "Detectives ran; the dog-walker RUNS", ""]
+
+
+def test_tokenize_many_matches_tokenize():
+    tokenizer = Tokenizer()
+    assert tokenizer.tokenize_many(TEXTS) == [tokenizer.tokenize(text) for text in TEXTS]
+    assert tokenizer.tokenize_many(TEXTS, stem=False) == [tokenizer.normalize(text).split() for text in TEXTS]
+
+
+def test_stems_persist_across_save_and_load(tmp_path):
+    tokenizer = Tokenizer()
+    tokenizer.tokenize_many(TEXTS)
+    path = os.path.join(str(tmp_path), "stems.pkl")
+    tokenizer.save(path)
+
+    loaded = Tokenizer()
+    loaded.load(path)
+    assert loaded.stems_since(0) == tokenizer.stems_since(0)
+    assert loaded.stems_since(0)["detectives"] == "detect"
+    # le parole già note non vengono stemmate di nuovo né aggiunte al dizionario
+    count = len(loaded)
+    assert loaded.tokenize(TEXTS[1]) == tokenizer.tokenize(TEXTS[1])
+    assert len(loaded) == count
+    # un file mancante lascia il dizionario com'è
+    loaded.load(os.path.join(str(tmp_path), "missing.pkl"))
+    assert len(loaded) == count
+
+
+def test_stems_since_and_warm_respect_max_stems():
+    tokenizer = Tokenizer(max_stems=3)
+    tokenizer.warm({"a1": "a", "b1": "b"})
+    tokenizer.warm({"b1": "x", "c1": "c", "d1": "d"})
+    assert tokenizer.stems_since(0) == {"a1": "a", "b1": "b", "c1": "c"}
+    assert tokenizer.stems_since(2) == {"c1": "c"}
@@ -0,0 +1,45 @@
+import pytest
+
+from src.fuzzy_index import FuzzyIndex, edit_distance
+from src.ir_system import IrSystem
+from src.movie_description import MovieDescription
+from src.vocabulary import Vocabulary
+from tests.conftest import brute_force
+
+
+def test_vocabulary_is_abstract():
+    with pytest.raises(TypeError):
+        Vocabulary()
+
+
+def test_wildcard_and_fuzzy_terms(docs):
+    ir = IrSystem.create_system(docs[:100], processes=1)
+    ir.add_docs(docs[100:])
+    ir.wait_for_merge()
+    alpha = brute_force(docs, "alpha")
+    assert list(ir.query("alph*")) == alpha
+    assert list(ir.query("*lph*")) == alpha
+    assert list(ir.query("alpga~")) == alpha
+    assert list(ir.query("alph* OR golf~")) == sorted(set(alpha) | set(brute_force(docs, "golf")))
+
+
+def test_vocabularies_follow_additions(docs):
+    ir = IrSystem.create_system(docs, processes=1)
+    # i vocabolari sono costruiti con il sistema, non alla prima query
+    assert len(ir._wildcards) and len(ir._fuzzy)
+    ir.add_docs([MovieDescription("new", "zulu kilo")])
+    ir.wait_for_merge()
+    new_id = len(docs)
+    assert list(ir.query("zul*")) == [new_id]
+    assert list(ir.query("zuluu~")) == [new_id]
+    assert list(ir.query("*ilo")) == [new_id]
+
+
+@pytest.mark.parametrize("distance", [0, 1, 2])
+def test_fuzzy_expand_matches_brute_force(distance):
+    words = ["alpha", "alpine", "alps", "delta", "deltas", "detla", "lapha", "al", "a"]
+    fuzzy = FuzzyIndex()
+    fuzzy.add_terms(words)
+    for query in ("alpha", "alpa", "delat", "al", "deltaa"):
+        expected = {word for word in words if edit_distance(query, word, distance) <= distance}
+        assert fuzzy.expand(f"{query}~{distance}") == expected